@@ -0,0 +1,76 @@
+"""
+bench_chunking.py
+
+Compares the throughput of the batched, offset-based token chunker in `ragxplorer.rag`
+with the previous two-stage split, which built a new `SentenceTransformersTokenTextSplitter`
+for every document and re-tokenised every character chunk one at a time.
+
+Usage:
+    python benchmarks/bench_chunking.py --n-words 200000 --chunk-size 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from langchain.text_splitter import (
+    RecursiveCharacterTextSplitter,
+    SentenceTransformersTokenTextSplitter
+)
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from ragxplorer.rag import _split_text_into_chunks, _split_chunks_into_tokens, _get_tokenizer
+
+WORDS = ("revenue growth margin cloud segment quarter fiscal operating income expenses "
+         "increase decrease customers products services azure office gaming devices").split()
+
+def make_pages(n_words: int, words_per_page: int = 500, seed: int = 0):
+    """ Generates synthetic pages of text """
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(1, n_words // words_per_page + 1):
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize() + "."
+                     for _ in range(words_per_page // 15)]
+        pages.append((page_number, "\n".join(sentences)))
+    return pages
+
+def two_stage_split(pages, chunk_size: int, chunk_overlap: int):
+    """ The previous implementation: one character split, then one tokenizer call per chunk """
+    character_splitter = RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", ". ", " ", ""],
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    character_split_texts = character_splitter.split_text('\n\n'.join(text for _, text in pages))
+    token_splitter = SentenceTransformersTokenTextSplitter(chunk_overlap=0, tokens_per_chunk=256)
+    return [text for chunk in character_split_texts for text in token_splitter.split_text(chunk)]
+
+def single_pass_split(pages, chunk_size: int, chunk_overlap: int):
+    """ The current implementation """
+    character_split_texts = _split_text_into_chunks(iter(pages), chunk_size, chunk_overlap)
+    return list(_split_chunks_into_tokens(character_split_texts))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-words", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = make_pages(args.n_words)
+    n_chars = sum(len(text) for _, text in pages)
+    _get_tokenizer()  # Load the tokenizer outside of the timed region
+
+    for name, split in [("two-stage", two_stage_split), ("single-pass", single_pass_split)]:
+        start = time.perf_counter()
+        chunks = split(pages, args.chunk_size, args.chunk_overlap)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>12}: {len(chunks):6d} chunks in {elapsed:7.2f}s ({n_chars / elapsed / 1e6:6.2f} M chars/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+bench_compare.py
+
+Compares the wall time of `RAGxplorer.compare_models` over several embedding models with the
+wall time of each model alone, on a synthetic report. Each model is a hashing embedding function
+with its own dimension and latency per call, standing in for embedding APIs of different speeds.
+
+Usage:
+    python benchmarks/bench_compare.py --pages 50 --latencies 0.05 0.1 0.2
+"""
+
+import os
+
+# Never reach out to the Hugging Face Hub: use the cached tokenizer, or skip
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+import argparse
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragxplorer import RAGxplorer
+
+from run_benchmarks import tokenizer_unavailable_reason
+from synthetic import HashingEmbeddingFunction, make_pages, make_queries, write_pdf
+
+EMBEDDING_FUNCTIONS: Dict[str, HashingEmbeddingFunction] = {}
+
+class BenchmarkExplorer(RAGxplorer):
+    """
+    Explorer whose embedding models are the hashing functions in EMBEDDING_FUNCTIONS.
+    """
+
+    def _get_embedding_function(self, embedding_model: str) -> Any:
+        return EMBEDDING_FUNCTIONS[embedding_model]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0.05, 0.1, 0.2],
+                        help="Seconds slept per embedding call, one per model")
+    parser.add_argument("--projection-method", default="pca")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    reason = tokenizer_unavailable_reason()
+    if reason is not None:
+        print(f"Skipped: {reason}")
+        sys.exit(0)
+    for i, latency in enumerate(args.latencies):
+        EMBEDDING_FUNCTIONS[f"model-{i}"] = HashingEmbeddingFunction(dimension=128 * (i + 2), latency=latency)
+    models = list(EMBEDDING_FUNCTIONS)
+    queries = make_queries(args.queries)
+    explorer = BenchmarkExplorer(embedding_model="text-embedding-3-small", projection_method=args.projection_method)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdf_path = os.path.join(work_dir, "report.pdf")
+        write_pdf(pdf_path, make_pages(args.pages))
+        # Compile UMAP's numba functions, if used, before anything is timed
+        explorer.compare_models(pdf_path, models[:1])
+
+        seconds = {}
+        for model in models:
+            start = time.perf_counter()
+            explorer.compare_models(pdf_path, [model], queries=queries, top_k=args.top_k)
+            seconds[model] = time.perf_counter() - start
+        start = time.perf_counter()
+        comparison = explorer.compare_models(pdf_path, models, queries=queries, top_k=args.top_k)
+        compare_seconds = time.perf_counter() - start
+
+    print(f"{len(models)} models, {args.pages} pages, {comparison.n_chunks} chunks, {args.queries} queries")
+    for model, latency in zip(models, args.latencies):
+        print(f"    {model:<16} {seconds[model]:9.3f}s alone   ({latency}s per embedding call)")
+    print(f"    {'all models':<16} {compare_seconds:9.3f}s         "
+          f"{compare_seconds / max(seconds.values()):6.2f}x the slowest model, "
+          f"{compare_seconds / sum(seconds.values()):6.2f}x the models in turn")
+    print("    mean Jaccard overlap of the retrieved chunks:")
+    print(comparison.overlap().round(3).to_string())
+
+if __name__ == "__main__":
+    main()
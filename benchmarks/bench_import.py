@@ -0,0 +1,63 @@
+"""
+bench_import.py
+
+Checks the import time of the package against a budget. Each import is timed in a fresh
+interpreter, and the heavy dependencies that should only be loaded by the stages that use them
+(fitting a projector, building a vector database, plotting, query expansion) must not be loaded.
+Exits with a non-zero status if an import is over budget or loads a heavy dependency.
+
+Usage:
+    python benchmarks/bench_import.py --budget 1.0 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("umap", "numba", "chromadb", "plotly", "pandas", "sklearn", "langchain", "PyPDF2",
+                 "transformers", "torch", "sentence_transformers", "openai", "joblib", "tqdm")
+
+STATEMENTS = ("import ragxplorer",
+              "from ragxplorer import RAGxplorer")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": sorted(name for name in {heavy!r} if name in sys.modules)}}))
+"""
+
+def time_import(statement: str) -> dict:
+    """ Runs an import statement in a fresh interpreter, and returns its time and the heavy modules it loaded """
+    probe = _PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    # Run from the root of the checkout, so that its ragxplorer is imported whether or not the package is installed
+    output = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum import time in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of fresh interpreters per statement; the fastest run counts")
+    args = parser.parse_args()
+
+    failures = []
+    for statement in STATEMENTS:
+        runs = [time_import(statement) for _ in range(args.repeat)]
+        elapsed = min(run["elapsed"] for run in runs)
+        loaded = sorted({name for run in runs for name in run["loaded"]})
+        print(f"{statement:<36} {elapsed:6.3f}s  heavy modules loaded: {', '.join(loaded) or 'none'}")
+        if elapsed > args.budget:
+            failures.append(f"'{statement}' took {elapsed:.3f}s, over the budget of {args.budget:.3f}s")
+        if loaded:
+            failures.append(f"'{statement}' loaded {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
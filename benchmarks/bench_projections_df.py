@@ -0,0 +1,89 @@
+"""
+bench_projections_df.py
+
+Compares the build time and memory of the compact visualization DataFrame built by
+`ragxplorer.projections.prepare_projections_df`, including building the hover text for
+plotting, with the previous DataFrame, which stored wrapped hover text next to the document
+text and built it with a Python call per row.
+
+Usage:
+    python benchmarks/bench_projections_df.py --sizes 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from ragxplorer.constants import PLOT_SIZE
+from ragxplorer.projections import compact_projections_df, prepare_projections_df, wrap_hover_text
+
+WORDS = ("revenue growth margin cloud segment quarter fiscal operating income expenses "
+         "increase decrease customers products services azure office gaming devices").split()
+
+def make_documents(n_documents: int, seed: int = 0):
+    """ Generates synthetic ids, projections and chunk texts of around 1000 characters """
+    rng = random.Random(seed)
+    text = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(100, 180))) for _ in range(n_documents)]
+    ids = [str(i) for i in range(n_documents)]
+    projections = np.random.default_rng(seed).normal(size=(2, n_documents)).astype(np.float32)
+    return ids, (projections[0], projections[1]), text
+
+def previous_projections_df(document_ids, document_projections, document_text) -> pd.DataFrame:
+    """ The previous implementation """
+    df = pd.DataFrame({"id": document_ids,
+                       "x": document_projections[0],
+                       "y": document_projections[1]})
+    df['document'] = document_text
+    df['document_cleaned'] = df.document.str.wrap(80).apply(lambda x: x.replace('\n', '<br>'))
+    df['size'] = PLOT_SIZE
+    df['category'] = "Chunks"
+    return df
+
+def memory_mb(df: pd.DataFrame, text) -> float:
+    """ Memory held by a DataFrame, not counting the document strings the caller already holds """
+    text_ids = {id(document) for document in text}
+    total = df.memory_usage(deep=True).sum()
+    if "document" in df and all(id(document) in text_ids for document in df["document"]):
+        total -= df["document"].memory_usage(deep=True) - df["document"].memory_usage(deep=False)
+    return total / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    for n_documents in args.sizes:
+        ids, projections, text = make_documents(n_documents)
+
+        start = time.perf_counter()
+        previous = previous_projections_df(ids, projections, text)
+        previous_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compact = prepare_projections_df(ids, projections, text)
+        build_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        wrap_hover_text(compact["document"])
+        hover_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compact_projections_df(previous)
+        import_elapsed = time.perf_counter() - start
+
+        print(f"{n_documents:>8d} documents")
+        print(f"    previous: {previous_elapsed:7.2f}s, {memory_mb(previous, text):8.1f} MB")
+        print(f"     compact: {build_elapsed:7.2f}s + {hover_elapsed:5.2f}s hover text when plotted, "
+              f"{memory_mb(compact, text):8.1f} MB")
+        print(f"      import: {import_elapsed:7.2f}s to compact a previous DataFrame")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+bench_rendering.py
+
+Measures the build time and serialised size of the query figure in the 'standard' and
+'large' render modes of `ragxplorer.projections`, for synthetic corpora of increasing size.
+Also checks that `plot_embeddings` still draws the query and the retrieved documents of a
+frame large enough for the 'large' mode, and exits with an error if it does not.
+
+Usage:
+    python benchmarks/bench_rendering.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from ragxplorer.constants import LARGE_CORPUS_THRESHOLD, PLOT_SIZE
+from ragxplorer.projections import plot_base_traces, plot_embeddings, plot_overlays
+
+def make_base_df(n_points: int, text_length: int = 400, seed: int = 0) -> pd.DataFrame:
+    """ Generates a synthetic base dataframe with clustered coordinates """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=10, size=(50, 2))
+    coordinates = centers[rng.integers(0, len(centers), n_points)] + rng.normal(size=(n_points, 2))
+    text = pd.Series(["lorem ipsum dolor sit amet " * (text_length // 27)] * n_points).str.cat(
+        pd.Series(np.arange(n_points)).astype(str), sep=" ")
+    return pd.DataFrame({"id": np.arange(n_points).astype(str),
+                         "x": coordinates[:, 0],
+                         "y": coordinates[:, 1],
+                         "document": text,
+                         "document_cleaned": text,
+                         "size": PLOT_SIZE,
+                         "category": "Chunks"})
+
+def make_overlays(base_df: pd.DataFrame, top_k: int = 10) -> list:
+    """ Builds a query overlay and a retrieved-documents overlay """
+    retrieved = base_df.iloc[:top_k][["x", "y", "document_cleaned"]].assign(category="Retrieved")
+    query = pd.DataFrame({"x": [0.0], "y": [0.0], "document_cleaned": ["query"], "category": "Original Query"})
+    return [retrieved, query]
+
+def check_plot_embeddings() -> bool:
+    """ Checks that a large frame with a query and retrieved documents renders all three categories """
+    base_df = make_base_df(LARGE_CORPUS_THRESHOLD + 10000)
+    fig = plot_embeddings(pd.concat([base_df, *make_overlays(base_df)], ignore_index=True))
+    names = [trace.name for trace in fig.data]
+    ok = {"Chunks", "Retrieved", "Original Query"} <= set(names)
+    print(f"  plot_embeddings of {len(base_df)} chunks, a query and retrieved documents: {names}  {'ok' if ok else 'FAILED'}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--modes", nargs="+", default=["standard", "large"])
+    args = parser.parse_args()
+
+    for n_points in args.sizes:
+        base_df = make_base_df(n_points)
+        overlays = make_overlays(base_df)
+        for mode in args.modes:
+            start = time.perf_counter()
+            base_traces = plot_base_traces(base_df, render_mode=mode)
+            base_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fig = plot_overlays(base_traces, overlays)
+            query_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            size_mb = len(fig.to_json()) / 1e6
+            json_elapsed = time.perf_counter() - start
+            print(f"{n_points:>8d} {mode:>9}: base traces {base_elapsed:7.2f}s | per query {query_elapsed:6.3f}s | "
+                  f"serialise {json_elapsed:6.2f}s | {size_mb:8.1f} MB")
+
+    if not check_plot_embeddings():
+        sys.exit("plot_embeddings dropped the query or the retrieved documents of a large frame.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+bench_retrieval.py
+
+Compares the latency of the Chroma and the exact in-memory NumPy retrieval engines of
+`ragxplorer.retrievers` on synthetic clustered embeddings, and checks that they retrieve the
+same chunks. Chroma's HNSW index is approximate, so the overlap is reported as recall of the
+exact results, and the script exits with an error if it falls below `--min-recall`.
+
+It also checks that switching the retriever of an explorer, from Chroma to NumPy with the 'ip'
+metric and back, rebuilds the engine and drops the retrievals cached under the previous one.
+
+Usage:
+    python benchmarks/bench_retrieval.py --n-chunks 20000 --n-queries 500 --metric cosine
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+import argparse
+import sys
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragxplorer import RAGxplorer
+from ragxplorer.retrievers import ChromaRetriever, NumpyRetriever
+
+from synthetic import HashingEmbeddingFunction, make_queries
+
+def make_embeddings(n_chunks: int, n_queries: int, dimension: int, seed: int = 0):
+    """ Generates clustered chunk embeddings, and query embeddings near random chunks """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(100, dimension))
+    embeddings = (centers[rng.integers(0, len(centers), n_chunks)] + 0.5 * rng.normal(size=(n_chunks, dimension))).astype(np.float32)
+    queries = (embeddings[rng.integers(0, n_chunks, n_queries)] + 0.3 * rng.normal(size=(n_queries, dimension))).astype(np.float32)
+    return embeddings, queries
+
+def check_engine_switch(collection, ids, embeddings: np.ndarray, top_k: int) -> bool:
+    """ Shows a query with each engine in turn, and checks that each retrieves what its engine does """
+    embedding_function = HashingEmbeddingFunction(dimension=embeddings.shape[1])
+    explorer = RAGxplorer(embedding_model="text-embedding-3-small", projection_method="pca")
+    explorer._chosen_embedding_model = embedding_function # pylint: disable=protected-access
+    explorer.load_chroma(collection, recompute_projections=True, verbose=False)
+    query = make_queries(1)[0]
+    query_embedding = np.asarray(embedding_function([query]), dtype=np.float32)
+
+    passed = True
+    for retriever, retriever_params, engine in [("chroma", None, ChromaRetriever(collection)),
+                                                ("numpy", {"metric": "ip"}, NumpyRetriever(ids, embeddings, metric="ip")),
+                                                ("chroma", None, ChromaRetriever(collection))]:
+        explorer.retriever, explorer.retriever_params = retriever, retriever_params
+        explorer.visualize_query(query, top_k=top_k)
+        retrieved = list(explorer._query.retrieved_docs) # pylint: disable=protected-access
+        expected = engine.query_fused(query_embeddings=query_embedding, top_k=top_k)
+        ok = (isinstance(explorer._get_retriever(), type(engine)) # pylint: disable=protected-access
+              and retrieved == list(expected))
+        print(f"  switch to {retriever:<6} {str(retriever_params or ''):<16} {'ok' if ok else 'FAILED'}")
+        passed = passed and ok
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-chunks", type=int, default=20000)
+    parser.add_argument("--n-queries", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--metric", default="l2", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    embeddings, queries = make_embeddings(args.n_chunks, args.n_queries, args.dimension)
+    ids = [str(i) for i in range(args.n_chunks)]
+    collection = chromadb.Client().create_collection(uuid.uuid4().hex, metadata={"hnsw:space": args.metric})
+    for start in range(0, args.n_chunks, 5000):
+        collection.add(ids=ids[start:start + 5000], embeddings=embeddings[start:start + 5000].tolist())
+
+    start = time.perf_counter()
+    numpy_retriever = NumpyRetriever(ids, embeddings, metric=args.metric)
+    setup_elapsed = time.perf_counter() - start
+
+    results = {}
+    for name, retriever in [("chroma", ChromaRetriever(collection)), ("numpy", numpy_retriever)]:
+        start = time.perf_counter()
+        results[name] = retriever.query(queries, args.top_k)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>7}: {elapsed:7.3f}s for {args.n_queries} batched queries ({elapsed / args.n_queries * 1e3:6.2f} ms/query)")
+        start = time.perf_counter()
+        for query in queries[:100]:
+            retriever.query(query[None, :], args.top_k)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>7}: {elapsed / 100 * 1e3:7.2f} ms per single query, as in visualize_query")
+    print(f"  numpy setup: {setup_elapsed:.3f}s")
+
+    recall = np.mean([len(set(chroma_ids) & set(numpy_ids)) / len(numpy_ids)
+                      for chroma_ids, numpy_ids in zip(results["chroma"], results["numpy"])])
+    identical = np.mean([chroma_ids == numpy_ids for chroma_ids, numpy_ids in zip(results["chroma"], results["numpy"])])
+    print(f"  recall of chroma vs exact: {recall:.4f}, identical rankings: {identical:.2%}")
+    if not check_engine_switch(collection, ids, embeddings, args.top_k):
+        sys.exit("Switching the retriever did not change the retrieved chunks.")
+    if recall < args.min_recall:
+        sys.exit(f"Recall {recall:.4f} is below {args.min_recall}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+bench_sweep.py
+
+Compares `RAGxplorer.sweep` with loading every configuration of the same grid separately, on a
+synthetic report embedded with the hashing embedding function, and reports the wall times and the
+number of texts each approach embedded.
+
+Usage:
+    python benchmarks/bench_sweep.py --pages 50 --embedding-latency 0.05 --n-jobs 4
+"""
+
+import os
+
+# Never reach out to the Hugging Face Hub: use the cached tokenizer, or skip
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+import argparse
+import sys
+import tempfile
+import time
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragxplorer import RAGxplorer
+
+from run_benchmarks import tokenizer_unavailable_reason
+from synthetic import HashingEmbeddingFunction, make_pages, make_queries, write_pdf
+
+class CountingEmbeddingFunction(HashingEmbeddingFunction):
+    """
+    Hashing embedding function that counts the texts it embeds.
+    """
+
+    def __init__(self, dimension: int = 384, latency: float = 0.0):
+        super().__init__(dimension=dimension, latency=latency)
+        self.n_embedded = 0
+
+    def __call__(self, input): # pylint: disable=redefined-builtin
+        self.n_embedded += len(input)
+        return super().__call__(input)
+
+def make_explorer(embedding_function: HashingEmbeddingFunction) -> RAGxplorer:
+    """
+    Creates an explorer that embeds with `embedding_function`.
+    """
+    explorer = RAGxplorer(embedding_model="text-embedding-3-small")
+    explorer._chosen_embedding_model = embedding_function # pylint: disable=protected-access
+    return explorer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 1000])
+    parser.add_argument("--projection-methods", nargs="+", default=["pca", "umap"])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of the fake embeddings")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds slept per embedding call")
+    parser.add_argument("--n-jobs", type=int, default=2, help="Threads used by the sweep")
+    args = parser.parse_args()
+
+    reason = tokenizer_unavailable_reason()
+    if reason is not None:
+        print(f"Skipped: {reason}")
+        sys.exit(0)
+    grid = {"chunk_size": args.chunk_sizes, "projection_method": args.projection_methods, "top_k": args.top_k}
+    queries = make_queries(args.queries)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdf_path = os.path.join(work_dir, "report.pdf")
+        write_pdf(pdf_path, make_pages(args.pages))
+        # Compile UMAP's numba functions before anything is timed
+        make_explorer(HashingEmbeddingFunction(args.dimension)).sweep(pdf_path, {"chunk_size": [args.chunk_sizes[0]],
+                                                                                 "projection_method": ["umap"]})
+
+        embedding_function = CountingEmbeddingFunction(args.dimension, args.embedding_latency)
+        start = time.perf_counter()
+        sweep = make_explorer(embedding_function).sweep(pdf_path, grid, queries=queries, n_jobs=args.n_jobs)
+        sweep_seconds, sweep_embedded = time.perf_counter() - start, embedding_function.n_embedded
+
+        embedding_function = CountingEmbeddingFunction(args.dimension, args.embedding_latency)
+        start = time.perf_counter()
+        for result in sweep.results:
+            explorer = make_explorer(embedding_function)
+            explorer.projection_method = result.params["projection_method"]
+            explorer.load_pdf(pdf_path, chunk_size=result.params["chunk_size"])
+            explorer.retrieve_many(queries, top_k=result.params["top_k"])
+        separate_seconds, separate_embedded = time.perf_counter() - start, embedding_function.n_embedded
+
+    print(f"{len(sweep.results)} configurations, {args.pages} pages, {args.queries} queries")
+    print(f"    {'separate loads':<16} {separate_seconds:9.3f}s   {separate_embedded:7d} texts embedded")
+    print(f"    {'sweep':<16} {sweep_seconds:9.3f}s   {sweep_embedded:7d} texts embedded   "
+          f"{separate_seconds / sweep_seconds:6.2f}x faster")
+    print("    sweep phases: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in sweep.timings.items()))
+
+if __name__ == "__main__":
+    main()
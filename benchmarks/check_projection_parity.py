@@ -0,0 +1,78 @@
+"""
+check_projection_parity.py
+
+Checks that projecting embeddings in blocks with `ragxplorer.projections.get_projections`, in
+this process (n_jobs=1) or fanned out to two worker processes, places them where projecting each
+embedding on its own with `transform([embedding])` does. Too few embeddings are projected for
+`get_projections` to start workers, so the fan-out is forced, with a projector large enough for
+joblib to memory-map its arrays. UMAP's transform is stochastic, so the deviation is measured
+relative to the span of the layout, and the script exits with an error if the largest deviation is
+over `--max-deviation`.
+
+Usage:
+    python benchmarks/check_projection_parity.py --n-fit 1000 --n-project 60 --dimension 384 --batch-size 16
+"""
+
+import os
+
+# Forking the joblib workers after UMAP has run in this process hangs the interpreter at exit with
+# numba's TBB threading layer, so use its fork-safe workqueue layer unless another one is set
+os.environ.setdefault("NUMBA_THREADING_LAYER", "workqueue")
+
+# pylint: disable=wrong-import-position
+import argparse
+import sys
+import time
+
+import numpy as np
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragxplorer.projections import _project_embeddings, get_projections, import_projection_dependencies, set_up_umap
+
+def make_embeddings(n_fit: int, n_project: int, dimension: int, seed: int = 0):
+    """ Generates clustered embeddings to fit on, and unseen embeddings from the same clusters to project """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dimension))
+    n_total = n_fit + n_project
+    embeddings = (centers[rng.integers(0, len(centers), n_total)] + 0.3 * rng.normal(size=(n_total, dimension))).astype(np.float32)
+    return embeddings[:n_fit], embeddings[n_fit:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-fit", type=int, default=1000)
+    parser.add_argument("--n-project", type=int, default=60)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-deviation", type=float, default=0.05,
+                        help="Largest allowed deviation from the per-row projection, as a fraction of the layout span")
+    args = parser.parse_args()
+
+    import_projection_dependencies("umap")
+    fit_embeddings, embeddings = make_embeddings(args.n_fit, args.n_project, args.dimension)
+    projector = set_up_umap(fit_embeddings, umap_params={"random_state": 0})
+    span = np.ptp(projector.embedding_, axis=0).max()
+
+    start = time.perf_counter()
+    per_row = np.array([projector.transform(embedding[None, :])[0] for embedding in embeddings])
+    print(f"  {'per row:':<20} {time.perf_counter() - start:7.3f}s for {len(embeddings)} embeddings")
+
+    failed = False
+    for name, project in [("blocks, n_jobs=1", lambda: np.column_stack(get_projections(embeddings, projector, batch_size=args.batch_size))),
+                          ("blocks, n_jobs=2", lambda: np.column_stack(get_projections(embeddings, projector, batch_size=args.batch_size, n_jobs=2))),
+                          ("blocks, 2 workers", lambda: _project_embeddings(embeddings, projector, batch_size=args.batch_size,
+                                                                             n_jobs=2, min_rows_per_worker=1))]:
+        start = time.perf_counter()
+        projections = project()
+        elapsed = time.perf_counter() - start
+        deviation = np.linalg.norm(projections - per_row, axis=1) / span
+        ok = deviation.max() <= args.max_deviation
+        print(f"  {name + ':':<20} {elapsed:7.3f}s, deviation from per row: "
+              f"max {deviation.max():.4f}, mean {deviation.mean():.4f} of the span  {'ok' if ok else 'FAILED'}")
+        failed = failed or not ok
+    if failed:
+        sys.exit(f"Projecting in blocks deviates from projecting per row by more than {args.max_deviation} of the layout span.")
+
+if __name__ == "__main__":
+    main()
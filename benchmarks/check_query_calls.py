@@ -0,0 +1,119 @@
+"""
+check_query_calls.py
+
+Checks that a query and its expansions are embedded with one call to the embedding function and
+searched with one call to `collection.query`, for every retrieval method, in both
+`RAGxplorer.visualize_query` and `RAGxplorer.retrieve_many`. Query expansions come from a local
+stub chat completion server and embeddings from a hashing function, so no network access is needed.
+Exits with a non-zero status if any step makes more calls than expected.
+
+Usage:
+    python benchmarks/check_query_calls.py --n-chunks 500 --n-queries 8
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+import argparse
+import functools
+import sys
+import uuid
+
+import chromadb
+import numpy as np
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragxplorer import RAGxplorer
+from ragxplorer.constants import CHROMA_QUERY_BATCH_SIZE, EMBEDDING_BATCH_SIZE
+
+from synthetic import HashingEmbeddingFunction, StubChatServer, make_pages, make_queries
+
+class CountingEmbeddingFunction(HashingEmbeddingFunction):
+    """
+    Hashing embedding function that counts its calls.
+    """
+
+    def __init__(self, dimension: int = 384):
+        super().__init__(dimension=dimension)
+        self.n_calls = 0
+
+    def __call__(self, input): # pylint: disable=redefined-builtin
+        self.n_calls += 1
+        return super().__call__(input)
+
+class CountingCollection:
+    """
+    Chroma collection that counts the calls to `query`, and passes everything else through.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.n_queries = 0
+
+    def query(self, *args, **kwargs):
+        """ Queries the collection, counting the call """
+        self.n_queries += 1
+        return self._collection.query(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+def make_collection(n_chunks: int, embedding_function: HashingEmbeddingFunction):
+    """ Builds a collection of sentences from a synthetic report, embedded with `embedding_function` """
+    sentences = [sentence for page in make_pages(n_chunks // 10 + 1) for sentence in page.split(". ") if sentence.strip()]
+    documents = sentences[:n_chunks]
+    collection = chromadb.Client().create_collection(uuid.uuid4().hex)
+    collection.add(ids=[str(i) for i in range(len(documents))],
+                   documents=documents,
+                   embeddings=np.asarray(embedding_function(documents), dtype=np.float32).tolist())
+    return collection
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-chunks", type=int, default=500)
+    parser.add_argument("--n-queries", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    embedding_function = CountingEmbeddingFunction()
+    collection = CountingCollection(make_collection(args.n_chunks, embedding_function))
+    explorer = RAGxplorer(embedding_model="text-embedding-3-small", projection_method="pca")
+    explorer._chosen_embedding_model = embedding_function # pylint: disable=protected-access
+    explorer.load_chroma(collection, recompute_projections=True, verbose=False)
+    queries = make_queries(args.n_queries * 4)
+
+    failures = []
+    def check(name: str, run, n_embedding_calls: int, n_query_calls: int):
+        embedding_function.n_calls, collection.n_queries = 0, 0
+        run()
+        calls = (embedding_function.n_calls, collection.n_queries)
+        ok = calls == (n_embedding_calls, n_query_calls)
+        print(f"  {name:<34} {calls[0]:3d} embedding calls (expected {n_embedding_calls}), "
+              f"{calls[1]:3d} collection.query calls (expected {n_query_calls})  {'ok' if ok else 'FAILED'}")
+        if not ok:
+            failures.append(name)
+
+    with StubChatServer() as stub:
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        for i, retrieval_method in enumerate(["naive", "HyDE", "multi_qns"]):
+            show = functools.partial(explorer.visualize_query, queries[i], retrieval_method, top_k=args.top_k)
+            check(f"visualize_query {retrieval_method}", show, 1, 1)
+            check(f"visualize_query {retrieval_method}, again", show, 0, 0)
+
+            batch = queries[args.n_queries * (i + 1):args.n_queries * (i + 2)]
+            expansions = explorer._expand_queries(batch, retrieval_method) # pylint: disable=protected-access
+            n_search = sum(len(expansion) for expansion in expansions)
+            n_texts = len(batch) + (n_search if retrieval_method != "naive" else 0)
+            check(f"retrieve_many {retrieval_method}, {len(batch)} queries",
+                  functools.partial(explorer.retrieve_many, batch, retrieval_method, top_k=args.top_k),
+                  -(-n_texts // EMBEDDING_BATCH_SIZE), -(-n_search // CHROMA_QUERY_BATCH_SIZE))
+
+    if failures:
+        sys.exit(f"Too many calls in: {', '.join(failures)}")
+
+if __name__ == "__main__":
+    main()
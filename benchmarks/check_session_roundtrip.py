@@ -0,0 +1,80 @@
+"""
+check_session_roundtrip.py
+
+Checks that a session saved with `RAGxplorer.save`, whose vector database is persisted to disk,
+still loads after the session and the database were moved: `RAGxplorer.load` must reopen the
+collection from the `persist_directory` it is given, with the same chunks and search results.
+Exits with a non-zero status if it does not.
+
+Usage:
+    python benchmarks/check_session_roundtrip.py --n-chunks 500
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+import argparse
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragxplorer import RAGxplorer
+from ragxplorer.rag import build_vector_database_from_embeddings
+
+from synthetic import HashingEmbeddingFunction, make_pages, make_queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-chunks", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    embedding_function = HashingEmbeddingFunction()
+    documents = [sentence for page in make_pages(args.n_chunks // 10 + 1) for sentence in page.split(". ") if sentence.strip()][:args.n_chunks]
+    ids = [str(i) for i in range(len(documents))]
+    queries = np.asarray(embedding_function(make_queries(10)), dtype=np.float32).tolist()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        old_dir, new_dir = os.path.join(work_dir, "old"), os.path.join(work_dir, "new")
+        explorer = RAGxplorer(embedding_model="text-embedding-3-small", projection_method="pca",
+                              persist_directory=os.path.join(old_dir, "chroma"))
+        explorer.load_chroma(build_vector_database_from_embeddings(ids=ids,
+                                                                   documents=documents,
+                                                                   embeddings=embedding_function(documents),
+                                                                   embedding_model=embedding_function,
+                                                                   persist_directory=explorer.persist_directory),
+                             recompute_projections=True, verbose=False)
+        expected = explorer.export_chroma().query(query_embeddings=queries, n_results=args.top_k, include=[])["ids"]
+        explorer.save(os.path.join(old_dir, "session"))
+
+        # Move the session and its database, leaving nothing at the saved path, and drop the Chroma
+        # clients of this process, which would otherwise keep serving the collection from memory
+        shutil.copytree(old_dir, new_dir)
+        shutil.rmtree(old_dir)
+        SharedSystemClient.clear_system_cache()
+        try:
+            loaded = RAGxplorer.load(os.path.join(new_dir, "session"), persist_directory=os.path.join(new_dir, "chroma"))
+        except ValueError as e:
+            sys.exit(f"The moved session did not load: {e}")
+        collection = loaded.export_chroma()
+        checks = {
+            "reopened from the new directory": loaded.persist_directory == os.path.join(new_dir, "chroma"),
+            "same chunks": collection.count() == len(ids) and collection.get(ids=ids[:10])["documents"] == documents[:10],
+            "same search results": collection.query(query_embeddings=queries, n_results=args.top_k, include=[])["ids"] == expected,
+        }
+
+    for name, ok in checks.items():
+        print(f"  {name:<32} {'ok' if ok else 'FAILED'}")
+    if not all(checks.values()):
+        sys.exit("The moved session did not load its vector database from the new directory.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+run_benchmarks.py
+
+Runs the offline benchmark suite of the ingestion, projection, retrieval and rendering stages,
+and writes the timings to a JSON file that can be compared across commits.
+
+For each corpus size, a synthetic report is written to a PDF file and taken through every
+stage: loading, character and token chunking, embedding, adding to Chroma, fitting UMAP,
+projecting, querying Chroma, expanding queries, building the projection dataframe and plotting.
+Embeddings come from a deterministic hashing function and query expansions from a local stub
+chat completion server, so no network access is needed. Token chunking needs the tokenizer
+to be in the local Hugging Face cache, and is skipped otherwise.
+
+Each stage is run --repeat times; the minimum and median wall times are reported.
+
+Usage:
+    python benchmarks/run_benchmarks.py --pages 10 100 500 --output results.json
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json
+"""
+
+import os
+
+# Never reach out to the Hugging Face Hub: use the cached tokenizer, or skip token chunking
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+# pylint: disable=wrong-import-position
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Import ragxplorer from this checkout, whether or not the package is installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragxplorer import rag
+from ragxplorer import query_expansion
+from ragxplorer.constants import EMBEDDING_BATCH_SIZE
+from ragxplorer.embedding_executor import embed_and_add
+from ragxplorer.instrumentation import JsonLinesExporter, add_hook, remove_hook
+from ragxplorer.projections import get_projections, plot_embeddings, prepare_projections_df, set_up_umap
+
+from synthetic import HashingEmbeddingFunction, StubChatServer, make_pages, make_queries, write_pdf
+
+def time_stage(function: Callable[[], Any], repeat: int, items: Optional[int] = None) -> Tuple[dict, Any]:
+    """
+    Runs a stage `repeat` times.
+
+    Returns:
+        The timings of the stage, and the result of its last run.
+    """
+    seconds, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    timing = {"seconds": seconds, "min": min(seconds), "median": statistics.median(seconds)}
+    if items is not None:
+        timing["items"] = items
+        timing["items_per_second"] = items / timing["min"] if timing["min"] > 0 else None
+    return timing, result
+
+def tokenizer_unavailable_reason() -> Optional[str]:
+    """
+    Returns why token chunking cannot run, or None if the tokenizer loads.
+    """
+    try:
+        rag._get_tokenizer() # pylint: disable=protected-access
+    except Exception as e: # pylint: disable=broad-except
+        return f"tokenizer unavailable offline: {type(e).__name__}"
+    return None
+
+def run_size(n_pages: int, args: argparse.Namespace, stub: StubChatServer, work_dir: str, skip_tokens: Optional[str]) -> dict:
+    """
+    Runs every stage on a synthetic report of `n_pages` pages.
+    """
+    # pylint: disable=protected-access
+    repeat = args.repeat
+    stages = {}
+    pdf_path = os.path.join(work_dir, f"report_{n_pages}.pdf")
+    write_pdf(pdf_path, make_pages(n_pages, seed=n_pages))
+    embedding_function = HashingEmbeddingFunction(dimension=args.dimension, latency=args.embedding_latency)
+
+    stages["load"], pages = time_stage(lambda: list(rag._load_pdf(pdf_path)), repeat, items=n_pages)
+    stages["chunk"], chunks = time_stage(
+        lambda: list(rag._split_text_into_chunks(pages, args.chunk_size, args.chunk_overlap)), repeat)
+    stages["chunk"]["items"] = len(chunks)
+    if skip_tokens is None:
+        stages["token_chunk"], chunks = time_stage(lambda: list(rag._split_chunks_into_tokens(chunks)), repeat, items=len(chunks))
+    else:
+        stages["token_chunk"] = {"skipped": skip_tokens}
+    texts = [text for text, _ in chunks]
+    ids = [str(i) for i in range(len(texts))]
+
+    def embed():
+        return np.asarray([embedding
+                           for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+                           for embedding in embedding_function(texts[start:start + EMBEDDING_BATCH_SIZE])], dtype=np.float32)
+    stages["embed"], embeddings = time_stage(embed, repeat, items=len(texts))
+    stages["chroma_add"], collection = time_stage(
+        lambda: rag.build_vector_database_from_embeddings(ids, texts, embeddings, embedding_function), repeat, items=len(texts))
+
+    def embed_and_add_pipeline():
+        pipeline_collection = rag.get_chroma_client().create_collection(f"bench-{time.perf_counter_ns()}", embedding_function=embedding_function)
+        return embed_and_add(pipeline_collection, ids, texts, embedding_function, max_workers=args.max_workers)
+    stages["embed_and_add"], _ = time_stage(embed_and_add_pipeline, repeat, items=len(texts))
+
+    if len(texts) > args.umap_min_chunks:
+        stages["umap_fit"], projector = time_stage(lambda: set_up_umap(embeddings), repeat, items=len(texts))
+        projections = (projector.embedding_[:, 0], projector.embedding_[:, 1])
+        # UMAP returns the layout of its training data without transforming it, so project unseen
+        # embeddings close to the corpus, as when documents are added
+        unseen = embeddings + np.random.default_rng(0).normal(scale=0.01, size=embeddings.shape).astype(np.float32)
+        stages["projection"], _ = time_stage(lambda: get_projections(unseen, projector), repeat, items=len(texts))
+    else:
+        reason = f"fewer than {args.umap_min_chunks} chunks"
+        stages["umap_fit"] = stages["projection"] = {"skipped": reason}
+        projections = (embeddings[:, 0], embeddings[:, 1])
+
+    queries = make_queries(args.queries)
+    stages["query_chroma"], _ = time_stage(lambda: [rag.query_chroma(collection, query, args.top_k) for query in queries],
+                                           repeat, items=len(queries))
+
+    n_requests = stub.n_requests
+    query_expansion.configure_cache()
+    stages["query_expansion_cold"], _ = time_stage(lambda: query_expansion.expand_queries(queries, "multi_qns"), 1, items=len(queries))
+    stages["query_expansion_cold"]["requests"] = stub.n_requests - n_requests
+    stages["query_expansion_warm"], _ = time_stage(lambda: query_expansion.expand_queries(queries, "multi_qns"), repeat, items=len(queries))
+
+    stages["prepare_projections_df"], df = time_stage(lambda: prepare_projections_df(ids, projections, texts), repeat, items=len(texts))
+    stages["plot_embeddings"], _ = time_stage(lambda: plot_embeddings(df), repeat, items=len(texts))
+    return {"pages": n_pages, "chunks": len(texts), "stages": stages}
+
+def metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Describes the commit, interpreter and settings the benchmarks ran with.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": commit,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "stage_log")}}
+
+def print_results(results: List[dict], baseline: Optional[dict] = None):
+    """
+    Prints the minimum time of every stage, and its ratio to the baseline's if one is given.
+    """
+    baseline_runs = {run["pages"]: run["stages"] for run in (baseline or {}).get("results", [])}
+    for run in results:
+        print(f"{run['pages']} pages, {run['chunks']} chunks")
+        for name, timing in run["stages"].items():
+            if "skipped" in timing:
+                print(f"    {name:<24} skipped ({timing['skipped']})")
+                continue
+            line = f"    {name:<24} {timing['min']:9.4f}s"
+            previous = baseline_runs.get(run["pages"], {}).get(name, {})
+            if "min" in previous and timing["min"] > 0:
+                line += f"   {previous['min'] / timing['min']:6.2f}x vs baseline"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500], help="Corpus sizes, in pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=0)
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of the fake embeddings")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds slept per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds slept per chat completion")
+    parser.add_argument("--max-workers", type=int, default=4, help="Embedding requests in flight")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--umap-min-chunks", type=int, default=20, help="UMAP is skipped below this many chunks")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="A previous results file to compare against")
+    parser.add_argument("--stage-log", help="Also write the instrumented pipeline stages to this JSON lines file")
+    args = parser.parse_args()
+
+    exporter = add_hook(JsonLinesExporter(args.stage_log)) if args.stage_log else None
+    skip_tokens = tokenizer_unavailable_reason()
+    # Compile UMAP's numba functions before anything is timed
+    start = time.perf_counter()
+    warmup_embeddings = np.random.default_rng(0).normal(size=(64, 8)).astype(np.float32)
+    get_projections(warmup_embeddings[:8] + 0.01, set_up_umap(warmup_embeddings))
+    warmup = time.perf_counter() - start
+
+    results = []
+    with StubChatServer(latency=args.llm_latency) as stub, tempfile.TemporaryDirectory() as work_dir:
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+        for n_pages in args.pages:
+            results.append(run_size(n_pages, args, stub, work_dir, skip_tokens))
+    if exporter is not None:
+        remove_hook(exporter)
+        exporter.close()
+
+    report = {"metadata": {**metadata(args), "umap_warmup_seconds": warmup}, "results": results}
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+synthetic.py
+
+Deterministic, offline stand-ins for the inputs and services of the pipeline, used by the
+benchmarks: synthetic documents written as PDF files, a hashing embedding function, and a
+stub OpenAI-compatible chat completion server for query expansion.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+WORDS = ("revenue growth margin cloud segment quarter fiscal operating income expenses increase "
+         "decrease customers products services azure office gaming devices search advertising "
+         "research development marketing sales cash flow dividends shares repurchase tax rate "
+         "currency exchange impact commercial consumer enterprise licensing subscription hardware").split()
+
+def make_pages(n_pages: int, words_per_page: int = 400, seed: int = 0) -> List[str]:
+    """
+    Generates the text of a synthetic report: pages of sentences grouped into paragraphs.
+    """
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(n_pages):
+        paragraphs, n_words = [], 0
+        while n_words < words_per_page:
+            sentences = []
+            for _ in range(rng.randint(2, 5)):
+                sentence = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+                sentences.append(" ".join(sentence).capitalize() + ".")
+                n_words += len(sentence)
+            paragraphs.append(" ".join(sentences))
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+def make_queries(n_queries: int, seed: int = 1) -> List[str]:
+    """
+    Generates questions over the vocabulary of `make_pages`.
+    """
+    rng = random.Random(seed)
+    return [f"What drove the {rng.choice(WORDS)} {rng.choice(WORDS)} in the {rng.choice(WORDS)} {rng.choice(WORDS)}?"
+            for _ in range(n_queries)]
+
+def write_pdf(path: str, pages: List[str], line_length: int = 95):
+    """
+    Writes pages of ASCII text to a minimal PDF file, one text object per page.
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>",
+               f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))}] /Count {len(pages)} >>"]
+    font_id = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        lines = [line for paragraph in text.split("\n") for line in _wrap(paragraph, line_length)]
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        stream = "BT /F1 8 Tf 30 810 Td 9 TL " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    content, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{body}\nendobj\n"
+    xref_offset = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    content += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    with open(path, "wb") as file:
+        file.write(content.encode("latin-1"))
+
+def _wrap(paragraph: str, line_length: int) -> List[str]:
+    """ Greedily wraps a paragraph, keeping an empty line for empty paragraphs """
+    return re.findall(rf"\S.{{0,{line_length - 2}}}\S(?=\s|$)|\S+", paragraph) or [""]
+
+class HashingEmbeddingFunction(EmbeddingFunction):
+    """
+    Embeds texts as normalised, signed bags of hashed words, optionally sleeping per call to
+    emulate the latency of an embedding API. Texts that share words get similar embeddings, so
+    retrieval results are meaningful, and the embeddings do not depend on the batching.
+
+    Args:
+        dimension: The embedding dimension.
+        latency: Seconds slept per call.
+    """
+
+    def __init__(self, dimension: int = 384, latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+
+    def __call__(self, input: Documents) -> Embeddings: # pylint: disable=redefined-builtin
+        if self.latency:
+            time.sleep(self.latency)
+        embeddings = np.zeros((len(input), self.dimension), dtype=np.float32)
+        for row, text in enumerate(input):
+            for word in text.lower().split():
+                hashed = zlib.crc32(word.encode("utf-8"))
+                embeddings[row, hashed % self.dimension] += 1.0 if hashed & 1 << 31 else -1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.where(norms > 0, norms, 1)).tolist()
+
+class StubChatServer:
+    """
+    A local OpenAI-compatible chat completion server with deterministic replies: numbered
+    sub-questions for JSON requests and a templated answer otherwise. Point the OpenAI clients
+    at `base_url`, e.g. with the OPENAI_BASE_URL environment variable.
+
+    Args:
+        latency: Seconds slept per request, to emulate the latency of the API.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.n_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        """ The base URL of the OpenAI API served """
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def __enter__(self) -> "StubChatServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reply(self, request: dict) -> str:
+        """ Returns the completion for a chat completion request """
+        prompt = request["messages"][-1]["content"]
+        if request.get("response_format", {}).get("type") == "json_object":
+            return json.dumps({str(i): f"What is the {word} mentioned in: {prompt}" for i, word in enumerate(prompt.split()[:3], start=1)})
+        return f"The {prompt.rstrip('?').lower()} was driven by <FACTOR> and <FACTOR>."
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """ Serves POST /v1/chat/completions """
+
+            def do_POST(self): # pylint: disable=invalid-name
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub._lock: # pylint: disable=protected-access
+                    stub.n_requests += 1
+                body = json.dumps({
+                    "id": f"stub-{stub.n_requests}",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": request["model"],
+                    "choices": [{"index": 0,
+                                 "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": stub.reply(request)}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args): # pylint: disable=redefined-builtin
+                pass
+
+        return Handler
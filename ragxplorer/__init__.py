@@ -2,8 +2,23 @@
 __init__.py
 
 Initializes the ragxplorer package and exposes the main classes and functions.
+
+The classes are loaded on first access, so that `import ragxplorer` is fast and heavy
+dependencies are only imported by the code paths that need them.
 """
 
-from .ragxplorer import RAGxplorer
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .ragxplorer import RAGxplorer
+
+__all__ = ['RAGxplorer']
+
+def __getattr__(name: str) -> Any:
+    if name == 'RAGxplorer':
+        from .ragxplorer import RAGxplorer # pylint: disable=import-outside-toplevel
+        return RAGxplorer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ['RAGxplorer']
\ No newline at end of file
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,132 @@
+"""
+comparison.py
+
+This module provides the results of `RAGxplorer.compare_models`, which explores one document
+with several embedding models: an explorer per model, with projections aligned onto the first
+model's, the chunks each model retrieved for the comparison queries, and how much the retrieved
+chunks of the models overlap.
+"""
+
+import itertools
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .projections import plot_side_by_side
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import plotly.graph_objs as go
+
+class ModelComparison(BaseModel):
+    """
+    The outcome of comparing embedding models on one document.
+
+    Attributes:
+        models: The embedding models compared. Every model's projections are aligned to the first's.
+        explorers: An explorer loaded with the document for each model.
+        ids: The ids of the chunks, which are the same for every model.
+        projections: The X and Y coordinates of the chunks for each model, after alignment.
+        disparities: For each model, the Procrustes disparity between its projections and the first
+            model's, from 0 for the same layout to 1 for unrelated ones.
+        retrieved_ids: For each model, the chunk ids retrieved for each comparison query, if queries were given.
+        n_chunks: The number of chunks the document was split into.
+        timings: Wall time of each phase of the comparison ('extract', 'chunk', 'expand',
+            'embed_index_and_project', 'retrieve') and of the whole comparison ('total').
+        timings_by_model: For each model, the seconds spent embedding, indexing, projecting and retrieving.
+    """
+    models: List[str]
+    explorers: Dict[str, Any] = Field(default_factory=dict)
+    ids: List[str] = Field(default_factory=list)
+    projections: Dict[str, Any] = Field(default_factory=dict)
+    disparities: Dict[str, float] = Field(default_factory=dict)
+    retrieved_ids: Optional[Dict[str, List[List[str]]]] = None
+    n_chunks: int = 0
+    timings: Dict[str, float] = Field(default_factory=dict)
+    timings_by_model: Dict[str, Dict[str, float]] = Field(default_factory=dict)
+
+    def overlap(self) -> "pd.DataFrame":
+        """
+        Compares the chunks the models retrieved for the comparison queries.
+
+        Returns:
+            pd.DataFrame: For every pair of models, the Jaccard overlap of the chunk ids they retrieved,
+            averaged over the queries, with the models as both index and columns.
+
+        Raises:
+            RuntimeError: If the models were compared without queries.
+        """
+        import pandas as pd # pylint: disable=import-outside-toplevel
+
+        per_query = self.query_overlap()
+        matrix = pd.DataFrame(1.0, index=self.models, columns=self.models)
+        for model_a, model_b in itertools.combinations(self.models, 2):
+            matrix.loc[model_a, model_b] = matrix.loc[model_b, model_a] = per_query[f"{model_a} | {model_b}"].mean()
+        return matrix
+
+    def query_overlap(self) -> "pd.DataFrame":
+        """
+        Compares the chunks the models retrieved for each comparison query.
+
+        Returns:
+            pd.DataFrame: One row per query, with the Jaccard overlap of the chunk ids retrieved by every
+            pair of models, in columns named 'model_a | model_b'.
+
+        Raises:
+            RuntimeError: If the models were compared without queries.
+        """
+        import pandas as pd # pylint: disable=import-outside-toplevel
+
+        if self.retrieved_ids is None:
+            raise RuntimeError("Please compare the models with queries first.")
+        return pd.DataFrame({f"{model_a} | {model_b}": retrieval_overlap(self.retrieved_ids[model_a], self.retrieved_ids[model_b])
+                             for model_a, model_b in itertools.combinations(self.models, 2)})
+
+    def visualize_query(self, query: str, retrieval_method: str = "naive", top_k: int = 5, query_shape_size: int = 5) -> "go.Figure":
+        """
+        Visualize a query, and the chunks each model retrieves for it, with one aligned view per model.
+
+        Args:
+            query (str): The query string to visualize.
+            retrieval_method (str): The method used for document retrieval. Defaults to 'naive'.
+            top_k (int): The number of top documents to retrieve.
+            query_shape_size (int): The size of the shape to represent the query in the plot.
+
+        Returns:
+            go.Figure: A Plotly figure with the view of every model side by side.
+        """
+        return plot_side_by_side([self.explorers[model].visualize_query(query=query,
+                                                                        retrieval_method=retrieval_method,
+                                                                        top_k=top_k,
+                                                                        query_shape_size=query_shape_size)
+                                  for model in self.models],
+                                 titles=self.models)
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """
+        Tabulates the aligned projections of every model.
+
+        Returns:
+            pd.DataFrame: One row per chunk and model, with the 'id', 'model', 'x' and 'y' of the chunk.
+        """
+        import pandas as pd # pylint: disable=import-outside-toplevel
+
+        return pd.concat([pd.DataFrame({"id": self.ids, "model": model, "x": self.projections[model][0], "y": self.projections[model][1]})
+                          for model in self.models], ignore_index=True)
+
+def retrieval_overlap(retrieved_a: List[List[str]], retrieved_b: List[List[str]]) -> List[float]:
+    """
+    Computes the Jaccard overlap of the chunk ids two retrievers returned for each query.
+
+    Args:
+        retrieved_a (List[List[str]]): The chunk ids of each query from the first retriever.
+        retrieved_b (List[List[str]]): The chunk ids of each query from the second retriever.
+
+    Returns:
+        List[float]: The size of the intersection over the size of the union, for each query.
+    """
+    overlaps = []
+    for ids_a, ids_b in zip(retrieved_a, retrieved_b):
+        union = set(ids_a) | set(ids_b)
+        overlaps.append(len(set(ids_a) & set(ids_b)) / len(union) if union else 1.0)
+    return overlaps
@@ -8,6 +8,55 @@ These include settings for embeddings, query expansion, and visualization.
 # Embedding models available for use
 OPENAI_EMBEDDING_MODELS = ["text-embedding-3-small", "text-embedding-3-large", "text-embedding-ada-002"]
 
+# Settings for token-based chunking
+TOKENIZER_MODEL = "sentence-transformers/all-mpnet-base-v2"
+TOKENS_PER_CHUNK = 256  # Maximum number of tokens in one chunk
+TOKENIZER_BATCH_SIZE = 256  # Number of chunks tokenized per call
+
+# Settings for the embedding executor
+EMBEDDING_BATCH_SIZE = 64  # Number of chunks embedded per request
+EMBEDDING_MAX_WORKERS = 4  # Number of embedding requests in flight
+EMBEDDING_MAX_RETRIES = 3  # Number of retries of a failed request
+EMBEDDING_RETRY_BACKOFF = 1.0  # Seconds before the first retry, doubled on each further retry
+
+# Number of precomputed embeddings added to a Chroma collection per call
+CHROMA_ADD_BATCH_SIZE = 5000
+
+# Number of records fetched from a Chroma collection per call
+CHROMA_FETCH_PAGE_SIZE = 10000
+
+# Number of queries sent to a Chroma collection per call
+CHROMA_QUERY_BATCH_SIZE = 256
+
+# Retrieval engines, and the metrics of the in-memory engine
+RETRIEVERS = ["chroma", "numpy"]
+RETRIEVER_METRICS = ["l2", "cosine", "ip"]
+RETRIEVER_BLOCK_SIZE = 2 ** 24  # Number of query-chunk scores computed at once by the in-memory engine
+
+# Rank offset used by reciprocal rank fusion
+RRF_K = 60
+
+# Settings a parameter sweep can vary, by the stage they affect, with their defaults. Settings that
+# are also fields of the explorer default to the explorer's value
+SWEEP_CHUNKING_PARAMS = {"chunk_size": 1000, "chunk_overlap": 0}
+SWEEP_PROJECTION_PARAMS = {"projection_method": "umap", "umap_params": None, "landmark_params": None}
+SWEEP_RETRIEVAL_PARAMS = {"retriever": "chroma", "retriever_params": None, "retrieval_method": "naive", "top_k": 5}
+
+# Maximum size of the on-disk embedding cache
+EMBEDDING_CACHE_MAX_BYTES = 1024 ** 3
+
+# Settings for query expansion
+QUERY_EXPANSION_MODEL = "gpt-4-1106-preview"
+QUERY_EXPANSION_CACHE_SIZE = 1024  # Number of completions kept in memory
+QUERY_EXPANSION_MAX_CONCURRENCY = 8  # Number of completion requests in flight at once
+
+# Thresholds above which the projector is refitted after chunks are added
+REFIT_GROWTH_THRESHOLD = 0.25  # Chunks added since the last fit, as a fraction of the chunks it was fitted on
+REFIT_DRIFT_THRESHOLD = 0.1  # Shift of the mean embedding since the last fit, relative to the spread of the embeddings
+
+# Number of queries whose embeddings, projections and retrieved chunks are cached
+QUERY_CACHE_SIZE = 256
+
 # Prompts for Query Expansion
 MULTIPLE_QNS_SYS_MSG = ("Given a question, your task is to generate 3 to 5 simple sub-questions related to the original question. "
                         "These sub-questions are to be short. Format your reply in json with numbered keys. "
@@ -19,8 +68,23 @@ HYDE_SYS_MSG = ("Given a question, your task is to craft a template for the hypo
                 "FOR EXAMPLE: INPUT: 'What is the revenue of microsoft in 2021 and 2022?' "
                 "OUTPUT: 'Microsoft's 2021 and 2022 revenue is <MONETARY SUM> and <MONETARY SUM> respectively.'")
 
+# Constants for projections
+PROJECTION_METHODS = ["umap", "pca", "incremental_pca", "random_projection"]
+PROJECTION_BATCH_SIZE = 1024  # Number of embeddings transformed per block
+PROJECTION_MIN_ROWS_PER_WORKER = 10000  # Number of embeddings that make a worker process pay for its start-up
+
+# Constants for landmark fitting
+LANDMARK_METHODS = ["random", "kmeans"]
+LANDMARK_SAMPLE_SIZE = 10000  # Number of embeddings the projector is fitted on
+LANDMARK_N_CLUSTERS = 50  # Number of k-means strata used to pick landmarks
+
 # Constants for plots
 PLOT_SIZE = 3
+RENDER_MODES = ["auto", "standard", "large"]
+LARGE_CORPUS_THRESHOLD = 50000  # Number of chunks above which 'auto' switches to the large-corpus mode
+LOD_MAX_POINTS = 20000  # Number of chunks drawn individually in the large-corpus mode
+DENSITY_BINS = 200  # Number of bins per axis of the corpus density background
+HOVER_TEXT_MAX_CHARS = 300  # Length hover text is truncated to in the large-corpus mode
 
 # Settings for data visualization
 VISUALISATION_SETTINGS = {
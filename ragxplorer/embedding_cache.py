@@ -0,0 +1,261 @@
+"""
+embedding_cache.py
+
+This module provides a persistent, content-addressed cache for chunk embeddings.
+Vectors are keyed by (model name, chunk-text hash) and stored as float32 rows in one
+memory-mapped file per model, with a SQLite index recording where each vector lives.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Union
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from .constants import EMBEDDING_CACHE_MAX_BYTES
+
+class EmbeddingCache:
+    """
+    On-disk store of embeddings, evicting the least recently used vectors once the
+    stored vectors exceed `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stores: Dict[str, np.memmap] = {}
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS stores (model TEXT PRIMARY KEY, dim INTEGER, n_slots INTEGER);
+            CREATE TABLE IF NOT EXISTS vectors (model TEXT, key TEXT, slot INTEGER, last_used REAL,
+                                                PRIMARY KEY (model, key));
+            CREATE TABLE IF NOT EXISTS free_slots (model TEXT, slot INTEGER);
+            CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used);
+        """)
+        self._db.commit()
+
+    def get_many(self, model_name: str, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Looks up cached embeddings.
+
+        Args:
+            model_name (str): The embedding model the vectors were produced by.
+            keys (Iterable[str]): The text hashes to look up.
+
+        Returns:
+            Dict[str, np.ndarray]: The cached float32 vectors, keyed by text hash. Missing keys are left out.
+        """
+        keys = list(set(keys))
+        found = {}
+        with self._lock:
+            store = self._open_store(model_name)
+            if store is None:
+                return found
+            # Stay under SQLite's limit on the number of bound parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, slot FROM vectors WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    [model_name, *batch]
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = np.array(store[slot])
+            now = time.time()
+            self._db.executemany("UPDATE vectors SET last_used = ? WHERE model = ? AND key = ?",
+                                 [(now, model_name, key) for key in found])
+            self._db.commit()
+        return found
+
+    def put_many(self, model_name: str, vectors: Dict[str, Any]):
+        """
+        Stores embeddings, then evicts the least recently used ones if the cache is over its size limit.
+
+        Args:
+            model_name (str): The embedding model the vectors were produced by.
+            vectors (Dict[str, Any]): The vectors to store, keyed by text hash.
+        """
+        if not vectors:
+            return
+        keys = list(vectors)
+        matrix = np.asarray([vectors[key] for key in keys], dtype=np.float32)
+        with self._lock:
+            store = self._open_store(model_name)
+            if store is None:
+                self._db.execute("INSERT INTO stores VALUES (?, ?, 0)", (model_name, matrix.shape[1]))
+            elif store.shape[1] != matrix.shape[1]:
+                raise ValueError(f"Expected {store.shape[1]}-dimensional embeddings for {model_name}, got {matrix.shape[1]}.")
+            slots = self._allocate_slots(model_name, keys)
+            store = self._open_store(model_name)
+            store[slots] = matrix
+            store.flush()
+            now = time.time()
+            self._db.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?)",
+                                 [(model_name, key, int(slot), now) for key, slot in zip(keys, slots)])
+            self._evict()
+            self._db.commit()
+
+    def size_bytes(self) -> int:
+        """ Returns the number of bytes taken up by the cached vectors """
+        with self._lock:
+            return self._size_bytes()
+
+    def close(self):
+        """ Closes the index and the vector files """
+        with self._lock:
+            self._stores.clear()
+            self._db.close()
+
+    def _size_bytes(self) -> int:
+        """ Returns the number of bytes taken up by the cached vectors, without taking the lock """
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(stores.dim * 4), 0) FROM vectors JOIN stores ON vectors.model = stores.model"
+        ).fetchone()
+        return row[0]
+
+    def _allocate_slots(self, model_name: str, keys: List[str]) -> np.ndarray:
+        """
+        Finds a slot for every key, reusing existing and evicted slots before growing the vector file.
+        """
+        slots = []
+        for key in keys:
+            row = self._db.execute("SELECT slot FROM vectors WHERE model = ? AND key = ?", (model_name, key)).fetchone()
+            if row is None:
+                row = self._db.execute("SELECT rowid, slot FROM free_slots WHERE model = ? LIMIT 1", (model_name,)).fetchone()
+                if row is not None:
+                    self._db.execute("DELETE FROM free_slots WHERE rowid = ?", (row[0],))
+                    row = (row[1],)
+            slots.append(None if row is None else row[0])
+
+        n_new = slots.count(None)
+        if n_new:
+            dim, n_slots = self._db.execute("SELECT dim, n_slots FROM stores WHERE model = ?", (model_name,)).fetchone()
+            new_slots = iter(range(n_slots, n_slots + n_new))
+            slots = [next(new_slots) if slot is None else slot for slot in slots]
+            # Grow geometrically so that repeated small inserts do not resize the file every time
+            path = self._store_path(model_name)
+            capacity = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+            if n_slots + n_new > capacity:
+                with open(path, "ab") as file:
+                    file.truncate(max(n_slots + n_new, 2 * capacity) * dim * 4)
+                self._stores.pop(model_name, None)
+            self._db.execute("UPDATE stores SET n_slots = ? WHERE model = ?", (n_slots + n_new, model_name))
+        return np.asarray(slots)
+
+    def _evict(self):
+        """
+        Frees the least recently used vectors until the cache is within its size limit.
+        """
+        excess = self._size_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self._db.execute(
+            "SELECT vectors.model, vectors.key, vectors.slot, stores.dim FROM vectors "
+            "JOIN stores ON vectors.model = stores.model ORDER BY vectors.last_used"
+        )
+        evicted = []
+        for model_name, key, slot, dim in rows:
+            if excess <= 0:
+                break
+            evicted.append((model_name, key, slot))
+            excess -= dim * 4
+        self._db.executemany("DELETE FROM vectors WHERE model = ? AND key = ?",
+                             [(model_name, key) for model_name, key, _ in evicted])
+        self._db.executemany("INSERT INTO free_slots VALUES (?, ?)",
+                             [(model_name, slot) for model_name, _, slot in evicted])
+
+    def _open_store(self, model_name: str) -> Union[np.memmap, None]:
+        """
+        Returns the memory-mapped vector file of a model, or None if nothing was cached for it yet.
+        """
+        if model_name not in self._stores:
+            row = self._db.execute("SELECT dim FROM stores WHERE model = ?", (model_name,)).fetchone()
+            path = self._store_path(model_name)
+            if row is None or not os.path.exists(path) or os.path.getsize(path) == 0:
+                return None
+            dim = row[0]
+            self._stores[model_name] = np.memmap(path, dtype=np.float32, mode="r+",
+                                                 shape=(os.path.getsize(path) // (dim * 4), dim))
+        return self._stores[model_name]
+
+    def _store_path(self, model_name: str) -> str:
+        """ Returns the path of the vector file of a model """
+        return os.path.join(self.cache_dir, hashlib.sha1(model_name.encode()).hexdigest()[:16] + ".f32")
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function that only calls the wrapped embedding function for chunks
+    that are not in the cache yet. Identical chunks within one call are embedded once.
+    """
+
+    def __init__(self, embedding_function: EmbeddingFunction, model_name: str, cache: EmbeddingCache):
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+        self.cache = cache
+
+    def __call__(self, input: Documents) -> Embeddings: # pylint: disable=redefined-builtin
+        if isinstance(input, str):
+            return self([input])[0]
+        keys = [hash_text(text) for text in input]
+        vectors = self.cache.get_many(self.model_name, keys)
+        missing = {key: text for key, text in zip(keys, input) if key not in vectors}
+        if missing:
+            new_vectors = dict(zip(missing, self.embedding_function(list(missing.values()))))
+            self.cache.put_many(self.model_name, new_vectors)
+            vectors.update({key: np.asarray(vector, dtype=np.float32) for key, vector in new_vectors.items()})
+        return [vectors[key].tolist() for key in keys]
+
+class MemoEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function that keeps every embedding it returns in memory, so that explorers
+    sharing it embed each distinct text only once. Safe to call from several threads.
+    """
+
+    def __init__(self, embedding_function: EmbeddingFunction):
+        self.embedding_function = embedding_function
+        self.n_embedded = 0
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, input: Documents) -> Embeddings: # pylint: disable=redefined-builtin
+        if isinstance(input, str):
+            return self([input])[0]
+        return [vector.tolist() for vector in self._lookup(input)]
+
+    def embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds texts, only calling the wrapped embedding function for texts it has not embedded yet.
+
+        Returns:
+            np.ndarray: A (n_texts, dimension) float32 array of embeddings.
+        """
+        return np.stack(self._lookup(texts)) if len(texts) else np.empty((0, 0), dtype=np.float32)
+
+    def _lookup(self, texts: List[str]) -> List[np.ndarray]:
+        """ Returns the embedding of every text, embedding the missing ones with one call """
+        with self._lock:
+            missing = list(dict.fromkeys(text for text in texts if text not in self._vectors))
+        if missing:
+            new_vectors = np.asarray(self.embedding_function(missing), dtype=np.float32)
+            with self._lock:
+                self._vectors.update(zip(missing, new_vectors))
+                self.n_embedded += len(missing)
+        with self._lock:
+            return [self._vectors[text] for text in texts]
+
+def hash_text(text: str) -> str:
+    """
+    Hashes a chunk of text for use as a cache key.
+
+    Args:
+        text (str): The chunk to hash.
+
+    Returns:
+        str: The hex digest of the text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,198 @@
+"""
+embedding_executor.py
+
+This module provides a batched, concurrent embedding stage for populating Chroma collections.
+Chunks are embedded in fixed-size batches on a thread pool that keeps a bounded number of
+requests in flight, each batch is retried with exponential backoff, and finished batches are
+added to the collection as they come back. A text that is already being embedded, e.g. a chunk
+repeated on every page, is not embedded again: it reuses the embedding of its first occurrence.
+"""
+
+import contextvars
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .constants import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_WORKERS,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BACKOFF
+    )
+from .instrumentation import stage
+
+if TYPE_CHECKING:
+    import chromadb
+
+def embed_and_add(chroma_collection: "chromadb.Collection",
+                  ids: Iterable[str],
+                  documents: Iterable[str],
+                  embedding_function: Callable[[List[str]], Any],
+                  metadatas: Optional[Iterable[dict]] = None,
+                  batch_size: int = EMBEDDING_BATCH_SIZE,
+                  max_workers: int = EMBEDDING_MAX_WORKERS,
+                  max_retries: int = EMBEDDING_MAX_RETRIES,
+                  retry_backoff: float = EMBEDDING_RETRY_BACKOFF) -> int:
+    """
+    Embeds documents in batches and adds them to a Chroma collection.
+
+    The inputs are consumed lazily, so they may be generators. Batches are added to the
+    collection in input order, which keeps the collection deterministic regardless of
+    `max_workers`. Only the first occurrence of a document among the batches in flight is
+    embedded, and its repeats reuse that embedding.
+
+    Args:
+        chroma_collection: The Chroma collection to populate.
+        ids: The ids of the documents.
+        documents: The documents to embed.
+        embedding_function: Called with a list of documents, returns one embedding per document.
+        metadatas: Optional metadata for each document.
+        batch_size: The number of documents embedded per request.
+        max_workers: The maximum number of requests in flight.
+        max_retries: The number of times a failed batch is retried.
+        retry_backoff: Seconds to wait before the first retry, doubling on every further retry.
+
+    Returns:
+        The number of documents added.
+
+    Raises:
+        RuntimeError: If a batch still fails after all retries.
+    """
+    if batch_size < 1 or max_workers < 1:
+        raise ValueError("batch_size and max_workers must be positive integers.")
+    rows = zip(ids, documents) if metadatas is None else zip(ids, documents, metadatas)
+    n_added = 0
+    in_flight = deque()
+    # The (future, position) of the embedding of every document submitted by a batch in flight
+    pending = {}
+
+    def add_next_batch() -> int:
+        batch, sources, batch_documents = in_flight.popleft()
+        n_batch = _add_batch(chroma_collection, batch, sources)
+        for document in batch_documents:
+            del pending[document]
+        return n_batch
+
+    with stage("embed_and_add", batch_size=batch_size, max_workers=max_workers) as embed_and_add_stage, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in _batched(rows, batch_size):
+            if len(in_flight) >= max_workers:
+                n_added += add_next_batch()
+            batch_documents = [document for document in dict.fromkeys(row[1] for row in batch) if document not in pending]
+            if batch_documents:
+                # Run in a copy of the current context, so the embedding stages nest under this one
+                future = executor.submit(contextvars.copy_context().run, _embed_with_retries,
+                                         embedding_function, batch_documents, max_retries, retry_backoff)
+                pending.update((document, (future, i)) for i, document in enumerate(batch_documents))
+            in_flight.append((batch, [pending[row[1]] for row in batch], batch_documents))
+        while in_flight:
+            n_added += add_next_batch()
+        embed_and_add_stage.add(items=n_added)
+    return n_added
+
+def embed_texts(texts: List[str],
+                embedding_function: Callable[[List[str]], Any],
+                batch_size: int = EMBEDDING_BATCH_SIZE,
+                max_workers: int = EMBEDDING_MAX_WORKERS,
+                max_retries: int = EMBEDDING_MAX_RETRIES,
+                retry_backoff: float = EMBEDDING_RETRY_BACKOFF) -> np.ndarray:
+    """
+    Embeds texts in batches on a thread pool, without adding them to a collection. Each distinct
+    text is embedded once.
+
+    Args:
+        texts: The texts to embed.
+        embedding_function: Called with a list of texts, returns one embedding per text.
+        batch_size: The number of texts embedded per request.
+        max_workers: The maximum number of requests in flight.
+        max_retries: The number of times a failed batch is retried.
+        retry_backoff: Seconds to wait before the first retry, doubling on every further retry.
+
+    Returns:
+        A (n_texts, dimension) float32 array of embeddings, in the order of `texts`.
+
+    Raises:
+        RuntimeError: If a batch still fails after all retries.
+    """
+    if batch_size < 1 or max_workers < 1:
+        raise ValueError("batch_size and max_workers must be positive integers.")
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    positions = {}
+    for text in texts:
+        positions.setdefault(text, len(positions))
+    unique_texts = list(positions)
+    batches = [unique_texts[start:start + batch_size] for start in range(0, len(unique_texts), batch_size)]
+    with stage("embed_texts", batch_size=batch_size, max_workers=max_workers) as embed_stage, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _embed_with_retries,
+                                   embedding_function, batch, max_retries, retry_backoff)
+                   for batch in batches]
+        embeddings = np.asarray([embedding for future in futures for embedding in future.result()], dtype=np.float32)
+        embed_stage.add(items=len(texts))
+    return embeddings[[positions[text] for text in texts]]
+
+def _add_batch(chroma_collection: "chromadb.Collection", batch: List[tuple], sources: List[Tuple[Any, int]]) -> int:
+    """
+    Waits for the embeddings of a batch, then adds it to the collection.
+
+    Args:
+        chroma_collection: The Chroma collection to populate.
+        batch: The (id, document[, metadata]) rows of the batch.
+        sources: For each row, the future embedding its document and the position of the document in it.
+
+    Returns:
+        The number of documents added.
+    """
+    embeddings = [list(map(float, future.result()[position])) for future, position in sources]
+    columns = list(zip(*batch))
+    with stage("chroma_add") as add_stage:
+        chroma_collection.add(ids=list(columns[0]),
+                              documents=list(columns[1]),
+                              embeddings=embeddings,
+                              metadatas=list(columns[2]) if len(columns) > 2 else None)
+        add_stage.add(items=len(batch))
+    return len(batch)
+
+def _embed_with_retries(embedding_function: Callable[[List[str]], Any], documents: List[str], max_retries: int, retry_backoff: float) -> Any:
+    """
+    Embeds one batch, retrying with exponential backoff on failure.
+
+    Args:
+        embedding_function: Called with a list of documents, returns one embedding per document.
+        documents: The documents to embed.
+        max_retries: The number of times a failed batch is retried.
+        retry_backoff: Seconds to wait before the first retry, doubling on every further retry.
+
+    Returns:
+        The embeddings of the batch.
+
+    Raises:
+        RuntimeError: If the batch still fails after all retries.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            with stage("embed", attempt=attempt) as embed_stage:
+                embeddings = embedding_function(documents)
+                embed_stage.add(items=len(documents), bytes=sum(len(document) for document in documents))
+        except Exception as e: # pylint: disable=broad-except
+            if attempt == max_retries:
+                raise RuntimeError(f"Error in embedding batch after {max_retries + 1} attempts: {e}") from e
+            time.sleep(retry_backoff * 2 ** attempt)
+        else:
+            if len(embeddings) != len(documents):
+                raise RuntimeError(f"Expected {len(documents)} embeddings, got {len(embeddings)}.")
+            return embeddings
+    return None
+
+def _batched(rows: Iterable[tuple], batch_size: int) -> Iterator[List[tuple]]:
+    """
+    Groups rows into lists of at most `batch_size` rows.
+    """
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
@@ -0,0 +1,340 @@
+"""
+instrumentation.py
+
+This module provides structured instrumentation of the pipeline stages: extracting, chunking,
+embedding and inserting documents, fitting projectors, projecting, expanding and visualising
+queries, and plotting. Each stage records its wall time, item count, bytes processed and the
+memory high-water mark of the process, and is reported to the registered hooks as it starts
+and ends.
+
+Hooks are user callbacks, `StageRecorder` to summarise a run, or the exporters for JSON lines
+logs and OpenTelemetry spans. While no hook is registered, `stage` returns a shared no-op
+stage, so instrumented code only pays for one function call per stage.
+
+Example:
+    recorder = StageRecorder()
+    add_hook(recorder)
+    explorer.load_pdf("report.pdf")
+    remove_hook(recorder)
+    print(recorder.summary())
+"""
+
+import contextvars
+import itertools
+import json
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TextIO, Union
+
+from pydantic import BaseModel, Field
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+class StageEvent(BaseModel):
+    """
+    A pipeline stage, as reported to hooks. When a stage starts, only its name, ids, start time
+    and attributes are set.
+
+    Attributes:
+        name: The name of the stage, e.g. 'build_vector_database' or 'embed'.
+        stage_id: A unique id of the stage in this process.
+        parent_id: The id of the stage this stage ran in, if any.
+        thread: The name of the thread the stage ran in.
+        start_time: The time the stage started, in seconds since the epoch.
+        duration: The wall time of the stage in seconds.
+        items: The number of items (pages, chunks, embeddings, points, ...) the stage processed.
+        bytes: The number of bytes the stage processed.
+        max_rss_bytes: The peak resident memory of the process when the stage ended.
+        attributes: Settings of the stage, e.g. the batch size or retrieval method.
+        error: The error raised in the stage, if any.
+    """
+    name: str
+    stage_id: int
+    parent_id: Optional[int] = None
+    thread: Optional[str] = None
+    start_time: float
+    duration: Optional[float] = None
+    items: Optional[int] = None
+    bytes: Optional[int] = None
+    max_rss_bytes: Optional[int] = None
+    attributes: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
+
+class StageHook:
+    """
+    Base class of hooks notified when stages start and end. Hooks may be called from several
+    threads at once.
+    """
+
+    def on_start(self, event: StageEvent):
+        """ Called when a stage starts """
+
+    def on_end(self, event: StageEvent):
+        """ Called when a stage ends """
+
+class _CallbackHook(StageHook):
+    """
+    Calls a function with each stage as it ends.
+    """
+
+    def __init__(self, callback: Callable[[StageEvent], Any]):
+        self.callback = callback
+
+    def on_end(self, event: StageEvent):
+        self.callback(event)
+
+# Hooks are replaced rather than mutated, so stages can read them without taking the lock
+_hooks = ()
+_hooks_lock = threading.Lock()
+_stage_ids = itertools.count(1)
+_current_stage = contextvars.ContextVar("ragxplorer_stage", default=None)
+
+def add_hook(hook: Union[StageHook, Callable[[StageEvent], Any]]) -> StageHook:
+    """
+    Registers a hook to be notified of every stage. Instrumentation is enabled while at least
+    one hook is registered.
+
+    Args:
+        hook: A `StageHook`, or a function called with each `StageEvent` when the stage ends.
+
+    Returns:
+        StageHook: The registered hook.
+    """
+    global _hooks # pylint: disable=global-statement
+    if not isinstance(hook, StageHook):
+        hook = _CallbackHook(hook)
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+    return hook
+
+def remove_hook(hook: Union[StageHook, Callable[[StageEvent], Any]]):
+    """
+    Unregisters a hook, given either the hook or the function passed to `add_hook`.
+    """
+    global _hooks # pylint: disable=global-statement
+    with _hooks_lock:
+        _hooks = tuple(registered for registered in _hooks
+                       if registered is not hook and getattr(registered, "callback", None) is not hook)
+
+def enabled() -> bool:
+    """
+    Returns whether any hook is registered.
+    """
+    return bool(_hooks)
+
+class _Stage:
+    """
+    A running stage, updated by the instrumented code and reported to the hooks on exit.
+    """
+    __slots__ = ("event", "_hooks", "_start", "_token")
+
+    def __init__(self, name: str, hooks: tuple, attributes: Dict[str, Any]):
+        parent = _current_stage.get()
+        self.event = StageEvent(name=name,
+                                stage_id=next(_stage_ids),
+                                parent_id=None if parent is None else parent.event.stage_id,
+                                thread=threading.current_thread().name,
+                                start_time=time.time(),
+                                attributes=attributes)
+        self._hooks = hooks
+        self._start = None
+        self._token = None
+
+    def add(self, items: int = 0, bytes: int = 0): # pylint: disable=redefined-builtin
+        """ Adds to the items and bytes processed by the stage """
+        if items:
+            self.event.items = (self.event.items or 0) + items
+        if bytes:
+            self.event.bytes = (self.event.bytes or 0) + bytes
+
+    def set(self, **attributes):
+        """ Sets attributes of the stage """
+        self.event.attributes.update(attributes)
+
+    def __enter__(self) -> "_Stage":
+        for hook in self._hooks:
+            hook.on_start(self.event)
+        self._token = _current_stage.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.event.duration = time.perf_counter() - self._start
+        _current_stage.reset(self._token)
+        self.event.max_rss_bytes = _max_rss_bytes()
+        if exc_value is not None:
+            self.event.error = f"{exc_type.__name__}: {exc_value}"
+        for hook in self._hooks:
+            hook.on_end(self.event)
+        return False
+
+class _NullStage:
+    """
+    The stage returned while instrumentation is disabled. It records nothing.
+    """
+    __slots__ = ()
+
+    def add(self, items: int = 0, bytes: int = 0): # pylint: disable=redefined-builtin,unused-argument
+        """ Does nothing """
+
+    def set(self, **attributes):
+        """ Does nothing """
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+def stage(name: str, **attributes) -> Union[_Stage, _NullStage]:
+    """
+    Instruments a block of code as a pipeline stage. Stages opened inside the block, including
+    in threads and tasks started with its context, are recorded as its children.
+
+    Example:
+        with stage("embed", batch_size=32) as embed_stage:
+            embeddings = embedding_function(documents)
+            embed_stage.add(items=len(documents), bytes=sum(map(len, documents)))
+
+    Args:
+        name: The name of the stage.
+        **attributes: JSON-serialisable settings of the stage.
+
+    Returns:
+        A context manager whose `add(items, bytes)` and `set(**attributes)` methods record what
+        the stage processed.
+    """
+    hooks = _hooks
+    if not hooks:
+        return _NULL_STAGE
+    return _Stage(name, hooks, attributes)
+
+def _max_rss_bytes() -> Optional[int]:
+    """
+    Returns the peak resident memory of the process in bytes, if the platform reports it.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+class StageRecorder(StageHook):
+    """
+    Collects every finished stage in memory, and summarises them per stage name.
+    """
+
+    def __init__(self):
+        self.events: List[StageEvent] = []
+        self._lock = threading.Lock()
+
+    def on_end(self, event: StageEvent):
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Summarises the recorded stages.
+
+        Returns:
+            dict: For each stage name, in the order the stages first ended, the number of times it
+            ran, its total wall time in seconds, the total items and bytes it processed, and the
+            highest memory high-water mark it ended with.
+        """
+        totals = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            total = totals.setdefault(event.name, {"count": 0, "duration": 0.0, "items": 0, "bytes": 0, "max_rss_bytes": None})
+            total["count"] += 1
+            total["duration"] += event.duration or 0.0
+            total["items"] += event.items or 0
+            total["bytes"] += event.bytes or 0
+            if event.max_rss_bytes is not None:
+                total["max_rss_bytes"] = max(total["max_rss_bytes"] or 0, event.max_rss_bytes)
+        return totals
+
+    def clear(self):
+        """ Drops the recorded stages """
+        with self._lock:
+            self.events = []
+
+class JsonLinesExporter(StageHook):
+    """
+    Appends every finished stage to a JSON lines log, one JSON object per line.
+
+    Args:
+        file: A path to append to, or an open text file.
+    """
+
+    def __init__(self, file: Union[str, TextIO]):
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, "a", encoding="utf-8") if self._owns_file else file # pylint: disable=consider-using-with
+        self._lock = threading.Lock()
+
+    def on_end(self, event: StageEvent):
+        line = json.dumps(event.model_dump(), default=str)
+        with self._lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        """ Closes the log, if it was opened from a path """
+        if self._owns_file:
+            self.file.close()
+
+class OpenTelemetryExporter(StageHook):
+    """
+    Reports every stage as an OpenTelemetry span, nested like the stages. Spans are created with
+    the given tracer, or the global tracer provider's, so they are exported wherever the
+    application's OpenTelemetry SDK is configured to send them.
+
+    Args:
+        tracer: The OpenTelemetry tracer to create spans with.
+    """
+
+    def __init__(self, tracer: Any = None):
+        # Imported here, so that opentelemetry is only needed when spans are exported
+        from opentelemetry import trace # pylint: disable=import-outside-toplevel
+
+        self._trace = trace
+        self.tracer = tracer if tracer is not None else trace.get_tracer("ragxplorer")
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def on_start(self, event: StageEvent):
+        with self._lock:
+            parent = self._spans.get(event.parent_id)
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        span = self.tracer.start_span(event.name,
+                                      context=context,
+                                      start_time=int(event.start_time * 1e9),
+                                      attributes=_span_attributes(event.attributes))
+        with self._lock:
+            self._spans[event.stage_id] = span
+
+    def on_end(self, event: StageEvent):
+        with self._lock:
+            span = self._spans.pop(event.stage_id, None)
+        if span is None:
+            return
+        span.set_attributes(_span_attributes({**event.attributes,
+                                              "items": event.items,
+                                              "bytes": event.bytes,
+                                              "max_rss_bytes": event.max_rss_bytes}))
+        if event.error is not None:
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, event.error))
+        span.end(end_time=int((event.start_time + event.duration) * 1e9))
+
+def _span_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts stage attributes to OpenTelemetry span attributes, which must be primitive values.
+    """
+    return {f"ragxplorer.{key}": value if isinstance(value, (bool, int, float, str)) else str(value)
+            for key, value in attributes.items() if value is not None}
@@ -0,0 +1,111 @@
+"""
+persistence.py
+
+This module saves and loads explorer sessions. A session is a directory holding a JSON
+manifest, the document ids and text as UTF-8 blobs with offset arrays, the embeddings and
+projections as float32 `.npy` arrays, and the fitted projector. Arrays are memory-mapped on load,
+so even large sessions open in seconds. The base visualisation dataframe is not saved: it is
+rebuilt from the ids, text and projections.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SESSION_FORMAT_VERSION = 1
+
+def save_session(path: str,
+                 manifest: Dict[str, Any],
+                 ids: List[str],
+                 text: List[str],
+                 embeddings: Any,
+                 projections: Optional[Any] = None,
+                 projector: Optional[Any] = None):
+    """
+    Saves an explorer session to a directory.
+
+    Args:
+        path: The directory to save the session to. It is created if needed.
+        manifest: JSON-serialisable settings of the explorer.
+        ids: The document ids.
+        text: The document text.
+        embeddings: The document embeddings.
+        projections: The X and Y coordinates of the document projections.
+        projector: The fitted projector.
+    """
+    import joblib # pylint: disable=import-outside-toplevel
+
+    os.makedirs(path, exist_ok=True)
+    _write_strings(os.path.join(path, "ids"), ids)
+    _write_strings(os.path.join(path, "text"), text)
+    np.save(os.path.join(path, "embeddings.npy"), np.asarray(embeddings, dtype=np.float32))
+    if projections is not None:
+        np.save(os.path.join(path, "projections.npy"), np.column_stack(projections).astype(np.float32))
+    if projector is not None:
+        joblib.dump(projector, os.path.join(path, "projector.joblib"))
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump({"format_version": SESSION_FORMAT_VERSION, **manifest}, file, indent=2)
+
+def load_session(path: str) -> Dict[str, Any]:
+    """
+    Loads an explorer session saved by `save_session`.
+
+    Args:
+        path: The directory the session was saved to.
+
+    Returns:
+        A dictionary with the manifest and the saved data. Embeddings and projections are
+        read-only memory-mapped arrays. Missing optional parts are None.
+
+    Raises:
+        FileNotFoundError: If the directory does not contain a saved session.
+        ValueError: If the session was saved in an unsupported format.
+    """
+    import joblib # pylint: disable=import-outside-toplevel
+
+    manifest_path = os.path.join(path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No saved session found at {path}.")
+    with open(manifest_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("format_version") != SESSION_FORMAT_VERSION:
+        raise ValueError(f"Unsupported session format version: {manifest.get('format_version')}.")
+
+    projections = _load_optional(os.path.join(path, "projections.npy"), lambda file: np.load(file, mmap_mode="r"))
+    return {
+        "manifest": manifest,
+        "ids": _read_strings(os.path.join(path, "ids")),
+        "text": _read_strings(os.path.join(path, "text")),
+        "embeddings": np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r"),
+        "projections": None if projections is None else (projections[:, 0], projections[:, 1]),
+        "projector": _load_optional(os.path.join(path, "projector.joblib"), joblib.load),
+    }
+
+def _write_strings(prefix: str, strings: List[str]):
+    """
+    Writes strings as one UTF-8 blob, plus an array of the offsets where each string ends.
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    with open(prefix + ".bin", "wb") as file:
+        for string in encoded:
+            file.write(string)
+    np.save(prefix + "_offsets.npy", np.cumsum([len(string) for string in encoded], dtype=np.int64))
+
+def _read_strings(prefix: str) -> List[str]:
+    """
+    Reads strings written by `_write_strings`.
+    """
+    ends = np.load(prefix + "_offsets.npy")
+    if len(ends) == 0:
+        return []
+    blob = np.memmap(prefix + ".bin", dtype=np.uint8, mode="r") if ends[-1] > 0 else np.empty(0, dtype=np.uint8)
+    starts = np.concatenate(([0], ends[:-1]))
+    return [bytes(blob[start:end]).decode("utf-8") for start, end in zip(starts, ends)]
+
+def _load_optional(path: str, loader: Any) -> Any:
+    """
+    Loads a file with the given loader, or returns None if the file does not exist.
+    """
+    return loader(path) if os.path.exists(path) else None
@@ -1,22 +1,115 @@
 """
 This module provides functionalities for projecting high-dimensional data (embeddings)
-into a lower-dimensional space for visualization, using UMAP (Uniform Manifold Approximation and Projection).
+into a lower-dimensional space for visualization, using UMAP (Uniform Manifold Approximation and Projection)
+or one of the faster linear projectors (PCA, incremental PCA and sparse random projection).
 """
 
 import os
-from typing import Tuple, List
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Tuple, List
 
 import numpy as np
-import umap
-import pandas as pd
-import plotly.graph_objs as go
-from tqdm import tqdm
 
-from .constants import VISUALISATION_SETTINGS, PLOT_SIZE
+from .constants import (
+    VISUALISATION_SETTINGS,
+    PLOT_SIZE,
+    RENDER_MODES,
+    LARGE_CORPUS_THRESHOLD,
+    LOD_MAX_POINTS,
+    DENSITY_BINS,
+    HOVER_TEXT_MAX_CHARS,
+    PROJECTION_BATCH_SIZE,
+    PROJECTION_METHODS,
+    PROJECTION_MIN_ROWS_PER_WORKER,
+    LANDMARK_METHODS,
+    LANDMARK_SAMPLE_SIZE,
+    LANDMARK_N_CLUSTERS
+    )
+from .instrumentation import stage
+
+# joblib, pandas, plotly, sklearn and umap are slow to import, so they are only imported by
+# the functions that use them
+if TYPE_CHECKING:
+    import pandas as pd
+    import plotly.graph_objs as go
+    from plotly.basedatatypes import BaseTraceType
+    import umap
 
 os.environ['TOKENIZERS_PARALLELISM'] = 'false'
 
-def set_up_umap(embeddings: np.ndarray, umap_params:dict = None) -> umap.UMAP:
+def set_up_projector(embeddings: np.ndarray, projection_method: str = "umap", projector_params: dict = None, landmark_params: dict = None) -> Any:
+    """
+    Sets up and fits a projector of the chosen type to the given embeddings.
+
+    Args:
+        embeddings (np.ndarray): An array of embeddings to fit the projector.
+        projection_method (str): One of 'umap', 'pca', 'incremental_pca' or 'random_projection'.
+        projector_params (dict): Keyword arguments passed to the projector's constructor.
+        landmark_params (dict): If given, the projector is only fitted on a sample of landmark embeddings.
+            See `select_landmarks` for the supported keys.
+
+    Returns:
+        Any: A fitted projector.
+
+    Raises:
+        ValueError: If the projection method is not supported.
+    """
+    if projection_method not in PROJECTION_METHODS:
+        raise ValueError(f"Invalid projection method. Please use one of {', '.join(PROJECTION_METHODS)}.")
+    if landmark_params is not None:
+        # 'n_jobs' only applies to the streaming projection in `fit_projections`
+        select_params = {key: value for key, value in landmark_params.items() if key != 'n_jobs'}
+        embeddings = np.asarray(embeddings)
+        landmarks = select_landmarks(embeddings, **select_params)
+        return set_up_projector(embeddings=embeddings[landmarks],
+                                projection_method=projection_method,
+                                projector_params=projector_params)
+    if projection_method == "umap":
+        return set_up_umap(embeddings=embeddings, umap_params=projector_params)
+
+    from sklearn.decomposition import PCA, IncrementalPCA # pylint: disable=import-outside-toplevel
+    from sklearn.random_projection import SparseRandomProjection # pylint: disable=import-outside-toplevel
+    from sklearn.utils import gen_batches # pylint: disable=import-outside-toplevel
+
+    params = {'n_components': 2, **(projector_params or {})}
+    with stage("set_up_projector", projection_method=projection_method) as fit_stage:
+        fit_stage.add(items=len(embeddings), bytes=getattr(embeddings, "nbytes", 0))
+        if projection_method == "pca":
+            return PCA(**params).fit(embeddings)
+        if projection_method == "random_projection":
+            return SparseRandomProjection(**params).fit(embeddings)
+
+        # Incremental PCA only needs one block in memory at a time, so `embeddings` may be a memory-mapped array
+        params.setdefault('batch_size', PROJECTION_BATCH_SIZE)
+        projector = IncrementalPCA(**params)
+        for batch in gen_batches(len(embeddings), projector.batch_size, min_batch_size=projector.n_components):
+            projector.partial_fit(np.asarray(embeddings[batch], dtype=np.float32))
+        return projector
+
+def import_projection_dependencies(projection_method: str):
+    """
+    Imports the libraries used to fit a projector and build its dataframe. Projectors fitted on
+    worker threads need this to run on the calling thread first: concurrent first imports of scipy,
+    which sklearn and umap are built on, can fail half-way, and the interpreter hangs on exit if
+    numba's thread pool, which UMAP runs on, was launched from a worker thread.
+
+    Args:
+        projection_method (str): One of 'umap', 'pca', 'incremental_pca' or 'random_projection'.
+    """
+    # pylint: disable=import-outside-toplevel,unused-import
+    import joblib
+    import pandas
+    import sklearn.cluster
+    import sklearn.decomposition
+    import sklearn.random_projection
+    import tqdm
+    if projection_method == "umap":
+        import numba
+        import umap
+        numba.get_num_threads() # Launches the thread pool
+
+def set_up_umap(embeddings: np.ndarray, umap_params:dict = None) -> "umap.UMAP":
     """
     Sets up and fits a UMAP transformer to the given embeddings.
 
@@ -26,54 +119,320 @@ def set_up_umap(embeddings: np.ndarray, umap_params:dict = None) -> umap.UMAP:
     Returns:
         umap.UMAP: A fitted UMAP transformer.
     """
-    if umap_params is None:
-        umap_transform = umap.UMAP().fit(embeddings)
-    else:
-        umap_transform = umap.UMAP(**umap_params).fit(embeddings)
+    # Imported here, as loading umap triggers numba compilation
+    import umap # pylint: disable=import-outside-toplevel
+
+    with stage("set_up_umap") as fit_stage:
+        fit_stage.add(items=len(embeddings), bytes=getattr(embeddings, "nbytes", 0))
+        if umap_params is None:
+            umap_transform = umap.UMAP().fit(embeddings)
+        else:
+            umap_transform = umap.UMAP(**umap_params).fit(embeddings)
     return umap_transform
 
-def get_projections(embedding: np.ndarray, umap_transform: umap.UMAP) -> Tuple[np.ndarray, np.ndarray]:
+def fit_projections(embeddings: np.ndarray, umap_params: dict = None, projection_method: str = "umap", landmark_params: dict = None) -> Tuple[Any, Tuple[np.ndarray, np.ndarray]]:
     """
-    Projects embeddings into a two-dimensional space using the provided UMAP transformer.
+    Fits a projector and returns the coordinates of the training embeddings.
+
+    A fitted UMAP model already holds the layout of its training data in `embedding_`, so the
+    corpus does not need to go through `transform` a second time. Linear projectors project
+    the corpus with a single matrix multiply.
+
+    Args:
+        embeddings (np.ndarray): An array of embeddings to fit the projector.
+        umap_params (dict): Keyword arguments passed to the projector's constructor.
+        projection_method (str): One of 'umap', 'pca', 'incremental_pca' or 'random_projection'.
+        landmark_params (dict): If given, the projector is only fitted on a sample of landmark embeddings,
+            and the remaining embeddings are streamed through it in batches. Besides the keys of
+            `select_landmarks`, 'batch_size' and 'n_jobs' control the streaming projection.
+
+    Returns:
+        Tuple[Any, Tuple[np.ndarray, np.ndarray]]: The fitted projector, and the X and Y
+        coordinates of the training embeddings.
+    """
+    if landmark_params is not None:
+        return _fit_landmark_projections(embeddings=embeddings,
+                                         umap_params=umap_params,
+                                         projection_method=projection_method,
+                                         **landmark_params)
+    projector = set_up_projector(embeddings=embeddings, projection_method=projection_method, projector_params=umap_params)
+    if projection_method == "umap":
+        projections = np.asarray(projector.embedding_, dtype=np.float32)
+    else:
+        projections = _project_embeddings(embeddings, projector)
+    return projector, (projections[:, 0], projections[:, 1])
+
+def select_landmarks(embeddings: np.ndarray, n_landmarks: int = LANDMARK_SAMPLE_SIZE, method: str = "random", n_clusters: int = LANDMARK_N_CLUSTERS, batch_size: int = PROJECTION_BATCH_SIZE, random_state: int = 0) -> np.ndarray:
+    """
+    Picks a sample of landmark embeddings to fit a projector on.
+
+    Args:
+        embeddings (np.ndarray): An array of embeddings to sample from.
+        n_landmarks (int): The number of landmarks to pick.
+        method (str): 'random' for a uniform sample, or 'kmeans' to sample every k-means cluster
+            in proportion to its size.
+        n_clusters (int): The number of k-means clusters, when method is 'kmeans'.
+        batch_size (int): Number of embeddings clustered per block, when method is 'kmeans'.
+        random_state (int): Seed for the sampling and clustering.
+
+    Returns:
+        np.ndarray: The sorted row indices of the landmarks.
+
+    Raises:
+        ValueError: If the landmark method is not supported.
+    """
+    if method not in LANDMARK_METHODS:
+        raise ValueError(f"Invalid landmark method. Please use one of {', '.join(LANDMARK_METHODS)}.")
+    n_embeddings = len(embeddings)
+    if n_landmarks >= n_embeddings:
+        return np.arange(n_embeddings)
+
+    rng = np.random.default_rng(random_state)
+    if method == "random":
+        return np.sort(rng.choice(n_embeddings, size=n_landmarks, replace=False))
+
+    labels = _cluster_embeddings(embeddings, min(n_clusters, n_landmarks), batch_size, random_state)
+    counts = np.bincount(labels)
+    # Largest-remainder apportionment of the sample across clusters
+    shares = n_landmarks * counts / n_embeddings
+    quotas = np.floor(shares).astype(int)
+    quotas[np.argsort(quotas - shares)[:n_landmarks - quotas.sum()]] += 1
+    landmarks = [rng.choice(np.flatnonzero(labels == cluster), size=quota, replace=False)
+                 for cluster, quota in enumerate(quotas) if quota > 0]
+    return np.sort(np.concatenate(landmarks))
+
+def _cluster_embeddings(embeddings: np.ndarray, n_clusters: int, batch_size: int, random_state: int) -> np.ndarray:
+    """
+    Clusters embeddings with mini-batch k-means, holding one block in memory at a time.
+
+    Args:
+        embeddings (np.ndarray): An array of embeddings to cluster.
+        n_clusters (int): The number of clusters.
+        batch_size (int): Number of embeddings clustered per block.
+        random_state (int): Seed for the clustering.
+
+    Returns:
+        np.ndarray: The cluster label of each embedding.
+    """
+    from sklearn.cluster import MiniBatchKMeans # pylint: disable=import-outside-toplevel
+    from sklearn.utils import gen_batches # pylint: disable=import-outside-toplevel
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3)
+    batch_size = max(batch_size, n_clusters)
+    for batch in gen_batches(len(embeddings), batch_size, min_batch_size=n_clusters):
+        kmeans.partial_fit(np.asarray(embeddings[batch], dtype=np.float32))
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    for batch in gen_batches(len(embeddings), batch_size):
+        labels[batch] = kmeans.predict(np.asarray(embeddings[batch], dtype=np.float32))
+    return labels
+
+def _fit_landmark_projections(embeddings: np.ndarray, umap_params: dict = None, projection_method: str = "umap", batch_size: int = PROJECTION_BATCH_SIZE, n_jobs: int = 1, **select_params) -> Tuple[Any, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Fits a projector on a sample of landmark embeddings, then streams the rest through it.
+
+    Only the landmarks and one batch per worker are materialised at a time, so `embeddings`
+    may be a memory-mapped array.
+
+    Args:
+        embeddings (np.ndarray): An array of embeddings to project.
+        umap_params (dict): Keyword arguments passed to the projector's constructor.
+        projection_method (str): One of 'umap', 'pca', 'incremental_pca' or 'random_projection'.
+        batch_size (int): Number of embeddings transformed per batch.
+        n_jobs (int): Number of worker processes to fan the batches out to.
+        **select_params: Keyword arguments passed to `select_landmarks`.
+
+    Returns:
+        Tuple[Any, Tuple[np.ndarray, np.ndarray]]: The fitted projector, and the X and Y
+        coordinates of every embedding.
+    """
+    from joblib import Parallel, delayed # pylint: disable=import-outside-toplevel
+    from tqdm import tqdm # pylint: disable=import-outside-toplevel
+
+    embeddings = np.asarray(embeddings)
+    landmarks = select_landmarks(embeddings, batch_size=batch_size, **select_params)
+    projector, (landmark_x, landmark_y) = fit_projections(embeddings=np.asarray(embeddings[landmarks], dtype=np.float32),
+                                                          umap_params=umap_params,
+                                                          projection_method=projection_method)
+    projections = np.empty((len(embeddings), 2), dtype=np.float32)
+    projections[landmarks, 0] = landmark_x
+    projections[landmarks, 1] = landmark_y
+
+    rest = np.setdiff1d(np.arange(len(embeddings)), landmarks, assume_unique=True)
+    batches = [rest[start:start + batch_size] for start in range(0, len(rest), batch_size)]
+    with stage("get_projections", batch_size=batch_size, n_jobs=n_jobs) as project_stage:
+        project_stage.add(items=len(rest))
+        if n_jobs == 1:
+            for rows in tqdm(batches):
+                projections[rows] = _transform_blocks(projector, np.asarray(embeddings[rows], dtype=np.float32), batch_size)
+        else:
+            # Results come back in order, with at most 2 * n_jobs batches dispatched at a time
+            results = Parallel(n_jobs=n_jobs, return_as="generator")(
+                delayed(_transform_blocks)(projector, np.asarray(embeddings[rows], dtype=np.float32), batch_size)
+                for rows in batches
+            )
+            for rows, block_projections in zip(batches, results):
+                projections[rows] = block_projections
+    return projector, (projections[:, 0], projections[:, 1])
+
+def get_projections(embedding: np.ndarray, umap_transform: Any, batch_size: int = PROJECTION_BATCH_SIZE, n_jobs: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Projects embeddings into a two-dimensional space using the provided projector.
 
     Args:
         embedding (np.ndarray): An array of embeddings to project.
-        umap_transform (umap.UMAP): A fitted UMAP transformer.
+        umap_transform (Any): A fitted UMAP transformer or linear projector.
+        batch_size (int): Number of embeddings transformed per block.
+        n_jobs (int): Number of worker processes to fan the blocks out to. Each worker takes about 15 to
+            35 seconds to start, import UMAP, compile its search functions and receive the projector,
+            while UMAP projects 384-dimension embeddings at about 2 ms each, so workers only pay off
+            from about 10,000 embeddings each: at most one worker is started per
+            PROJECTION_MIN_ROWS_PER_WORKER embeddings, and fewer embeddings are projected in this process.
 
     Returns:
         Tuple[np.ndarray, np.ndarray]: X and Y coordinates of the projected embeddings.
     """
-    # Ensure embeddings are 2D
-    if embedding.ndim > 2:
-        embedding = embedding.reshape(embedding.shape[0], -1)
-    projections = _project_embeddings(embedding, umap_transform)
+    projections = _project_embeddings(embedding, umap_transform, batch_size=batch_size, n_jobs=n_jobs)
     x = projections[:, 0]
     y = projections[:, 1]
     return x, y
 
-def _project_embeddings(embeddings: np.ndarray, umap_transform: umap.UMAP) -> np.ndarray:
+def _project_embeddings(embeddings: np.ndarray, umap_transform: Any, batch_size: int = PROJECTION_BATCH_SIZE, n_jobs: int = 1, min_rows_per_worker: int = PROJECTION_MIN_ROWS_PER_WORKER) -> np.ndarray:
     """
-    Helper function to project embeddings using a UMAP transformer.
+    Helper function to project embeddings using a projector. UMAP is applied one block at a time,
+    while linear projectors project every row with a single matrix multiply.
 
     Args:
         embeddings (np.ndarray): An array of embeddings to project.
-        umap_transform (umap.UMAP): A fitted UMAP transformer.
+        umap_transform (Any): A fitted UMAP transformer or linear projector.
+        batch_size (int): Number of embeddings transformed per block.
+        n_jobs (int): Number of worker processes to fan the blocks out to. See `get_projections`.
+        min_rows_per_worker (int): The fewest embeddings a worker process is started for.
 
     Returns:
-        np.ndarray: An array of projected embeddings.
+        np.ndarray: A float32 array of projected embeddings.
     """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer.")
+    embeddings = np.asarray(embeddings, dtype=np.float32)
     # Flatten embeddings to 2D
     if embeddings.ndim > 2:
         embeddings = embeddings.reshape(embeddings.shape[0], -1)
-    umap_embeddings = np.empty((len(embeddings), 2))
-    for i, embedding in tqdm(enumerate(embeddings), total=len(embeddings)):
-        umap_embeddings[i] = umap_transform.transform([embedding])
+    with stage("get_projections", batch_size=batch_size, n_jobs=n_jobs) as project_stage:
+        project_stage.add(items=len(embeddings), bytes=embeddings.nbytes)
+        if _is_linear_projector(umap_transform):
+            return np.asarray(umap_transform.transform(embeddings), dtype=np.float32)
+
+        from joblib import Parallel, delayed, effective_n_jobs # pylint: disable=import-outside-toplevel
+        from tqdm import tqdm # pylint: disable=import-outside-toplevel
+
+        umap_embeddings = np.empty((len(embeddings), 2), dtype=np.float32)
+
+        n_workers = 1
+        if n_jobs != 1:
+            n_workers = min(effective_n_jobs(n_jobs), -(-len(embeddings) // batch_size), len(embeddings) // max(min_rows_per_worker, 1))
+        if n_workers <= 1:
+            for start in tqdm(range(0, len(embeddings), batch_size)):
+                block = embeddings[start:start + batch_size]
+                umap_embeddings[start:start + len(block)] = umap_transform.transform(block)
+        else:
+            # Hand each worker one contiguous slice, so the transformer is only pickled once per worker.
+            # Its arrays are pickled rather than memory-mapped, as pynndescent cannot search read-only arrays.
+            bounds = np.linspace(0, len(embeddings), n_workers + 1).astype(int)
+            parts = Parallel(n_jobs=n_workers, max_nbytes=None)(
+                delayed(_transform_blocks)(umap_transform, embeddings[start:stop], batch_size)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            )
+            for start, part in zip(bounds[:-1], parts):
+                umap_embeddings[start:start + len(part)] = part
     return umap_embeddings
 
-def prepare_projections_df(document_ids: List[str], document_projections: Tuple[np.ndarray, np.ndarray], document_text: List[str]) -> pd.DataFrame:
+class AlignedProjector:
+    """
+    A fitted projector whose 2-D output is rotated, reflected, scaled and translated, e.g. onto the
+    projections of another embedding model with the transform found by `align_projections`.
+
+    Args:
+        projector (Any): A fitted UMAP transformer or linear projector.
+        matrix (np.ndarray): The (2, 2) rotation or reflection, times the scale, applied to its output.
+        offset (np.ndarray): The translation applied after `matrix`.
+    """
+
+    def __init__(self, projector: Any, matrix: np.ndarray, offset: np.ndarray):
+        self.projector = projector
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """ Projects embeddings, then maps the projections """
+        return np.asarray(self.projector.transform(embeddings), dtype=np.float32) @ self.matrix + self.offset
+
+def align_projections(projections: Tuple[np.ndarray, np.ndarray], reference: Tuple[np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Finds the rotation or reflection, uniform scaling and translation that map the projections of
+    documents closest to reference projections of the same documents, by Procrustes analysis.
+
+    Args:
+        projections (Tuple[np.ndarray, np.ndarray]): X and Y coordinates of the documents to align.
+        reference (Tuple[np.ndarray, np.ndarray]): X and Y coordinates of the same documents to align to.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, float]: The (2, 2) matrix and the offset of the transform, such that
+        `projections @ matrix + offset` is aligned, and the disparity left after alignment: the squared
+        residuals relative to the spread of the reference, from 0 for the same layout to 1 for unrelated ones.
+    """
+    source = np.column_stack(projections).astype(np.float64)
+    target = np.column_stack(reference).astype(np.float64)
+    if source.shape != target.shape:
+        raise ValueError("The projections and the reference must be of the same documents.")
+    source_mean, target_mean = source.mean(axis=0), target.mean(axis=0)
+    source, target = source - source_mean, target - target_mean
+    # The rotation maximising the correlation of the layouts, and the scale minimising the residuals
+    u, singular_values, vt = np.linalg.svd(source.T @ target)
+    eps = np.finfo(np.float32).eps
+    matrix = singular_values.sum() / max((source ** 2).sum(), eps) * (u @ vt)
+    offset = target_mean - source_mean @ matrix
+    disparity = ((source @ matrix - target) ** 2).sum() / max((target ** 2).sum(), eps)
+    return matrix.astype(np.float32), offset.astype(np.float32), float(disparity)
+
+def _is_linear_projector(projector: Any) -> bool:
+    """
+    Checks whether a projector's transform is a single matrix multiply. A projector that is not
+    from sklearn (e.g. UMAP) is not linear, and sklearn is not imported to find that out.
+    """
+    if isinstance(projector, AlignedProjector):
+        return _is_linear_projector(projector.projector)
+    if not type(projector).__module__.startswith("sklearn."):
+        return False
+    from sklearn.decomposition import PCA, IncrementalPCA # pylint: disable=import-outside-toplevel
+    from sklearn.random_projection import SparseRandomProjection # pylint: disable=import-outside-toplevel
+    return isinstance(projector, (PCA, IncrementalPCA, SparseRandomProjection))
+
+def _transform_blocks(umap_transform: Any, embeddings: np.ndarray, batch_size: int) -> np.ndarray:
+    """
+    Transforms a slice of embeddings block by block, typically inside a worker process.
+
+    Args:
+        umap_transform (Any): A fitted UMAP transformer or linear projector.
+        embeddings (np.ndarray): The slice of embeddings to project.
+        batch_size (int): Number of embeddings transformed per block.
+
+    Returns:
+        np.ndarray: A float32 array of projected embeddings.
+    """
+    projections = np.empty((len(embeddings), 2), dtype=np.float32)
+    for start in range(0, len(embeddings), batch_size):
+        block = embeddings[start:start + batch_size]
+        projections[start:start + len(block)] = umap_transform.transform(block)
+    return projections
+
+def prepare_projections_df(document_ids: List[str], document_projections: Tuple[np.ndarray, np.ndarray], document_text: List[str]) -> "pd.DataFrame":
     """
     Prepares a DataFrame for visualization from document IDs, projections, and texts.
 
+    Coordinates are stored as float32 and categories as a categorical column. The document
+    column references the given strings rather than copying them, and the wrapped hover text
+    is only built when the documents are plotted.
+
     Args:
         document_ids (List[str]): List of document IDs.
         document_projections (Tuple[np.ndarray, np.ndarray]): Tuple of X and Y coordinates of document projections.
@@ -82,57 +441,276 @@ def prepare_projections_df(document_ids: List[str], document_projections: Tuple[
     Returns:
         pd.DataFrame: DataFrame containing the information for visualization.
     """
-    df = pd.DataFrame({"id": document_ids,
-                       "x": document_projections[0],
-                       "y": document_projections[1]})
-    
-    df['document'] = document_text
-    df['document_cleaned'] = df.document.str.wrap(80).apply(lambda x: x.replace('\n', '<br>'))
-    df['size'] = PLOT_SIZE
-    df['category'] = "Chunks"
-    
-    return df
+    import pandas as pd # pylint: disable=import-outside-toplevel
+
+    n_documents = len(document_ids)
+    return pd.DataFrame({"id": document_ids,
+                         "x": np.asarray(document_projections[0], dtype=np.float32),
+                         "y": np.asarray(document_projections[1], dtype=np.float32),
+                         "document": document_text,
+                         "size": np.full(n_documents, PLOT_SIZE, dtype=np.uint8),
+                         "category": pd.Categorical.from_codes(np.zeros(n_documents, dtype=np.int8), categories=["Chunks"])})
+
+def compact_projections_df(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Converts a visualization DataFrame, e.g. one exported from an older version, to the compact
+    representation of `prepare_projections_df`. The given DataFrame is not modified.
+
+    Args:
+        df (pd.DataFrame): DataFrame with id, x, y, category, and document and/or document_cleaned columns.
+
+    Returns:
+        pd.DataFrame: The compact DataFrame.
+    """
+    import pandas as pd # pylint: disable=import-outside-toplevel
+
+    compact = df.drop(columns=["document_cleaned"]) if "document" in df and "document_cleaned" in df else df.copy(deep=False)
+    compact["x"] = compact["x"].astype(np.float32)
+    compact["y"] = compact["y"].astype(np.float32)
+    compact["category"] = compact["category"].astype("category")
+    if "size" in compact:
+        compact["size"] = pd.to_numeric(compact["size"], downcast="unsigned")
+    return compact.reset_index(drop=True)
+
+def wrap_hover_text(text: "pd.Series", width: int = 80) -> "pd.Series":
+    """
+    Wraps text into lines of at most `width` characters joined with '<br>', for Plotly hover labels.
+
+    This gives the same lines as `textwrap.wrap`, except that existing line breaks are kept and
+    leading whitespace is dropped, but finds all lines of a text with one regular expression
+    call instead of running the textwrap state machine, which is many times faster.
+
+    Args:
+        text (pd.Series): The text to wrap.
+        width (int): The maximum line length. Longer words are split.
+
+    Returns:
+        pd.Series: The wrapped text.
+    """
+    return text.str.findall(_line_pattern(width)).str.join("<br>")
+
+@lru_cache(maxsize=None)
+def _line_pattern(width: int) -> re.Pattern:
+    """
+    Returns a pattern matching each line of wrapped text: the longest run of at most `width`
+    characters that starts and ends on a word, or else the first `width` characters of a longer word.
+    """
+    return re.compile(rf"\S(?:.{{0,{width - 2}}}\S)?(?=\s|$)|\S{{{width}}}")
 
-def plot_embeddings(df: pd.DataFrame) -> go.Figure:
+def plot_embeddings(df: "pd.DataFrame") -> "go.Figure":
     """
     Creates a Plotly figure to visualize the embeddings.
 
+    The 'Chunks' rows are drawn as the base traces, in the large-corpus mode above
+    LARGE_CORPUS_THRESHOLD chunks, and the rows of every other category (e.g. the query and the
+    retrieved chunks) are always drawn in full on top of them.
+
     Args:
         df (pd.DataFrame): DataFrame containing the data to visualize.
 
     Returns:
         go.Figure: A Plotly figure object for visualization.
     """
-    fig = go.Figure()
-
-    for category in df['category'].unique():
-        category_df = df[df['category'] == category]
-        settings = VISUALISATION_SETTINGS.get(category, {'color': 'grey', 'opacity': 1, 'symbol': 'circle', 'size': 10})
-        fig.add_trace(go.Scatter(
-            x=category_df['x'],
-            y=category_df['y'],
-            mode='markers',
-            name=category,
-            marker=dict(
-                color=settings['color'],
-                opacity=settings['opacity'],
-                symbol=settings['symbol'],
-                size=settings['size'],
-                line_width=0
-            ),
-            hoverinfo='text',
-            text=category_df['document_cleaned']
-        ))
-
-    fig.update_layout(
-        height=500,
-        legend=dict(
-            y=100,
-            x=0.5,
-            xanchor='center',
-            yanchor='top',
-            orientation='h'
+    with stage("plot_embeddings") as plot_stage:
+        plot_stage.add(items=len(df))
+        is_chunk = df['category'] == "Chunks"
+        return plot_overlays(plot_base_traces(df[is_chunk]), [df[~is_chunk]])
+
+def plot_base_traces(df: "pd.DataFrame", render_mode: str = "auto") -> List["BaseTraceType"]:
+    """
+    Builds the traces of a base (corpus) DataFrame. They do not depend on any query, so they
+    can be built once per projection and reused by `plot_overlays`.
+
+    In the 'standard' mode, every document is drawn as an SVG marker with its full hover text.
+    In the 'large' mode, the corpus is drawn as a binned density heatmap, with a level-of-detail
+    sample of at most LOD_MAX_POINTS documents drawn on top as WebGL markers with truncated hover
+    text. Overlays (queries and retrieved documents) are always drawn in full. 'auto' picks the
+    'large' mode above LARGE_CORPUS_THRESHOLD documents.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the documents to visualize.
+        render_mode (str): 'auto', 'standard' or 'large'.
+
+    Returns:
+        List["BaseTraceType"]: The traces of the corpus.
+    """
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Invalid render mode. Please use one of {', '.join(RENDER_MODES)}.")
+    large = render_mode == "large" or (render_mode == "auto" and len(df) > LARGE_CORPUS_THRESHOLD)
+    with stage("plot_base_traces", render_mode="large" if large else "standard") as plot_stage:
+        plot_stage.add(items=len(df))
+        if large:
+            return _large_corpus_traces(df)
+        if df['category'].nunique() == 1:
+            return [_category_trace(df, df['category'].iloc[0])]
+        return [_category_trace(df[df['category'] == category], category) for category in df['category'].unique()]
+
+def plot_overlays(base_traces: List["BaseTraceType"], overlay_dfs: List["pd.DataFrame"]) -> "go.Figure":
+    """
+    Creates a Plotly figure from prebuilt base traces and small overlay DataFrames (e.g. the
+    query, its expansions and the retrieved documents), drawn on top of the base traces.
+
+    The base traces are already validated, so the figure is assembled without re-validating
+    them, which keeps the cost of each query independent of the size of the corpus.
+
+    Args:
+        base_traces (List["BaseTraceType"]): Traces returned by `plot_base_traces`.
+        overlay_dfs (List["pd.DataFrame"]): DataFrames with x, y, category, and document or document_cleaned columns.
+
+    Returns:
+        go.Figure: A Plotly figure object for visualization.
+    """
+    import plotly.graph_objs as go # pylint: disable=import-outside-toplevel
+
+    with stage("plot_overlays") as plot_stage:
+        plot_stage.add(items=sum(len(overlay_df) for overlay_df in overlay_dfs))
+        overlay_traces = [_category_trace(overlay_df[overlay_df['category'] == category], category)
+                          for overlay_df in overlay_dfs if len(overlay_df) > 0
+                          for category in overlay_df['category'].unique()]
+        layout = go.Layout(
+            height=500,
+            legend=dict(
+                y=100,
+                x=0.5,
+                xanchor='center',
+                yanchor='top',
+                orientation='h'
+            )
+        )
+        return go.Figure(data=list(base_traces) + overlay_traces, layout=layout, _validate=False)
+
+def plot_side_by_side(figures: List["go.Figure"], titles: List[str]) -> "go.Figure":
+    """
+    Places figures next to each other, on shared axes, with one legend for all of them.
+
+    Args:
+        figures (List[go.Figure]): Figures returned by `plot_overlays`, e.g. one per embedding model.
+        titles (List[str]): The title of each figure.
+
+    Returns:
+        go.Figure: A Plotly figure with one column per figure.
+    """
+    from plotly.subplots import make_subplots # pylint: disable=import-outside-toplevel
+
+    with stage("plot_side_by_side", n_figures=len(figures)):
+        fig = make_subplots(rows=1, cols=len(figures), subplot_titles=titles, shared_xaxes=True, shared_yaxes=True)
+        for column, figure in enumerate(figures, start=1):
+            fig.add_traces(list(figure.data), rows=1, cols=column)
+            if column > 1:
+                fig.update_traces(showlegend=False, row=1, col=column)
+        # Toggling a category in the legend toggles it in every figure
+        fig.for_each_trace(lambda trace: trace.update(legendgroup=trace.name))
+        fig.update_layout(
+            height=500,
+            legend=dict(
+                y=100,
+                x=0.5,
+                xanchor='center',
+                yanchor='top',
+                orientation='h'
+            )
         )
+        return fig
+
+def _category_trace(df: "pd.DataFrame", category: str) -> "go.Scatter":
+    """
+    Builds the scatter trace of the documents of one category.
+    """
+    import plotly.graph_objs as go # pylint: disable=import-outside-toplevel
+
+    settings = VISUALISATION_SETTINGS.get(category, {'color': 'grey', 'opacity': 1, 'symbol': 'circle', 'size': 10})
+    return go.Scatter(
+        x=df['x'].to_numpy(),
+        y=df['y'].to_numpy(),
+        mode='markers',
+        name=category,
+        marker=dict(
+            color=settings['color'],
+            opacity=settings['opacity'],
+            symbol=settings['symbol'],
+            size=settings['size'],
+            line_width=0
+        ),
+        hoverinfo='text',
+        text=_hover_text(df).to_numpy()
     )
-                
-    return fig
+
+def _large_corpus_traces(df: "pd.DataFrame", max_points: int = LOD_MAX_POINTS, n_bins: int = DENSITY_BINS) -> List["BaseTraceType"]:
+    """
+    Builds the density background and the level-of-detail sample of a large corpus.
+    """
+    import plotly.graph_objs as go # pylint: disable=import-outside-toplevel
+
+    x = df['x'].to_numpy(dtype=np.float64)
+    y = df['y'].to_numpy(dtype=np.float64)
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=n_bins)
+    density = go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=np.where(counts.T > 0, np.log1p(counts.T), np.nan),
+        colorscale='Blues',
+        showscale=False,
+        hoverinfo='skip',
+        name='Chunk density'
+    )
+
+    sample = df.iloc[_level_of_detail_sample(x, y, x_edges, y_edges, max_points)]
+    settings = VISUALISATION_SETTINGS['Chunks']
+    points = go.Scattergl(
+        x=sample['x'].to_numpy(),
+        y=sample['y'].to_numpy(),
+        mode='markers',
+        name='Chunks',
+        marker=dict(
+            color=settings['color'],
+            opacity=settings['opacity'],
+            size=settings['size'] / 2,
+            line_width=0
+        ),
+        hoverinfo='text',
+        text=_truncated_hover_text(sample, HOVER_TEXT_MAX_CHARS)
+    )
+    return [density, points]
+
+def _level_of_detail_sample(x: np.ndarray, y: np.ndarray, x_edges: np.ndarray, y_edges: np.ndarray, max_points: int, random_state: int = 0) -> np.ndarray:
+    """
+    Picks at most `max_points` documents, round-robin over the density bins, so that sparse
+    regions and outliers stay visible while dense regions are thinned out.
+
+    Returns:
+        np.ndarray: The sorted row positions of the sampled documents.
+    """
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    n_bins = len(x_edges) - 1
+    x_bins = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, n_bins - 1)
+    y_bins = np.clip(np.searchsorted(y_edges, y, side='right') - 1, 0, n_bins - 1)
+    cells = x_bins * n_bins + y_bins
+
+    # Shuffle, group by cell, then rank each document within its cell
+    order = np.random.default_rng(random_state).permutation(len(x))
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    ranks = np.arange(len(order)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(order)]))
+
+    # Take the first document of every cell, then the second, and so on
+    picked = order[np.argsort(ranks, kind='stable')[:max_points]]
+    return np.sort(picked)
+
+def _hover_text(df: "pd.DataFrame") -> "pd.Series":
+    """
+    Returns the hover text of documents: their document_cleaned column if there is one,
+    otherwise their wrapped document text.
+    """
+    if 'document_cleaned' in df:
+        return df['document_cleaned']
+    return wrap_hover_text(df['document'])
+
+def _truncated_hover_text(df: "pd.DataFrame", max_chars: int) -> np.ndarray:
+    """
+    Builds hover text truncated to `max_chars` characters of the document.
+    """
+    text = df['document'] if 'document' in df else df['document_cleaned'].str.replace('<br>', ' ', regex=False)
+    sliced = text.str.slice(0, max_chars)
+    return wrap_hover_text(sliced.where(text.str.len() <= max_chars, sliced + '…')).to_numpy()
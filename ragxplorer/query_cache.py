@@ -0,0 +1,122 @@
+"""
+query_cache.py
+
+This module provides a bounded cache of the per-query work done by `RAGxplorer.visualize_query`:
+the embeddings and 2-D projections of a query and its expansions, and the chunks retrieved for it
+with each retrieval method and top_k. Entries depend on the projector and the collection, so the
+cache must be cleared whenever either changes.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .constants import QUERY_CACHE_SIZE
+
+class CachedQuery(BaseModel):
+    """
+    Cached results for one query.
+
+    Attributes:
+        vectors: The (embedding, (x, y)) of the query and of each of its expansions, by text.
+        expansions: The search queries the query was expanded into, and the category they are
+            plotted as, by retrieval method.
+        retrieved: The retrieved chunk ids, by (retrieval method, top_k).
+    """
+    vectors: Dict[str, Tuple[Any, Tuple[float, float]]] = Field(default_factory=dict)
+    expansions: Dict[str, Tuple[List[str], Optional[str]]] = Field(default_factory=dict)
+    retrieved: Dict[Tuple[str, int], List[str]] = Field(default_factory=dict)
+
+class QueryCache:
+    """
+    LRU cache of `CachedQuery` entries, keyed by the query string, with hit and miss counters.
+    A max_size of 0 disables caching: every entry is dropped as soon as it is created.
+    """
+
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE):
+        if max_size is None or max_size < 0:
+            raise ValueError("max_size must be a non-negative integer.")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.retrieval_hits = 0
+        self.retrieval_misses = 0
+        self._entries = OrderedDict()
+
+    def entry(self, query: str) -> CachedQuery:
+        """
+        Returns the entry of a query, creating an empty one if needed, and marks it as recently used.
+        """
+        if query in self._entries:
+            self._entries.move_to_end(query)
+            return self._entries[query]
+        # The new entry is returned even if it is evicted straight away, which it is when max_size is 0
+        entry = CachedQuery()
+        self._entries[query] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def missing_vectors(self, entry: CachedQuery, texts: List[str]) -> List[str]:
+        """
+        Looks up the vectors of texts in an entry, counting a hit or miss per text.
+
+        Returns:
+            List[str]: The distinct texts whose vectors are not cached yet.
+        """
+        missing = [text for text in dict.fromkeys(texts) if text not in entry.vectors]
+        n_missing = sum(text not in entry.vectors for text in texts)
+        self.hits += len(texts) - n_missing
+        self.misses += n_missing
+        return missing
+
+    @staticmethod
+    def put_vectors(entry: CachedQuery, texts: List[str], embeddings: np.ndarray, projections: Tuple[np.ndarray, np.ndarray]):
+        """
+        Stores the embeddings and projections of texts in an entry.
+        """
+        for i, text in enumerate(texts):
+            entry.vectors[text] = (np.array(embeddings[i]), (float(projections[0][i]), float(projections[1][i])))
+
+    @staticmethod
+    def get_vectors(entry: CachedQuery, texts: List[str]) -> Tuple[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the cached embeddings and projections of texts, which must all be cached.
+        """
+        embeddings = np.stack([entry.vectors[text][0] for text in texts])
+        projections = np.array([entry.vectors[text][1] for text in texts], dtype=np.float32)
+        return embeddings, (projections[:, 0], projections[:, 1])
+
+    def get_retrieved(self, entry: CachedQuery, retrieval_method: str, top_k: int) -> Optional[List[str]]:
+        """
+        Looks up the chunks retrieved for an entry, counting a hit or miss.
+        """
+        retrieved = entry.retrieved.get((retrieval_method, top_k))
+        if retrieved is None:
+            self.retrieval_misses += 1
+            return None
+        self.retrieval_hits += 1
+        return list(retrieved)
+
+    def clear(self):
+        """ Drops every entry. The counters are kept. """
+        self._entries.clear()
+
+    def clear_retrieved(self):
+        """ Drops the cached retrievals only, e.g. after chunks were added to the collection. """
+        for entry in self._entries.values():
+            entry.retrieved.clear()
+
+    def info(self) -> Dict[str, int]:
+        """
+        Returns the hit and miss counters and the size of the cache. `hits` and `misses` count
+        embedding and projection lookups, one per text; the `retrieval_` counters count searches.
+        """
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "retrieval_hits": self.retrieval_hits,
+                "retrieval_misses": self.retrieval_misses,
+                "size": len(self._entries),
+                "max_size": self.max_size}
@@ -2,16 +2,97 @@
 query_expansion.py
 
 This module provides functionalities for expanding queries using GPT-4 powered chat completions.
-It includes generating sub-questions and hypothetical answers for a given query.
+It includes generating sub-questions and hypothetical answers for a given query, either one at a
+time or for many queries concurrently.
+
+OpenAI clients are shared across calls, and completions are cached in memory (and optionally on
+disk), since the requests are deterministic (temperature 0, fixed seed). Set OPENAI_BASE_URL to
+point the clients at another OpenAI-compatible server.
 """
 
-import os
+import asyncio
+import contextvars
+import hashlib
 import json
-from typing import List, Union
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Union
+
+from .constants import (
+    MULTIPLE_QNS_SYS_MSG,
+    HYDE_SYS_MSG,
+    QUERY_EXPANSION_MODEL,
+    QUERY_EXPANSION_CACHE_SIZE,
+    QUERY_EXPANSION_MAX_CONCURRENCY
+    )
+from .instrumentation import stage
+
+# openai is only imported when a client is first needed, so that importing the package stays fast
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+class _CompletionCache:
+    """
+    LRU cache of raw completion outputs, optionally backed by one JSON file per entry on disk.
+    """
+
+    def __init__(self, max_size: int = QUERY_EXPANSION_CACHE_SIZE, cache_dir: Optional[str] = None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
 
-from openai import OpenAI
+    def get(self, key: tuple) -> Optional[str]:
+        """ Returns the cached output for a key, or None """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            with open(self._path(key), encoding="utf-8") as file:
+                output = json.load(file)["output"]
+            self._remember(key, output)
+            return output
+        return None
 
-from .constants import MULTIPLE_QNS_SYS_MSG, HYDE_SYS_MSG
+    def put(self, key: tuple, output: str):
+        """ Caches the output for a key """
+        self._remember(key, output)
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._path(key), "w", encoding="utf-8") as file:
+                json.dump({"key": list(key), "output": output}, file)
+
+    def clear(self):
+        """ Empties the in-memory cache. Files on disk are kept. """
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: tuple, output: str):
+        with self._lock:
+            self._entries[key] = output
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest() + ".json")
+
+_cache = _CompletionCache()
+
+def configure_cache(max_size: int = QUERY_EXPANSION_CACHE_SIZE, cache_dir: Optional[str] = None):
+    """
+    Configures the completion cache. This replaces the current cache, so in-memory entries are dropped.
+
+    Args:
+        max_size (int): The maximum number of completions kept in memory.
+        cache_dir (Optional[str]): If given, completions are also stored in, and read back from, this directory.
+    """
+    global _cache # pylint: disable=global-statement
+    _cache = _CompletionCache(max_size=max_size, cache_dir=cache_dir)
 
 def generate_sub_qn(query: str) -> List[str]:
     """
@@ -51,6 +132,84 @@ def generate_hypothetical_ans(query: str) -> str:
         raise RuntimeError(f"Error in generating hypothetical answer: {e}") from e
     return hyp_ans
 
+async def agenerate_sub_qn(query: str, client: Optional["AsyncOpenAI"] = None) -> List[str]:
+    """
+    Asynchronous version of `generate_sub_qn`.
+
+    Args:
+        query (str): The original query for which sub-questions need to be generated.
+        client (Optional[AsyncOpenAI]): The client to use. A new one is created if not given.
+
+    Returns:
+        List[str]: A list of generated sub-questions.
+    """
+    try:
+        sub_qns = await _achat_completion(MULTIPLE_QNS_SYS_MSG, query, 'json_object', client)
+    except Exception as e:
+        raise RuntimeError(f"Error in generating sub-questions: {e}") from e
+    return sub_qns
+
+async def agenerate_hypothetical_ans(query: str, client: Optional["AsyncOpenAI"] = None) -> str:
+    """
+    Asynchronous version of `generate_hypothetical_ans`.
+
+    Args:
+        query (str): The original query for which a hypothetical answer is needed.
+        client (Optional[AsyncOpenAI]): The client to use. A new one is created if not given.
+
+    Returns:
+        str: The generated hypothetical answer.
+    """
+    try:
+        hyp_ans = await _achat_completion(HYDE_SYS_MSG, query, 'text', client)
+    except Exception as e:
+        raise RuntimeError(f"Error in generating hypothetical answer: {e}") from e
+    return hyp_ans
+
+async def aexpand_queries(queries: List[str], retrieval_method: str, max_concurrency: int = QUERY_EXPANSION_MAX_CONCURRENCY) -> List[Union[str, List[str]]]:
+    """
+    Expands many queries concurrently, sharing one client and keeping at most `max_concurrency` requests in flight.
+
+    Args:
+        queries (List[str]): The queries to expand.
+        retrieval_method (str): 'HyDE' for hypothetical answers, or 'multi_qns' for sub-questions.
+        max_concurrency (int): The maximum number of concurrent requests.
+
+    Returns:
+        List[Union[str, List[str]]]: The expansion of each query, in the order of `queries`.
+    """
+    if retrieval_method not in ["HyDE", "multi_qns"]:
+        raise ValueError("Invalid retrieval method. Please use HyDE or multi_qns.")
+    expand = agenerate_hypothetical_ans if retrieval_method == "HyDE" else agenerate_sub_qn
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with _new_async_client() as client:
+        async def expand_one(query: str):
+            async with semaphore:
+                return await expand(query, client)
+        return await asyncio.gather(*(expand_one(query) for query in queries))
+
+def expand_queries(queries: List[str], retrieval_method: str, max_concurrency: int = QUERY_EXPANSION_MAX_CONCURRENCY) -> List[Union[str, List[str]]]:
+    """
+    Expands many queries concurrently. Blocking wrapper around `aexpand_queries` that also works when
+    called from a running event loop, e.g. in a Jupyter notebook.
+
+    Args:
+        queries (List[str]): The queries to expand.
+        retrieval_method (str): 'HyDE' for hypothetical answers, or 'multi_qns' for sub-questions.
+        max_concurrency (int): The maximum number of concurrent requests.
+
+    Returns:
+        List[Union[str, List[str]]]: The expansion of each query, in the order of `queries`.
+    """
+    coroutine = aexpand_queries(queries, retrieval_method, max_concurrency)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coroutine).result()
+
 def _chat_completion(sys_msg: str, prompt: str, response_format: str) -> Union[str, List[str]]:
     """
     A helper function to perform chat completions using the OpenAI API.
@@ -66,21 +225,73 @@ def _chat_completion(sys_msg: str, prompt: str, response_format: str) -> Union[s
     Raises:
         OpenAIError: If an error occurs in the OpenAI API call.
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
-    response = client.chat.completions.create(
-        model="gpt-4-1106-preview",
-        messages=[{'role': 'system', 'content': sys_msg}, 
-                    {'role': 'user', 'content': prompt}],
-        temperature=0,
-        response_format={'type': response_format},
-        seed=0
-    )
+    key = (QUERY_EXPANSION_MODEL, sys_msg, prompt, response_format)
+    with stage("query_expansion", response_format=response_format) as expansion_stage:
+        output = _cache.get(key)
+        expansion_stage.set(cached=output is not None)
+        if output is None:
+            client = _get_client(os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL"))
+            response = client.chat.completions.create(**_completion_params(sys_msg, prompt, response_format))
+            output = response.choices[0].message.content
+            _cache.put(key, output)
+        expansion_stage.add(items=1, bytes=len(output))
+    return _parse_output(output, response_format)
+
+async def _achat_completion(sys_msg: str, prompt: str, response_format: str, client: Optional["AsyncOpenAI"] = None) -> Union[str, List[str]]:
+    """
+    Asynchronous version of `_chat_completion`, sharing its cache.
+    """
+    key = (QUERY_EXPANSION_MODEL, sys_msg, prompt, response_format)
+    with stage("query_expansion", response_format=response_format) as expansion_stage:
+        output = _cache.get(key)
+        expansion_stage.set(cached=output is not None)
+        if output is None:
+            if client is None:
+                async with _new_async_client() as new_client:
+                    response = await new_client.chat.completions.create(**_completion_params(sys_msg, prompt, response_format))
+            else:
+                response = await client.chat.completions.create(**_completion_params(sys_msg, prompt, response_format))
+            output = response.choices[0].message.content
+            _cache.put(key, output)
+        expansion_stage.add(items=1, bytes=len(output))
+    return _parse_output(output, response_format)
 
-    output = response.choices[0].message.content
+def _completion_params(sys_msg: str, prompt: str, response_format: str) -> dict:
+    """
+    Returns the keyword arguments of a chat completion request.
+    """
+    return {
+        "model": QUERY_EXPANSION_MODEL,
+        "messages": [{'role': 'system', 'content': sys_msg},
+                     {'role': 'user', 'content': prompt}],
+        "temperature": 0,
+        "response_format": {'type': response_format},
+        "seed": 0
+    }
 
+def _parse_output(output: str, response_format: str) -> Union[str, List[str]]:
+    """
+    Parses the raw output of a chat completion.
+    """
     if response_format == 'json_object':
         output = json.loads(output)
         output = list(output.values())
-
     return output
+
+@lru_cache(maxsize=None)
+def _get_client(api_key: Optional[str], base_url: Optional[str]) -> "OpenAI":
+    """
+    Returns a client shared by every call with the same credentials, so that its connection pool is reused.
+    """
+    from openai import OpenAI # pylint: disable=import-outside-toplevel
+
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+def _new_async_client() -> "AsyncOpenAI":
+    """
+    Returns a new asynchronous client. Async clients are bound to the event loop they are used in,
+    so one is created per batch of concurrent requests instead of per process.
+    """
+    from openai import AsyncOpenAI # pylint: disable=import-outside-toplevel
+
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"))
@@ -7,85 +7,447 @@ It handles operations like loading PDFs, chunking text, embedding, and retrievin
 
 import os
 import uuid
-from typing import List, Any
-import chromadb
+from functools import lru_cache
+from itertools import count, islice, tee
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Any, Iterable, Iterator, Optional, Tuple
 import numpy as np
-from PyPDF2 import PdfReader
-from langchain.text_splitter import (
-    RecursiveCharacterTextSplitter,
-    SentenceTransformersTokenTextSplitter
-)
+
+from .constants import (
+    TOKENIZER_MODEL,
+    TOKENS_PER_CHUNK,
+    TOKENIZER_BATCH_SIZE,
+    CHROMA_ADD_BATCH_SIZE,
+    CHROMA_FETCH_PAGE_SIZE,
+    CHROMA_QUERY_BATCH_SIZE,
+    RRF_K
+    )
+from .embedding_executor import embed_and_add
+from .instrumentation import stage
+
+# chromadb, joblib, PyPDF2, langchain and transformers are slow to import, so they are only
+# imported by the functions that use them
+if TYPE_CHECKING:
+    import chromadb
+    from langchain.text_splitter import SentenceTransformersTokenTextSplitter
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-def build_vector_database(file: Any, chunk_size: int, chunk_overlap: int, embedding_model: Any) -> chromadb.Collection:
+def build_vector_database(file: Any, chunk_size: int, chunk_overlap: int, embedding_model: Any, embedding_params: dict = None, persist_directory: str = None) -> "chromadb.Collection":
     """
     Builds a vector database from a PDF file by splitting the text into chunks and embedding them.
+
+    The stages are chained generators: pages are extracted, chunked and embedded in batches as the
+    document is read, so only a few pages and batches of chunks are held in memory at any time.
     
     Args:
         file: The PDF file to process.
         chunk_size: The number of tokens in one chunk.
         chunk_overlap: The number of tokens shared between consecutive chunks.
+        embedding_model: The Chroma embedding function used to embed the chunks.
+        embedding_params: Keyword arguments passed to `embed_and_add`, e.g. batch_size or max_workers.
+        persist_directory: If given, the collection is stored on disk in this directory rather than in memory.
     
     Returns:
-        A Chroma collection object containing the embedded chunks.
+        A Chroma collection object containing the embedded chunks, with the page each chunk starts on as metadata.
+    """
+    with stage("build_vector_database", chunk_size=chunk_size, chunk_overlap=chunk_overlap):
+        chunks = chunk_pages(_load_pdf(file), chunk_size, chunk_overlap)
+        chroma_collection = _create_and_populate_chroma_collection(chunks, embedding_model, embedding_params, persist_directory)
+    return chroma_collection
+
+def extract_pages(file: Any) -> List[Tuple[int, str]]:
+    """
+    Extracts the text of every page of a PDF file, so that it can be chunked several times.
+
+    Args:
+        file: The PDF file to load.
+
+    Returns:
+        The page numbers (starting from 1) and the text of each page. Pages without text are skipped.
+    """
+    return list(_load_pdf(file))
+
+def chunk_pages(pdf_pages: Iterable[Tuple[int, str]], chunk_size: int, chunk_overlap: int) -> Iterator[Tuple[str, dict]]:
+    """
+    Splits pages into chunks by characters, then by tokens.
+
+    Args:
+        pdf_pages: The page numbers and the text of each page.
+        chunk_size: The number of tokens in one chunk.
+        chunk_overlap: The number of tokens shared between consecutive chunks.
+
+    Returns:
+        An iterator of the text of each chunk, with the page it starts on as metadata.
     """
-    pdf_texts = _load_pdf(file)
-    character_split_texts = _split_text_into_chunks(pdf_texts, chunk_size, chunk_overlap)
+    character_split_texts = _split_text_into_chunks(pdf_pages, chunk_size, chunk_overlap)
     token_split_texts = _split_chunks_into_tokens(character_split_texts)
-    chroma_collection = _create_and_populate_chroma_collection(token_split_texts, embedding_model)
+    return ((text, {"page": page_number}) for text, page_number in token_split_texts)
+
+def build_vector_database_from_pdfs(files: List[str], chunk_size: int, chunk_overlap: int, embedding_model: Any, embedding_params: dict = None, n_jobs: int = 1, persist_directory: str = None) -> "chromadb.Collection":
+    """
+    Builds one vector database from several PDF files. Text extraction and chunking run in a pool of
+    worker processes, one document per task, and feed a single shared embedding stage.
+
+    Documents are chunked and embedded in the order of `files`, so the collection is the same
+    regardless of `n_jobs`.
+
+    Args:
+        files: Paths to PDF files, or to directories whose PDF files are loaded in sorted order.
+        chunk_size: The number of tokens in one chunk.
+        chunk_overlap: The number of tokens shared between consecutive chunks.
+        embedding_model: The Chroma embedding function used to embed the chunks.
+        embedding_params: Keyword arguments passed to `embed_and_add`, e.g. batch_size or max_workers.
+        n_jobs: The number of worker processes used for extraction and chunking.
+        persist_directory: If given, the collection is stored on disk in this directory rather than in memory.
+
+    Returns:
+        A Chroma collection object containing the embedded chunks, with the source file and page of each chunk as metadata.
+    """
+    from joblib import Parallel, delayed # pylint: disable=import-outside-toplevel
+
+    pdf_paths = _expand_pdf_paths(files)
+    if not pdf_paths:
+        raise ValueError("No PDF files were found.")
+    # Stages run in worker processes are not reported, but the embedding stage is
+    with stage("build_vector_database", chunk_size=chunk_size, chunk_overlap=chunk_overlap, n_files=len(pdf_paths), n_jobs=n_jobs):
+        chunked_documents = Parallel(n_jobs=n_jobs, return_as="generator")(
+            delayed(_chunk_pdf)(path, chunk_size, chunk_overlap) for path in pdf_paths
+        )
+        chunks = (chunk for document_chunks in chunked_documents for chunk in document_chunks)
+        chroma_collection = _create_and_populate_chroma_collection(chunks, embedding_model, embedding_params, persist_directory)
     return chroma_collection
 
-def _split_text_into_chunks(pdf_texts: List[str], chunk_size: int, chunk_overlap: int) -> List[str]:
+def _expand_pdf_paths(files: List[str]) -> List[str]:
+    """
+    Replaces every directory in a list of paths with the PDF files inside it.
+
+    Args:
+        files: Paths to PDF files or directories.
+
+    Returns:
+        A list of paths to PDF files.
+    """
+    pdf_paths = []
+    for file in files:
+        if os.path.isdir(file):
+            pdf_paths.extend(sorted(str(path) for path in Path(file).rglob("*") if path.suffix.lower() == ".pdf"))
+        else:
+            pdf_paths.append(str(file))
+    return pdf_paths
+
+def _chunk_pdf(file: str, chunk_size: int, chunk_overlap: int) -> List[Tuple[str, dict]]:
     """
-    Splits the text from a PDF into chunks based on character count.
+    Extracts and chunks one PDF file, typically inside a worker process.
+
+    Args:
+        file: Path to the PDF file.
+        chunk_size: The number of tokens in one chunk.
+        chunk_overlap: The number of tokens shared between consecutive chunks.
+
+    Returns:
+        A list of text chunks, with the source file and page number of each chunk.
+    """
+    character_split_texts = _split_text_into_chunks(_load_pdf(file), chunk_size, chunk_overlap)
+    return [(text, {"source": file, "page": page_number})
+            for text, page_number in _split_chunks_into_tokens(character_split_texts)]
+
+def _split_text_into_chunks(pdf_pages: Iterable[Tuple[int, str]], chunk_size: int, chunk_overlap: int) -> Iterator[Tuple[str, int]]:
+    """
+    Splits the text from a PDF into chunks based on character count, one page at a time.
+
+    Pages are appended to a buffer that is split whenever it holds more than one chunk. Every chunk
+    but the last is emitted, and the buffer restarts at the last chunk, so chunks still run across
+    page boundaries.
     
     Args:
-        pdf_texts: List of text extracted from PDF pages.
+        pdf_pages: Page numbers and text extracted from PDF pages.
         chunk_size: The number of tokens in one chunk.
         chunk_overlap: The number of tokens shared between consecutive chunks.
     
     Returns:
-        A list of text chunks.
+        An iterator of text chunks and the page number each chunk starts on.
     """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter # pylint: disable=import-outside-toplevel
+
     character_splitter = RecursiveCharacterTextSplitter(
         separators=["\n\n", "\n", ". ", " ", ""],
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
-    return character_splitter.split_text('\n\n'.join(pdf_texts))
+    buffer = ""
+    page_starts = []  # (offset in buffer, page number) of every page in the buffer
+
+    for page_number, page_text in pdf_pages:
+        if buffer:
+            buffer += "\n\n"
+        page_starts.append((len(buffer), page_number))
+        buffer += page_text
+        if len(buffer) <= chunk_size:
+            continue
+        with stage("split_text") as split_stage:
+            chunks = _locate_chunks(buffer, character_splitter.split_text(buffer), page_starts)
+            split_stage.add(items=len(chunks) - 1, bytes=len(buffer))
+        for chunk in chunks[:-1]:
+            yield chunk[0], chunk[2]
+        carry_start = chunks[-1][1]
+        buffer = buffer[carry_start:]
+        page_starts = [(max(offset - carry_start, 0), number) for offset, number in page_starts
+                       if offset >= carry_start or number == chunks[-1][2]]
+
+    if buffer:
+        with stage("split_text") as split_stage:
+            chunks = _locate_chunks(buffer, character_splitter.split_text(buffer), page_starts)
+            split_stage.add(items=len(chunks), bytes=len(buffer))
+        for chunk in chunks:
+            yield chunk[0], chunk[2]
+
+def _locate_chunks(buffer: str, chunks: List[str], page_starts: List[Tuple[int, int]]) -> List[Tuple[str, int, int]]:
+    """
+    Finds where each chunk starts in the buffer it was split from, and the page it starts on.
+
+    Args:
+        buffer: The text the chunks were split from.
+        chunks: The chunks, in order.
+        page_starts: The offset in the buffer and page number of every page in the buffer.
+
+    Returns:
+        A list of (chunk, offset in buffer, page number) tuples.
+    """
+    located = []
+    cursor = 0
+    for chunk in chunks:
+        offset = buffer.find(chunk, cursor)
+        if offset == -1:
+            offset = cursor
+        page_number = [number for start, number in page_starts if start <= offset][-1]
+        located.append((chunk, offset, page_number))
+        cursor = offset + 1
+    return located
 
-def _split_chunks_into_tokens(character_split_texts: List[str]) -> List[str]:
+def _split_chunks_into_tokens(character_split_texts: Iterable[Tuple[str, Any]], batch_size: int = TOKENIZER_BATCH_SIZE) -> Iterator[Tuple[str, Any]]:
     """
     Splits text chunks into smaller chunks based on token count.
+
+    Chunks are tokenized in batches with the fast tokenizer, and chunks over the token limit are cut
+    at token (and, where possible, word) boundaries using the tokenizer's character offsets. The
+    text of each chunk is therefore kept as it appears in the document.
     
     Args:
-        character_split_texts: List of text chunks split by character count.
+        character_split_texts: Text chunks split by character count, with their page numbers.
+        batch_size: The number of chunks tokenized per call.
     
     Returns:
-        A list of text chunks split by token count.
+        An iterator of text chunks split by token count, with their page numbers.
+    """
+    tokenizer = _get_tokenizer()
+    if not tokenizer.is_fast:
+        token_splitter = _get_token_splitter()
+        for chunk, page_number in character_split_texts:
+            for text in token_splitter.split_text(chunk):
+                yield text, page_number
+        return
+
+    character_split_texts = iter(character_split_texts)
+    while batch := list(islice(character_split_texts, batch_size)):
+        with stage("tokenize") as tokenize_stage:
+            encodings = tokenizer([chunk for chunk, _ in batch], add_special_tokens=False, return_offsets_mapping=True)
+            tokenize_stage.add(items=len(batch), bytes=sum(len(chunk) for chunk, _ in batch))
+        for index, (chunk, page_number) in enumerate(batch):
+            offsets = encodings['offset_mapping'][index]
+            if len(offsets) <= TOKENS_PER_CHUNK:
+                if chunk.strip():
+                    yield chunk, page_number
+                continue
+            for start, end in _token_windows(encodings.word_ids(index), TOKENS_PER_CHUNK):
+                yield chunk[offsets[start][0]:offsets[end - 1][1]], page_number
+
+def _token_windows(word_ids: List[Optional[int]], tokens_per_chunk: int) -> Iterator[Tuple[int, int]]:
+    """
+    Splits a sequence of tokens into windows of at most `tokens_per_chunk` tokens, moving each cut
+    back to the start of a word unless that word is longer than a whole window.
+
+    Args:
+        word_ids: The index of the word each token belongs to.
+        tokens_per_chunk: The maximum number of tokens in one window.
+
+    Returns:
+        An iterator of (start, end) token indices.
     """
-    token_splitter = SentenceTransformersTokenTextSplitter(chunk_overlap=0, tokens_per_chunk=256)
-    return [text for chunk in character_split_texts for text in token_splitter.split_text(chunk)]
+    start = 0
+    while start < len(word_ids):
+        end = min(start + tokens_per_chunk, len(word_ids))
+        cut = end
+        while cut < len(word_ids) and cut > start + 1 and word_ids[cut] is not None and word_ids[cut] == word_ids[cut - 1]:
+            cut -= 1
+        end = cut if cut > start + 1 else end
+        yield start, end
+        start = end
 
-def _create_and_populate_chroma_collection(token_split_texts: List[str], embedding_model) -> chromadb.Collection:
+@lru_cache(maxsize=None)
+def _get_tokenizer() -> Any:
+    """
+    Loads the tokenizer used for token-based chunking, once per process.
+    """
+    from transformers import AutoTokenizer # pylint: disable=import-outside-toplevel
+
+    return AutoTokenizer.from_pretrained(TOKENIZER_MODEL)
+
+@lru_cache(maxsize=None)
+def _get_token_splitter() -> "SentenceTransformersTokenTextSplitter":
+    """
+    Builds the token splitter used when no fast tokenizer is available, once per process.
+    """
+    from langchain.text_splitter import SentenceTransformersTokenTextSplitter # pylint: disable=import-outside-toplevel
+
+    return SentenceTransformersTokenTextSplitter(chunk_overlap=0, tokens_per_chunk=TOKENS_PER_CHUNK, model_name=TOKENIZER_MODEL)
+
+def _create_and_populate_chroma_collection(token_split_texts: Iterable[Tuple[str, dict]], embedding_model, embedding_params: dict = None, persist_directory: str = None) -> "chromadb.Collection":
     """
     Creates a Chroma collection and populates it with the given text chunks.
     
     Args:
-        token_split_texts: List of text chunks split by token count.
+        token_split_texts: Text chunks split by token count, with their metadata.
+        embedding_model: The Chroma embedding function used to embed the chunks.
+        embedding_params: Keyword arguments passed to `embed_and_add`.
+        persist_directory: If given, the collection is stored on disk in this directory rather than in memory.
     
     Returns:
         A Chroma collection object populated with the text chunks.
     """
-    chroma_client = chromadb.Client()
+    chroma_client = get_chroma_client(persist_directory)
     document_name = uuid.uuid4().hex
     chroma_collection = chroma_client.create_collection(document_name, embedding_function=embedding_model)
-    ids = [str(i) for i in range(len(token_split_texts))]
-    chroma_collection.add(ids=ids, documents=token_split_texts)
+    _populate_chroma_collection(chroma_collection, token_split_texts, embedding_model, embedding_params)
+    return chroma_collection
+
+def _populate_chroma_collection(chroma_collection: "chromadb.Collection", token_split_texts: Iterable[Tuple[str, dict]], embedding_model, embedding_params: dict = None, start_id: int = 0) -> List[str]:
+    """
+    Embeds text chunks and adds them to a Chroma collection, with consecutive integer ids.
+
+    Args:
+        chroma_collection: The Chroma collection to populate.
+        token_split_texts: Text chunks split by token count, with their metadata.
+        embedding_model: The Chroma embedding function used to embed the chunks.
+        embedding_params: Keyword arguments passed to `embed_and_add`.
+        start_id: The id of the first chunk.
+
+    Returns:
+        The ids of the added chunks.
+    """
+    # Both copies are consumed in lockstep by `embed_and_add`, so tee only buffers a single chunk
+    texts, metadatas = tee(token_split_texts)
+    n_added = embed_and_add(chroma_collection,
+                            ids=(str(i) for i in count(start_id)),
+                            documents=(text for text, _ in texts),
+                            metadatas=(metadata for _, metadata in metadatas),
+                            embedding_function=embedding_model,
+                            **(embedding_params or {}))
+    return [str(i) for i in range(start_id, start_id + n_added)]
+
+def add_pdf_to_vector_database(chroma_collection: "chromadb.Collection", file: Any, chunk_size: int, chunk_overlap: int, embedding_model: Any, start_id: int, embedding_params: dict = None) -> List[str]:
+    """
+    Chunks and embeds a PDF file, and appends its chunks to an existing vector database.
+
+    Args:
+        chroma_collection: The Chroma collection to append to.
+        file: The PDF file to process.
+        chunk_size: The number of tokens in one chunk.
+        chunk_overlap: The number of tokens shared between consecutive chunks.
+        embedding_model: The Chroma embedding function used to embed the chunks.
+        start_id: The id of the first new chunk. See `next_chunk_id`.
+        embedding_params: Keyword arguments passed to `embed_and_add`.
+
+    Returns:
+        The ids of the added chunks.
+    """
+    character_split_texts = _split_text_into_chunks(_load_pdf(file), chunk_size, chunk_overlap)
+    chunks = ((text, {"source": str(file), "page": page_number})
+              for text, page_number in _split_chunks_into_tokens(character_split_texts))
+    return _populate_chroma_collection(chroma_collection, chunks, embedding_model, embedding_params, start_id)
+
+def add_texts_to_vector_database(chroma_collection: "chromadb.Collection", texts: List[str], chunk_size: int, chunk_overlap: int, embedding_model: Any, start_id: int, metadatas: Optional[List[dict]] = None, embedding_params: dict = None) -> List[str]:
+    """
+    Chunks and embeds texts, and appends their chunks to an existing vector database.
+
+    Args:
+        chroma_collection: The Chroma collection to append to.
+        texts: The texts to add.
+        chunk_size: The number of tokens in one chunk.
+        chunk_overlap: The number of tokens shared between consecutive chunks.
+        embedding_model: The Chroma embedding function used to embed the chunks.
+        start_id: The id of the first new chunk. See `next_chunk_id`.
+        metadatas: Metadata of each text, copied to each of its chunks. Defaults to {'index': i}, the
+            position of the text in `texts`.
+        embedding_params: Keyword arguments passed to `embed_and_add`.
+
+    Returns:
+        The ids of the added chunks.
+    """
+    if metadatas is None:
+        metadatas = [{"index": i} for i in range(len(texts))]
+    if len(metadatas) != len(texts):
+        raise ValueError("Expected one metadata dictionary per text.")
+    chunks = ((chunk, dict(metadata))
+              for text, metadata in zip(texts, metadatas)
+              for chunk, _ in _split_chunks_into_tokens(_split_text_into_chunks(iter([(1, text)]), chunk_size, chunk_overlap)))
+    return _populate_chroma_collection(chroma_collection, chunks, embedding_model, embedding_params, start_id)
+
+def next_chunk_id(ids: Iterable[str]) -> int:
+    """
+    Returns the first integer id above every integer id in use, so that new chunks never collide
+    with existing ones, whatever ids the collection uses.
+
+    Args:
+        ids: The ids in use.
+
+    Returns:
+        The first free integer id.
+    """
+    return max((int(chunk_id) for chunk_id in ids if chunk_id.isdigit()), default=-1) + 1
+
+def build_vector_database_from_embeddings(ids: List[str], documents: List[str], embeddings: Any, embedding_model: Any, persist_directory: str = None, batch_size: int = CHROMA_ADD_BATCH_SIZE, metadatas: Optional[List[dict]] = None) -> "chromadb.Collection":
+    """
+    Builds a vector database from chunks that were already embedded, without calling the embedding model.
+
+    Args:
+        ids: The ids of the chunks.
+        documents: The text of the chunks.
+        embeddings: The embeddings of the chunks.
+        embedding_model: The Chroma embedding function used to embed queries.
+        persist_directory: If given, the collection is stored on disk in this directory rather than in memory.
+        batch_size: The number of chunks added to the collection per call.
+        metadatas: Optional metadata of each chunk.
+
+    Returns:
+        A Chroma collection object containing the chunks.
+    """
+    chroma_client = get_chroma_client(persist_directory)
+    chroma_collection = chroma_client.create_collection(uuid.uuid4().hex, embedding_function=embedding_model)
+    for start in range(0, len(ids), batch_size):
+        chroma_collection.add(ids=list(ids[start:start + batch_size]),
+                              documents=list(documents[start:start + batch_size]),
+                              embeddings=np.asarray(embeddings[start:start + batch_size], dtype=np.float32).tolist(),
+                              metadatas=None if metadatas is None else list(metadatas[start:start + batch_size]))
     return chroma_collection
 
-def query_chroma(chroma_collection: chromadb.Collection, query: str, top_k: int) -> List[str]:
+def get_chroma_client(persist_directory: str = None) -> Any:
+    """
+    Returns a Chroma client, persisted to disk if a directory is given.
+
+    Args:
+        persist_directory: The directory to store collections in, or None for an in-memory client.
+
+    Returns:
+        A Chroma client.
+    """
+    import chromadb # pylint: disable=import-outside-toplevel
+
+    if persist_directory is None:
+        return chromadb.Client()
+    return chromadb.PersistentClient(path=persist_directory)
+
+def query_chroma(chroma_collection: "chromadb.Collection", query: str, top_k: int) -> List[str]:
     """
     Queries the Chroma collection for the top_k most relevant chunks to the input query.
     
@@ -101,7 +463,104 @@ def query_chroma(chroma_collection: chromadb.Collection, query: str, top_k: int)
     retrieved_id = results['ids'][0]
     return retrieved_id
 
-def get_doc_embeddings(chroma_collection: chromadb.Collection) -> np.ndarray:
+def query_chroma_many(chroma_collection: "chromadb.Collection", query_embeddings: np.ndarray, top_k: int, batch_size: int = CHROMA_QUERY_BATCH_SIZE) -> List[List[str]]:
+    """
+    Queries the Chroma collection for the top_k most relevant chunks to each of many embedded queries.
+
+    Queries are sent in batches, and only ids are requested, so no documents or embeddings are
+    sent back.
+
+    Args:
+        chroma_collection: The Chroma collection to query.
+        query_embeddings: A (n_queries, dimension) array of query embeddings.
+        top_k: The number of top results to retrieve per query.
+        batch_size: The number of queries sent per call.
+
+    Returns:
+        A list of retrieved chunk IDs for each query.
+    """
+    query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+    retrieved_ids = []
+    for start in range(0, len(query_embeddings), batch_size):
+        results = chroma_collection.query(query_embeddings=query_embeddings[start:start + batch_size].tolist(),
+                                          n_results=top_k,
+                                          include=[])
+        retrieved_ids.extend(results['ids'])
+    return retrieved_ids
+
+def reciprocal_rank_fusion(ranked_ids: List[List[str]], top_k: int, k: int = RRF_K) -> List[str]:
+    """
+    Merges several rankings into one, scoring each id by the sum of 1 / (k + rank) over the rankings it appears in.
+
+    Args:
+        ranked_ids: Lists of ids, each ordered from best to worst.
+        top_k: The number of ids to keep.
+        k: The rank offset, which dampens the influence of the top ranks.
+
+    Returns:
+        A list of at most top_k unique ids, best first. Ties keep the order in which ids were first seen.
+    """
+    scores = {}
+    for ids in ranked_ids:
+        for rank, chunk_id in enumerate(ids, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+def get_collection_data(chroma_collection: "chromadb.Collection", page_size: int = CHROMA_FETCH_PAGE_SIZE) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    Retrieves the ids, documents and embeddings of a Chroma collection in one paginated scan.
+
+    Embeddings are copied page by page into a preallocated, contiguous float32 array, so only one
+    page of Python lists exists at a time.
+
+    Args:
+        chroma_collection: The Chroma collection to retrieve data from.
+        page_size: The number of records fetched per call.
+
+    Returns:
+        The ids, the documents and a (n_documents, dimension) float32 array of embeddings.
+    """
+    n_records = chroma_collection.count()
+    ids, documents = [], []
+    embeddings = None
+    for offset in range(0, n_records, page_size):
+        page = chroma_collection.get(include=['documents', 'embeddings'], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        if embeddings is None:
+            embeddings = np.empty((n_records, len(page['embeddings'][0])), dtype=np.float32)
+        embeddings[len(ids):len(ids) + len(page['ids'])] = page['embeddings']
+        ids.extend(page['ids'])
+        documents.extend(page['documents'])
+    if embeddings is None:
+        embeddings = np.empty((0, 0), dtype=np.float32)
+    return ids, documents, embeddings[:len(ids)]
+
+def get_chunks(chroma_collection: "chromadb.Collection", ids: List[str], page_size: int = CHROMA_FETCH_PAGE_SIZE) -> Tuple[List[str], np.ndarray]:
+    """
+    Retrieves the documents and embeddings of the given chunks, in the order of `ids`.
+
+    Args:
+        chroma_collection: The Chroma collection to retrieve data from.
+        ids: The ids of the chunks.
+        page_size: The number of records fetched per call.
+
+    Returns:
+        The documents and a (n_chunks, dimension) float32 array of embeddings.
+    """
+    documents, embeddings = [], []
+    for start in range(0, len(ids), page_size):
+        page_ids = list(ids[start:start + page_size])
+        page = chroma_collection.get(ids=page_ids, include=['documents', 'embeddings'])
+        positions = {chunk_id: i for i, chunk_id in enumerate(page['ids'])}
+        order = [positions[chunk_id] for chunk_id in page_ids]
+        documents.extend(page['documents'][i] for i in order)
+        embeddings.append(np.asarray(page['embeddings'], dtype=np.float32)[order])
+    if not embeddings:
+        return documents, np.empty((0, 0), dtype=np.float32)
+    return documents, np.concatenate(embeddings)
+
+def get_doc_embeddings(chroma_collection: "chromadb.Collection") -> np.ndarray:
     """
     Retrieves the document embeddings from the Chroma collection.
     
@@ -114,7 +573,7 @@ def get_doc_embeddings(chroma_collection: chromadb.Collection) -> np.ndarray:
     embeddings = chroma_collection.get(include=['embeddings'])['embeddings']
     return embeddings
 
-def get_docs(chroma_collection: chromadb.Collection) -> List[str]:
+def get_docs(chroma_collection: "chromadb.Collection") -> List[str]:
     """
     Retrieves the documents from the Chroma collection.
     
@@ -127,16 +586,22 @@ def get_docs(chroma_collection: chromadb.Collection) -> List[str]:
     documents = chroma_collection.get(include=['documents'])['documents']
     return documents
 
-def _load_pdf(file: Any) -> List[str]:
+def _load_pdf(file: Any) -> Iterator[Tuple[int, str]]:
     """
-    Loads and extracts text from a PDF file.
+    Loads and extracts text from a PDF file, one page at a time.
     
     Args:
         file: The PDF file to load.
     
     Returns:
-        A list of strings, each representing the text of a page.
+        An iterator of page numbers (starting from 1) and the text of each page. Pages without text are skipped.
     """
+    from PyPDF2 import PdfReader # pylint: disable=import-outside-toplevel
+
     pdf = PdfReader(file)
-    pdf_texts = [p.extract_text().strip() for p in pdf.pages if p.extract_text()]
-    return pdf_texts
+    for page_number, page in enumerate(pdf.pages, start=1):
+        with stage("extract_page") as extract_stage:
+            page_text = page.extract_text()
+            extract_stage.add(items=1, bytes=len(page_text))
+        if page_text:
+            yield page_number, page_text.strip()
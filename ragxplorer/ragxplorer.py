@@ -1,46 +1,107 @@
 """
 Ragxplorer.py
 """
+import contextvars
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
+    TYPE_CHECKING,
     Optional,
-    Any
+    Any,
+    List,
+    Tuple
     )
 
 from pydantic import BaseModel, Field
-import pandas as pd
-import umap
-
-from chromadb import Collection
-from chromadb.utils.embedding_functions import (
-    SentenceTransformerEmbeddingFunction,
-    OpenAIEmbeddingFunction,
-    HuggingFaceEmbeddingFunction
-    )
-
-import plotly.graph_objs as go
+import numpy as np
 
 from .rag import (
     build_vector_database,
-    get_doc_embeddings,
-    get_docs,
-    query_chroma
+    build_vector_database_from_pdfs,
+    build_vector_database_from_embeddings,
+    get_chroma_client,
+    get_collection_data,
+    extract_pages,
+    chunk_pages,
+    get_chunks,
+    add_pdf_to_vector_database,
+    add_texts_to_vector_database,
+    next_chunk_id,
+    reciprocal_rank_fusion
     )
 
 from .projections import (
-    set_up_umap,
+    set_up_projector,
+    fit_projections,
+    import_projection_dependencies,
+    align_projections,
+    AlignedProjector,
     get_projections,
     prepare_projections_df,
-    plot_embeddings
+    compact_projections_df,
+    plot_base_traces,
+    plot_overlays
+    )
+
+from .persistence import (
+    save_session,
+    load_session
+    )
+
+from .query_cache import QueryCache
+
+from .embedding_executor import embed_texts
+
+from .comparison import ModelComparison
+
+from .sweep import (
+    SWEEP_PARAMS,
+    SweepResult,
+    SweepResults,
+    expand_grid,
+    validate_config,
+    stage_key
+    )
+
+from .instrumentation import stage
+
+from .retrievers import (
+    Retriever,
+    ChromaRetriever,
+    NumpyRetriever
     )
 
 from .query_expansion import (
+    expand_queries,
     generate_hypothetical_ans,
     generate_sub_qn
     )
 
-from .constants import OPENAI_EMBEDDING_MODELS
+from .constants import (
+    OPENAI_EMBEDDING_MODELS,
+    PROJECTION_BATCH_SIZE,
+    PROJECTION_METHODS,
+    RENDER_MODES,
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_BATCH_SIZE,
+    QUERY_CACHE_SIZE,
+    REFIT_GROWTH_THRESHOLD,
+    REFIT_DRIFT_THRESHOLD,
+    CHROMA_FETCH_PAGE_SIZE,
+    RETRIEVERS,
+    SWEEP_CHUNKING_PARAMS,
+    SWEEP_PROJECTION_PARAMS
+    )
 
+# chromadb, pandas and plotly are slow to import, so they are only imported when they are first
+# used, and `import ragxplorer` stays fast
+if TYPE_CHECKING:
+    import pandas as pd
+    import plotly.graph_objs as go
+    from chromadb import Collection
+    from plotly.basedatatypes import BaseTraceType
 
 class _Documents(BaseModel):
     text: Optional[Any] = None
@@ -56,27 +117,83 @@ class _Query(BaseModel):
 
 class _VizData(BaseModel):
     base_df: Optional[Any] = None
+    base_traces: Optional[Any] = None
+    imported_df: Optional[Any] = None
     query_df: Optional[Any] = None
-    visualisation_df: Optional[Any] = None
+
+class _RefitState(BaseModel):
+    umap_params: Optional[dict] = None
+    landmark_params: Optional[dict] = None
+    n_fitted: Optional[int] = None
+    fitted_mean: Optional[Any] = None
+    fitted_spread: Optional[float] = None
+    n_added: int = 0
+    added_sum: Optional[Any] = None
 
 class RAGxplorer(BaseModel):
     """
     RAGxplorer class for managing the RAG exploration process.
     """
     embedding_model: Optional[str] = Field(default="all-MiniLM-L6-v2")
+    projection_method: Optional[str] = Field(default="umap")
+    embedding_cache_dir: Optional[str] = Field(default=None)
+    embedding_cache_max_bytes: Optional[int] = Field(default=EMBEDDING_CACHE_MAX_BYTES)
+    persist_directory: Optional[str] = Field(default=None)
+    query_cache_size: int = Field(default=QUERY_CACHE_SIZE, ge=0)
+    render_mode: Optional[str] = Field(default="auto")
+    refit_params: Optional[dict] = Field(default=None)
+    retriever: Optional[str] = Field(default="chroma")
+    retriever_params: Optional[dict] = Field(default=None)
     _chosen_embedding_model: Optional[Any] = None
     _vectordb: Optional[Any] = None
     _documents: _Documents = _Documents()
     _projector: Optional[Any] = None
     _query: _Query = _Query()
     _VizData: _VizData = _VizData()
+    _query_cache: Optional[Any] = None
+    _refit_state: Optional[Any] = None
+    _refit_lock: Optional[Any] = None
+    _refit_thread: Optional[Any] = None
+    _refit_error: Optional[Any] = None
+    _retriever: Optional[Any] = None
+    _retriever_key: Optional[Any] = None
 
     def __init__(self, **data):
         super().__init__(**data)
+        if self.projection_method not in PROJECTION_METHODS:
+            raise ValueError(f"Invalid projection method. Please use one of {', '.join(PROJECTION_METHODS)}.")
+        if self.render_mode not in RENDER_MODES:
+            raise ValueError(f"Invalid render mode. Please use one of {', '.join(RENDER_MODES)}.")
+        if self.retriever not in RETRIEVERS:
+            raise ValueError(f"Invalid retriever. Please use one of {', '.join(RETRIEVERS)}.")
         self._set_embedding_model()
+        self._init_state()
+
+    def _init_state(self):
+        """ Resets the loaded documents, projector, query and caches """
+        self._vectordb = None
+        self._documents = _Documents()
+        self._projector = None
+        self._query = _Query()
+        self._VizData = _VizData()
+        self._query_cache = QueryCache(max_size=self.query_cache_size)
+        self._refit_state = _RefitState()
+        self._refit_lock = threading.RLock()
+        self._refit_thread = None
+        self._refit_error = None
+        self._retriever = None
+        self._retriever_key = None
 
     def _set_embedding_model(self):
         """ Sets the embedding model """
+        # pylint: disable=import-outside-toplevel
+        from chromadb.utils.embedding_functions import (
+            SentenceTransformerEmbeddingFunction,
+            OpenAIEmbeddingFunction,
+            HuggingFaceEmbeddingFunction
+            )
+        from .embedding_cache import CachedEmbeddingFunction, EmbeddingCache
+
         if self.embedding_model == 'all-MiniLM-L6-v2':
             self._chosen_embedding_model = SentenceTransformerEmbeddingFunction()
 
@@ -94,7 +211,13 @@ class RAGxplorer(BaseModel):
             except Exception as exc:
                 raise ValueError("Invalid embedding model. Please use all-MiniLM-L6-v2, or a valid OpenAI or HuggingFace embedding model.") from exc
 
-    def load_pdf(self, document_path: str, chunk_size: int = 1000, chunk_overlap: int = 0, verbose: bool = False, umap_params: dict = None):
+        if self.embedding_cache_dir is not None:
+            self._chosen_embedding_model = CachedEmbeddingFunction(embedding_function=self._chosen_embedding_model,
+                                                                   model_name=self.embedding_model,
+                                                                   cache=EmbeddingCache(cache_dir=self.embedding_cache_dir,
+                                                                                        max_bytes=self.embedding_cache_max_bytes))
+
+    def load_pdf(self, document_path: str, chunk_size: int = 1000, chunk_overlap: int = 0, verbose: bool = False, umap_params: dict = None, landmark_params: dict = None, embedding_params: dict = None):
         """
         Load data from a PDF file and prepare it for exploration.
         
@@ -102,77 +225,522 @@ class RAGxplorer(BaseModel):
             document: Path to the PDF document to load.
             chunk_size: Size of the chunks to split the document into.
             chunk_overlap: Number of tokens to overlap between chunks.
+            umap_params: Keyword arguments passed to the projector.
+            landmark_params: If given, the projector is fitted on a sample of landmark embeddings only
+                (e.g. {'n_landmarks': 10000, 'method': 'kmeans', 'n_jobs': 4}), and the remaining chunks
+                are projected in batches.
+            embedding_params: Settings for the embedding stage, e.g. {'batch_size': 64, 'max_workers': 4,
+                'max_retries': 3}.
         """
-        if verbose:
-            print(" ~ Building the vector database...")
-        self._vectordb = build_vector_database(document_path, chunk_size, chunk_overlap, self._chosen_embedding_model)
-        if verbose:
-            print("Completed Building Vector Database ✓")
-        self._documents.embeddings = get_doc_embeddings(self._vectordb)
-        self._documents.text = get_docs(self._vectordb)
-        self._documents.ids = self._vectordb.get()['ids']
+        with stage("load_pdf", chunk_size=chunk_size, chunk_overlap=chunk_overlap):
+            if verbose:
+                print(" ~ Building the vector database...")
+            self._vectordb = build_vector_database(document_path, chunk_size, chunk_overlap, self._chosen_embedding_model,
+                                                   embedding_params=embedding_params,
+                                                   persist_directory=self.persist_directory)
+            if verbose:
+                print("Completed Building Vector Database ✓")
+            self._project_vectordb(umap_params=umap_params, landmark_params=landmark_params, verbose=verbose)
+
+    def load_pdfs(self, document_paths: List[str], chunk_size: int = 1000, chunk_overlap: int = 0, verbose: bool = False, umap_params: dict = None, landmark_params: dict = None, embedding_params: dict = None, n_jobs: int = 1):
+        """
+        Load data from several PDF files into one collection and prepare it for exploration.
+
+        Args:
+            document_paths: Paths to the PDF documents to load. Directories are searched for PDF files.
+            chunk_size: Size of the chunks to split the documents into.
+            chunk_overlap: Number of tokens to overlap between chunks.
+            umap_params: Keyword arguments passed to the projector.
+            landmark_params: If given, the projector is fitted on a sample of landmark embeddings only. See `load_pdf`.
+            embedding_params: Settings for the embedding stage. See `load_pdf`.
+            n_jobs: Number of worker processes used to extract and chunk the documents.
+        """
+        with stage("load_pdf", chunk_size=chunk_size, chunk_overlap=chunk_overlap, n_files=len(document_paths)):
+            if verbose:
+                print(" ~ Building the vector database...")
+            self._vectordb = build_vector_database_from_pdfs(document_paths, chunk_size, chunk_overlap, self._chosen_embedding_model,
+                                                             embedding_params=embedding_params,
+                                                             n_jobs=n_jobs,
+                                                             persist_directory=self.persist_directory)
+            if verbose:
+                print("Completed Building Vector Database ✓")
+            self._project_vectordb(umap_params=umap_params, landmark_params=landmark_params, verbose=verbose)
+
+    def _project_vectordb(self, umap_params: dict = None, landmark_params: dict = None, verbose: bool = False):
+        """
+        Fetch the documents of the vector database, then fit a projector on them and project them.
+        """
+        self._query_cache.clear()
+        with stage("get_collection_data") as fetch_stage:
+            self._documents.ids, self._documents.text, self._documents.embeddings = get_collection_data(self._vectordb)
+            fetch_stage.add(items=len(self._documents.ids), bytes=self._documents.embeddings.nbytes)
         if verbose:
             print(" ~ Reducing the dimensionality of embeddings...")
-        self._projector = set_up_umap(embeddings=self._documents.embeddings, umap_params=umap_params)
-        self._documents.projections = get_projections(embedding=self._documents.embeddings,
-                                                      umap_transform=self._projector)
-        self._VizData.base_df = prepare_projections_df(document_ids=self._documents.ids,
-                                                                document_projections=self._documents.projections,
-                                                                document_text=self._documents.text)
+        self._projector, self._documents.projections = fit_projections(embeddings=self._documents.embeddings,
+                                                                       umap_params=umap_params,
+                                                                       projection_method=self.projection_method,
+                                                                       landmark_params=landmark_params)
+        self._set_base_df(prepare_projections_df(document_ids=self._documents.ids,
+                                                document_projections=self._documents.projections,
+                                                document_text=self._documents.text))
+        self._refit_state = _RefitState(umap_params=umap_params, landmark_params=landmark_params)
         if verbose:
             print("Completed reducing dimensionality of embeddings ✓")
 
-    def visualize_query(self, query: str, retrieval_method: str="naive", top_k:int=5, query_shape_size:int=5, import_projection_data:pd.DataFrame = None) -> go.Figure:
-        if import_projection_data is not None:
-            self._VizData.base_df = import_projection_data
-        else:
-            if self._vectordb is None or self._VizData.base_df is None:
-                raise RuntimeError("Please load the pdf first.")
-        
+    def sweep(self, document_path: str, grid: Any, queries: List[str] = None, n_jobs: int = 1, embedding_params: dict = None, verbose: bool = False) -> SweepResults:
+        """
+        Explore a PDF file under every combination of the settings in a grid, doing the work that
+        configurations have in common only once.
+
+        Pages are extracted once and chunked once per chunking setting. Every distinct chunk, query and
+        query expansion is embedded once, through an in-memory memo shared by all configurations. One
+        projector is fitted per chunking and projection setting, so configurations that only differ in
+        retrieval settings reuse it. Projectors are fitted, and configurations retrieved, on `n_jobs` threads.
+
+        Args:
+            document_path: Path to the PDF document to explore.
+            grid: Lists of values by setting, e.g. {'chunk_size': [500, 1000], 'top_k': [3, 5]}, or a list of
+                such grids. The settings are 'chunk_size', 'chunk_overlap', 'projection_method', 'umap_params',
+                'landmark_params', 'retriever', 'retriever_params', 'retrieval_method' and 'top_k'. Settings left
+                out default to this explorer's.
+            queries: If given, the chunks retrieved for each query are reported for every configuration.
+            n_jobs: Number of threads used to fit projectors and run configurations.
+            embedding_params: Settings for the embedding stage. See `load_pdf`.
+            verbose: Whether to print progress messages.
+
+        Returns:
+            SweepResults: For every configuration, an explorer ready for `visualize_query`, the retrieved
+            chunk ids and the time spent in each stage, and the time spent in each phase of the sweep.
+            `to_dataframe` tabulates the configurations. Explorers with the same chunking settings share
+            one vector database, so they are meant for exploring rather than for adding documents to.
+
+        Raises:
+            ValueError: If the grid has unknown settings or invalid values.
+        """
+        # pylint: disable=too-many-locals
+        from .embedding_cache import MemoEmbeddingFunction # pylint: disable=import-outside-toplevel
+
+        explorer_settings = {name: getattr(self, name) for name in SWEEP_PARAMS if name in type(self).model_fields}
+        configs = [{**SWEEP_PARAMS, **explorer_settings, **config} for config in expand_grid(grid)]
+        for config in configs:
+            validate_config(config)
+        projection_params = {**SWEEP_CHUNKING_PARAMS, **SWEEP_PROJECTION_PARAMS}
+        embedding_function = MemoEmbeddingFunction(self._chosen_embedding_model)
+        queries = list(queries or [])
+        timings = {}
+        sweep_start = time.perf_counter()
+
+        with stage("sweep", n_configs=len(configs), n_jobs=n_jobs) as sweep_stage, \
+                ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            sweep_stage.add(items=len(configs))
+            if verbose:
+                print(f" ~ Sweeping {len(configs)} configurations...")
+            start = time.perf_counter()
+            pages = extract_pages(document_path)
+            timings["extract"] = time.perf_counter() - start
+
+            chunkings = {}
+            for config in configs:
+                key = stage_key(config, SWEEP_CHUNKING_PARAMS)
+                if key not in chunkings:
+                    start = time.perf_counter()
+                    chunkings[key] = {"chunks": list(chunk_pages(pages, config["chunk_size"], config["chunk_overlap"]))}
+                    chunkings[key]["chunk"] = time.perf_counter() - start
+            timings["chunk"] = sum(chunking["chunk"] for chunking in chunkings.values())
+
+            # Expand the queries once per retrieval method, so that the configurations find the expansions cached
+            start = time.perf_counter()
+            search_queries = []
+            if queries:
+                for retrieval_method in dict.fromkeys(config["retrieval_method"] for config in configs):
+                    search_queries += [search_query
+                                       for expansion in self._expand_queries(queries=queries, retrieval_method=retrieval_method)
+                                       for search_query in expansion]
+            timings["expand"] = time.perf_counter() - start
+
+            if verbose:
+                print(" ~ Embedding the chunks and queries...")
+            start = time.perf_counter()
+            texts = [text for chunking in chunkings.values() for text, _ in chunking["chunks"]]
+            embed_texts(list(dict.fromkeys(texts + queries + search_queries)), embedding_function, **(embedding_params or {}))
+            timings["embed"] = time.perf_counter() - start
+
+            for chunking in chunkings.values():
+                start = time.perf_counter()
+                chunk_texts = [text for text, _ in chunking["chunks"]]
+                chunking["documents"] = _Documents(ids=[str(i) for i in range(len(chunk_texts))],
+                                                   text=chunk_texts,
+                                                   embeddings=embedding_function.embeddings(chunk_texts))
+                chunking["collection"] = build_vector_database_from_embeddings(ids=chunking["documents"].ids,
+                                                                               documents=chunk_texts,
+                                                                               embeddings=chunking["documents"].embeddings,
+                                                                               embedding_model=embedding_function,
+                                                                               persist_directory=self.persist_directory,
+                                                                               metadatas=[metadata for _, metadata in chunking["chunks"]])
+                chunking["index"] = time.perf_counter() - start
+            timings["index"] = sum(chunking["index"] for chunking in chunkings.values())
+
+            if verbose:
+                print(" ~ Fitting the projectors...")
+            start = time.perf_counter()
+            fits = {}
+            for config in configs:
+                key = stage_key(config, projection_params)
+                if key not in fits:
+                    import_projection_dependencies(config["projection_method"])
+                    # Run in a copy of the current context, so the projection stages nest under the sweep
+                    fits[key] = executor.submit(contextvars.copy_context().run, _fit_sweep_projector,
+                                                chunkings[stage_key(config, SWEEP_CHUNKING_PARAMS)]["documents"], config)
+            fits = {key: future.result() for key, future in fits.items()}
+            timings["project"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            futures = [executor.submit(contextvars.copy_context().run, self._sweep_configuration, config,
+                                       chunkings[stage_key(config, SWEEP_CHUNKING_PARAMS)],
+                                       fits[stage_key(config, projection_params)],
+                                       embedding_function, queries)
+                       for config in configs]
+            results = [future.result() for future in futures]
+            timings["retrieve"] = time.perf_counter() - start
+
+        seen = {"chunk": set(), "index": set(), "project": set()}
+        for result in results:
+            for name, params in (("chunk", SWEEP_CHUNKING_PARAMS), ("index", SWEEP_CHUNKING_PARAMS), ("project", projection_params)):
+                key = stage_key(result.params, params)
+                if key in seen[name]:
+                    result.shared.append(name)
+                seen[name].add(key)
+        timings["total"] = time.perf_counter() - sweep_start
+        if verbose:
+            print(f"Completed sweeping {len(configs)} configurations in {timings['total']:.1f}s ✓")
+        return SweepResults(results=results, timings=timings, n_embedded=embedding_function.n_embedded)
+
+    def _sweep_configuration(self, config: dict, chunking: dict, fit: dict, embedding_function: Any, queries: List[str]) -> SweepResult:
+        """
+        Create the explorer of one sweep configuration from the shared chunks, collection and projector,
+        and retrieve the sweep queries with it.
+        """
+        documents = chunking["documents"]
+        explorer = self._spawn(settings={name: config[name] for name in SWEEP_PARAMS if name in type(self).model_fields},
+                               embedding_function=embedding_function,
+                               vectordb=chunking["collection"],
+                               documents=_Documents(ids=documents.ids, text=documents.text, embeddings=documents.embeddings,
+                                                    projections=fit["projections"]),
+                               projector=fit["projector"],
+                               base_df=fit["base_df"],
+                               refit_state=_RefitState(umap_params=config["umap_params"], landmark_params=config["landmark_params"]))
+
+        timings = {"chunk": chunking["chunk"], "index": chunking["index"], "project": fit["project"]}
+        retrieved_ids = None
+        if queries:
+            start = time.perf_counter()
+            retrieved_ids = explorer.retrieve_many(queries=queries, retrieval_method=config["retrieval_method"], top_k=config["top_k"])
+            timings["retrieve"] = time.perf_counter() - start
+        return SweepResult(params=config, explorer=explorer, n_chunks=len(documents.ids), retrieved_ids=retrieved_ids, timings=timings)
+
+    def compare_models(self, document_path: str, embedding_models: List[str], queries: List[str] = None, chunk_size: int = 1000, chunk_overlap: int = 0, retrieval_method: str = "naive", top_k: int = 5, umap_params: dict = None, landmark_params: dict = None, align: bool = True, embedding_params: dict = None, verbose: bool = False) -> ModelComparison:
+        """
+        Explore a PDF file with several embedding models side by side.
+
+        The document is extracted and chunked once. Each model then embeds the chunks, builds its own vector
+        database and fits its projector on its own thread, so the comparison takes about as long as the
+        slowest model alone. The projections of every model are aligned onto the first model's by Procrustes
+        analysis, so that the same chunks sit in about the same place in every view.
+
+        Args:
+            document_path: Path to the PDF document to explore.
+            embedding_models: The embedding models to compare, as accepted by `embedding_model`. The first is
+                the reference the others are aligned to.
+            queries: If given, the chunks each model retrieves for each query are reported, and compared by
+                `ModelComparison.overlap`.
+            chunk_size: Size of the chunks to split the document into.
+            chunk_overlap: Number of tokens to overlap between chunks.
+            retrieval_method: The method used to retrieve the queries, 'naive', 'HyDE' or 'multi_qns'.
+            top_k: The number of top documents to retrieve per query.
+            umap_params: Keyword arguments passed to the projector of every model.
+            landmark_params: If given, the projectors are fitted on a sample of landmark embeddings only. See `load_pdf`.
+            align: Whether to align the projections of every model onto the first model's.
+            embedding_params: Settings for the embedding stage of every model. See `load_pdf`.
+            verbose: Whether to print progress messages.
+
+        Returns:
+            ModelComparison: An explorer per model, ready for `visualize_query`, the retrieved chunk ids, and
+            the time spent by each model. `ModelComparison.visualize_query` shows the aligned views side by side.
+
+        Raises:
+            ValueError: If the embedding models are not distinct, or the retrieval method is invalid.
+        """
+        if not embedding_models or len(set(embedding_models)) != len(embedding_models):
+            raise ValueError("Please give one or more distinct embedding models to compare.")
         if retrieval_method not in ["naive", "HyDE", "multi_qns"]:
             raise ValueError("Invalid retrieval method. Please use naive, HyDE, or multi_qns.")
+        embedding_functions = {model: self._get_embedding_function(model) for model in embedding_models}
+        queries = list(queries or [])
+        timings, model_timings = {}, {model: {} for model in embedding_models}
+        compare_start = time.perf_counter()
 
-        self._query.original_query = query
+        with stage("compare_models", n_models=len(embedding_models)) as compare_stage, \
+                ThreadPoolExecutor(max_workers=len(embedding_models)) as executor:
+            start = time.perf_counter()
+            pages = extract_pages(document_path)
+            timings["extract"] = time.perf_counter() - start
+            start = time.perf_counter()
+            chunks = list(chunk_pages(pages, chunk_size, chunk_overlap))
+            ids, texts = [str(i) for i in range(len(chunks))], [text for text, _ in chunks]
+            timings["chunk"] = time.perf_counter() - start
+            compare_stage.add(items=len(chunks))
 
-        if (self.embedding_model == "all-MiniLM-L6-v2") or (self.embedding_model in OPENAI_EMBEDDING_MODELS):
-            # Brackets around the query required as per latest update to openai client (https://platform.openai.com/docs/guides/embeddings/use-cases). 
-            # It doesn't look like chromadb updated to reflect this.
-            self._query.original_query_projection = get_projections(embedding=self._chosen_embedding_model([self._query.original_query]),
-                                                                    umap_transform=self._projector)
-        else:
-            self._query.original_query_projection = get_projections(embedding=[self._chosen_embedding_model(self._query.original_query)],
-                                                                    umap_transform=self._projector)
+            # Expand the queries once, so that every model finds the expansions cached
+            start = time.perf_counter()
+            if queries:
+                self._expand_queries(queries=queries, retrieval_method=retrieval_method)
+            timings["expand"] = time.perf_counter() - start
 
-        self._VizData.query_df = pd.DataFrame({"x": [self._query.original_query_projection[0][0]],
-                                      "y": [self._query.original_query_projection[1][0]],
-                                      "document_cleaned": query,
-                                      "category": "Original Query",
-                                      "size": query_shape_size})
+            if verbose:
+                print(f" ~ Embedding, indexing and projecting the chunks with {len(embedding_models)} models...")
+            start = time.perf_counter()
+            import_projection_dependencies(self.projection_method)
+            futures = {model: executor.submit(contextvars.copy_context().run, _embed_index_and_fit, chunks, embedding_function,
+                                              self.projection_method, umap_params, landmark_params, embedding_params,
+                                              self.persist_directory)
+                       for model, embedding_function in embedding_functions.items()}
+            fits = {model: future.result() for model, future in futures.items()}
+            timings["embed_index_and_project"] = time.perf_counter() - start
 
-        if retrieval_method == "naive":
-            self._query.actual_search_queries = self._query.original_query
+            disparities = {embedding_models[0]: 0.0}
+            for model in embedding_models[1:]:
+                matrix, offset, disparities[model] = align_projections(fits[model]["projections"], fits[embedding_models[0]]["projections"])
+                if align:
+                    aligned = np.column_stack(fits[model]["projections"]) @ matrix + offset
+                    fits[model]["projections"] = (aligned[:, 0], aligned[:, 1])
+                    fits[model]["projector"] = AlignedProjector(fits[model]["projector"], matrix, offset)
 
-        elif retrieval_method == "HyDE":
-            if "OPENAI_API_KEY" not in os.environ:
-                raise OSError("OPENAI_API_KEY is not set")
-            self._query.actual_search_queries = generate_hypothetical_ans(query=self._query.original_query)
+            explorers = {}
+            for model in embedding_models:
+                fit = fits[model]
+                explorers[model] = self._spawn(settings={"embedding_model": model},
+                                               embedding_function=embedding_functions[model],
+                                               vectordb=fit["vectordb"],
+                                               documents=_Documents(ids=ids, text=texts, embeddings=fit["embeddings"],
+                                                                    projections=fit["projections"]),
+                                               projector=fit["projector"],
+                                               base_df=prepare_projections_df(document_ids=ids,
+                                                                              document_projections=fit["projections"],
+                                                                              document_text=texts),
+                                               refit_state=_RefitState(umap_params=umap_params, landmark_params=landmark_params))
+                model_timings[model] = {"embed": fit["embed"], "index": fit["index"], "project": fit["project"]}
 
-        elif retrieval_method == "multi_qns":
-            if "OPENAI_API_KEY" not in os.environ:
-                raise OSError("OPENAI_API_KEY is not set")
-            self._query.actual_search_queries = generate_sub_qn(query=self._query.original_query)
+            retrieved_ids = None
+            if queries:
+                if verbose:
+                    print(f" ~ Retrieving {len(queries)} queries with every model...")
+                start = time.perf_counter()
+                futures = {model: executor.submit(contextvars.copy_context().run, _timed, explorer.retrieve_many,
+                                                  queries=queries, retrieval_method=retrieval_method, top_k=top_k)
+                           for model, explorer in explorers.items()}
+                retrieved_ids = {}
+                for model, future in futures.items():
+                    retrieved_ids[model], model_timings[model]["retrieve"] = future.result()
+                timings["retrieve"] = time.perf_counter() - start
+
+        timings["total"] = time.perf_counter() - compare_start
+        if verbose:
+            print(f"Completed comparing {len(embedding_models)} embedding models in {timings['total']:.1f}s ✓")
+        return ModelComparison(models=list(embedding_models),
+                               explorers=explorers,
+                               ids=ids,
+                               projections={model: fits[model]["projections"] for model in embedding_models},
+                               disparities=disparities,
+                               retrieved_ids=retrieved_ids,
+                               n_chunks=len(ids),
+                               timings=timings,
+                               timings_by_model=model_timings)
+
+    def _get_embedding_function(self, embedding_model: str) -> Any:
+        """
+        Get the embedding function of an embedding model, reusing this explorer's for its own model.
+        """
+        if embedding_model == self.embedding_model:
+            return self._chosen_embedding_model
+        explorer = self.model_copy(update={"embedding_model": embedding_model})
+        explorer._set_embedding_model() # pylint: disable=protected-access
+        return explorer._chosen_embedding_model # pylint: disable=protected-access
+
+    def _spawn(self, settings: dict, embedding_function: Any, vectordb: "Collection", documents: _Documents, projector: Any, base_df: "pd.DataFrame", refit_state: _RefitState) -> "RAGxplorer":
+        """
+        Create an explorer with some settings changed, loaded with documents that were already embedded and
+        projected, without re-embedding them or re-fitting the projector.
+        """
+        # pylint: disable=protected-access
+        explorer = self.model_copy(update=settings)
+        explorer._init_state()
+        explorer._chosen_embedding_model = embedding_function
+        explorer._vectordb = vectordb
+        explorer._documents = documents
+        explorer._projector = projector
+        explorer._set_base_df(base_df)
+        explorer._refit_state = refit_state
+        return explorer
+
+    def add_pdf(self, document_path: str, chunk_size: int = 1000, chunk_overlap: int = 0, verbose: bool = False, embedding_params: dict = None) -> List[str]:
+        """
+        Add a PDF file to the loaded documents, without rebuilding the vector database or refitting the projector.
+
+        Only the new chunks are embedded, and they are projected with the current projector. The projector
+        is refitted once the documents have grown or drifted past the thresholds set in `refit_params`:
+        'growth', the chunks added since the last fit as a fraction of the chunks it was fitted on,
+        'drift', the shift of the mean embedding relative to the spread of the embeddings, and
+        'background', whether to refit in a background thread. A threshold of None disables it.
+
+        Args:
+            document_path: Path to the PDF document to add.
+            chunk_size: Size of the chunks to split the document into.
+            chunk_overlap: Number of tokens to overlap between chunks.
+            verbose: Whether to print progress messages.
+            embedding_params: Settings for the embedding stage. See `load_pdf`.
+
+        Returns:
+            List[str]: The ids of the added chunks.
 
-        self._query.retrieved_docs = query_chroma(chroma_collection=self._vectordb,
-                                                  query=self._query.actual_search_queries,
-                                                  top_k=top_k)
+        Raises:
+            RuntimeError: If no documents have been loaded.
+        """
+        return self._add_chunks(lambda start_id: add_pdf_to_vector_database(self._vectordb, document_path, chunk_size, chunk_overlap,
+                                                                            self._chosen_embedding_model, start_id,
+                                                                            embedding_params=embedding_params),
+                                verbose=verbose)
+
+    def add_documents(self, documents: List[str], metadatas: List[dict] = None, chunk_size: int = 1000, chunk_overlap: int = 0, verbose: bool = False, embedding_params: dict = None) -> List[str]:
+        """
+        Add texts to the loaded documents, without rebuilding the vector database or refitting the projector.
+        See `add_pdf`.
+
+        Args:
+            documents: The texts to add.
+            metadatas: Metadata of each text, copied to each of its chunks. Defaults to {'index': i}, the
+                position of the text in `documents`.
+            chunk_size: Size of the chunks to split the texts into.
+            chunk_overlap: Number of tokens to overlap between chunks.
+            verbose: Whether to print progress messages.
+            embedding_params: Settings for the embedding stage. See `load_pdf`.
+
+        Returns:
+            List[str]: The ids of the added chunks.
+
+        Raises:
+            RuntimeError: If no documents have been loaded.
+        """
+        return self._add_chunks(lambda start_id: add_texts_to_vector_database(self._vectordb, documents, chunk_size, chunk_overlap,
+                                                                              self._chosen_embedding_model, start_id,
+                                                                              metadatas=metadatas,
+                                                                              embedding_params=embedding_params),
+                                verbose=verbose)
+
+    def refit(self, background: bool = False, verbose: bool = False):
+        """
+        Refit the projector on all loaded documents and recompute their projections, with the settings
+        the documents were loaded with.
+
+        Args:
+            background: Whether to refit in a background thread. The current projections stay in use
+                until the refit completes. See `wait_for_refit`.
+            verbose: Whether to print progress messages.
 
-        self._VizData.base_df.loc[self._VizData.base_df['id'].isin(self._query.retrieved_docs), "category"] = "Retrieved"
+        Raises:
+            RuntimeError: If no documents have been loaded.
+        """
+        if self._documents.embeddings is None:
+            raise RuntimeError("Please load the pdf first.")
+        with self._refit_lock:
+            if self._refit_thread is not None and self._refit_thread.is_alive():
+                return
+            state, embeddings = self._refit_state, self._documents.embeddings
+            if background:
+                self._refit_error = None
+                import_projection_dependencies(self.projection_method)
+                self._refit_thread = threading.Thread(target=self._refit, args=(state, embeddings, verbose, True), daemon=True)
+                self._refit_thread.start()
+                return
+        self._refit(state, embeddings, verbose, False)
+
+    def wait_for_refit(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a background refit to complete.
+
+        Args:
+            timeout: The maximum number of seconds to wait, or None to wait until it completes.
+
+        Returns:
+            bool: Whether no refit is running anymore.
+
+        Raises:
+            RuntimeError: If the background refit failed.
+        """
+        if self._refit_thread is not None:
+            self._refit_thread.join(timeout)
+            if self._refit_thread.is_alive():
+                return False
+        if self._refit_error is not None:
+            error, self._refit_error = self._refit_error, None
+            raise RuntimeError(f"Error in refitting the projector: {error}") from error
+        return True
+
+    def visualize_query(self, query: str, retrieval_method: str="naive", top_k:int=5, query_shape_size:int=5, import_projection_data:"pd.DataFrame" = None) -> "go.Figure":
+        with stage("visualize_query", retrieval_method=retrieval_method, top_k=top_k) as visualize_stage:
+            visualize_stage.add(items=1)
+            if import_projection_data is not None:
+                if import_projection_data is not self._VizData.imported_df:
+                    self._VizData.imported_df = import_projection_data
+                    self._set_base_df(compact_projections_df(import_projection_data))
+            else:
+                if self._vectordb is None or self._VizData.base_df is None:
+                    raise RuntimeError("Please load the pdf first.")
         
-        self._VizData.visualisation_df = pd.concat([self._VizData.base_df, self._VizData.query_df], axis = 0)
+            if retrieval_method not in ["naive", "HyDE", "multi_qns"]:
+                raise ValueError("Invalid retrieval method. Please use naive, HyDE, or multi_qns.")
+
+            self._query.original_query = query
+            cached_query = self._query_cache.entry(query)
+            if retrieval_method not in cached_query.expansions:
+                cached_query.expansions[retrieval_method] = self._expand_query(query=query, retrieval_method=retrieval_method)
+            search_queries, expansion_category = cached_query.expansions[retrieval_method]
+            search_queries = list(search_queries)
+            self._query.actual_search_queries = search_queries if retrieval_method == "multi_qns" else search_queries[0]
+
+            # The query and its expansions are embedded, projected and searched with one call each,
+            # and only the texts that are not cached yet are embedded and projected
+            texts = [query] + (search_queries if expansion_category is not None else [])
+            missing_texts = self._query_cache.missing_vectors(cached_query, texts)
+            if missing_texts:
+                missing_embeddings = self._embed_texts(missing_texts)
+                self._query_cache.put_vectors(cached_query, missing_texts, missing_embeddings,
+                                              get_projections(embedding=missing_embeddings, umap_transform=self._projector))
+            embeddings, projections = self._query_cache.get_vectors(cached_query, texts)
+            self._query.original_query_projection = (projections[0][:1], projections[1][:1])
+
+            # Rebuilding the retriever after its settings changed drops the cached retrievals, so it
+            # must be fetched before they are looked up
+            retriever = self._get_retriever()
+            retrieved_docs = self._query_cache.get_retrieved(cached_query, retrieval_method, top_k)
+            if retrieved_docs is None:
+                with stage("retrieve", retriever=self.retriever, top_k=top_k) as retrieve_stage:
+                    retrieved_docs = retriever.query_fused(query_embeddings=embeddings[1:] if expansion_category is not None else embeddings,
+                                                           top_k=top_k)
+                    retrieve_stage.add(items=len(texts) - 1 if expansion_category is not None else 1)
+                cached_query.retrieved[(retrieval_method, top_k)] = list(retrieved_docs)
+            self._query.retrieved_docs = retrieved_docs
+
+            import pandas as pd # pylint: disable=import-outside-toplevel
 
-        return plot_embeddings(self._VizData.visualisation_df)
+            self._VizData.query_df = pd.DataFrame({"x": projections[0],
+                                          "y": projections[1],
+                                          "document_cleaned": texts,
+                                          "category": ["Original Query"] + [expansion_category] * (len(texts) - 1),
+                                          "size": query_shape_size})
 
-    def visualise_query(self, query: str, retrieval_method: str="naive", top_k:int=5, query_shape_size:int=5, import_projection_data:pd.DataFrame = None) -> go.Figure:
+            return plot_overlays(self._get_base_traces(), [self._retrieved_df(self._query.retrieved_docs), self._VizData.query_df])
+
+    def visualise_query(self, query: str, retrieval_method: str="naive", top_k:int=5, query_shape_size:int=5, import_projection_data:"pd.DataFrame" = None) -> "go.Figure":
         """
         Visualize the query results in a 2D projection using Plotly.
 
@@ -190,57 +758,514 @@ class RAGxplorer(BaseModel):
         """
         return self.visualize_query(query=query, retrieval_method=retrieval_method, top_k=top_k, query_shape_size=query_shape_size, import_projection_data = None)
 
-    def export_chroma(self) -> Collection:
+    def query_cache_info(self) -> dict:
+        """
+        Report how often `visualize_query` reused cached query embeddings, projections and retrievals.
+
+        The cache holds the `query_cache_size` most recently used queries, and a size of 0 disables it.
+        It is cleared whenever the projector or the collection changes.
+
+        Returns:
+            dict: The hit and miss counters, and the current and maximum number of cached queries.
+        """
+        return self._query_cache.info()
+
+    def clear_query_cache(self):
+        """
+        Drop every cached query embedding, projection and retrieval.
+        """
+        self._query_cache.clear()
+
+    def retrieve_many(self, queries: List[str], retrieval_method: str = "naive", top_k: int = 5) -> List[List[str]]:
+        """
+        Retrieve the top_k chunks for each of many queries, with batched embedding and vector search calls.
+
+        Args:
+            queries (List[str]): The queries to run.
+            retrieval_method (str): The method used for document retrieval, 'naive', 'HyDE' or 'multi_qns'.
+            top_k (int): The number of top documents to retrieve per query.
+
+        Returns:
+            List[List[str]]: The retrieved chunk ids for each query.
+
+        Raises:
+            RuntimeError: If the document has not been loaded before retrieval.
+        """
+        _, retrieved_ids = self._retrieve_many(queries=queries, retrieval_method=retrieval_method, top_k=top_k)
+        return retrieved_ids
+
+    def visualize_queries(self, queries: List[str], retrieval_method: str = "naive", top_k: int = 5, query_shape_size: int = 5) -> Tuple["go.Figure", List[List[str]]]:
+        """
+        Visualize many queries, and the chunks retrieved for them, in one 2D projection.
+
+        All queries are embedded in batches, projected with one call to the projector and
+        retrieved with batched vector search calls.
+
+        Args:
+            queries (List[str]): The queries to visualize.
+            retrieval_method (str): The method used for document retrieval, 'naive', 'HyDE' or 'multi_qns'.
+            top_k (int): The number of top documents to retrieve per query.
+            query_shape_size (int): The size of the shape to represent the queries in the plot.
+
+        Returns:
+            Tuple[go.Figure, List[List[str]]]: A Plotly figure showing every query and every retrieved chunk,
+            and the retrieved chunk ids for each query.
+
+        Raises:
+            RuntimeError: If the document has not been loaded before visualization.
+        """
+        with stage("visualize_queries", retrieval_method=retrieval_method, top_k=top_k) as visualize_stage:
+            visualize_stage.add(items=len(queries))
+            query_embeddings, retrieved_ids = self._retrieve_many(queries=queries, retrieval_method=retrieval_method, top_k=top_k)
+            query_projections = get_projections(embedding=query_embeddings, umap_transform=self._projector)
+
+            import pandas as pd # pylint: disable=import-outside-toplevel
+
+            self._VizData.query_df = pd.DataFrame({"x": query_projections[0],
+                                                   "y": query_projections[1],
+                                                   "document_cleaned": queries,
+                                                   "category": "Original Query",
+                                                   "size": query_shape_size})
+            all_retrieved_ids = {chunk_id for chunk_ids in retrieved_ids for chunk_id in chunk_ids}
+            fig = plot_overlays(self._get_base_traces(), [self._retrieved_df(all_retrieved_ids), self._VizData.query_df])
+            return fig, retrieved_ids
+
+    def _retrieve_many(self, queries: List[str], retrieval_method: str, top_k: int) -> Tuple[np.ndarray, List[List[str]]]:
+        """
+        Embed many queries and retrieve the top_k chunks for each.
+
+        Returns:
+            Tuple[np.ndarray, List[List[str]]]: The embeddings of the original queries, and the
+            retrieved chunk ids for each query.
+        """
+        if self._vectordb is None or self._VizData.base_df is None:
+            raise RuntimeError("Please load the pdf first.")
+        if retrieval_method not in ["naive", "HyDE", "multi_qns"]:
+            raise ValueError("Invalid retrieval method. Please use naive, HyDE, or multi_qns.")
+
+        expansions = self._expand_queries(queries=queries, retrieval_method=retrieval_method)
+        search_queries = [search_query for expansion in expansions for search_query in expansion]
+        if retrieval_method == "naive":
+            search_queries = []
+
+        embeddings = self._embed_texts(list(queries) + search_queries)
+        query_embeddings = embeddings[:len(queries)]
+        search_embeddings = embeddings[len(queries):] if search_queries else query_embeddings
+        with stage("retrieve", retriever=self.retriever, top_k=top_k) as retrieve_stage:
+            ranked_ids = self._get_retriever().query(query_embeddings=search_embeddings, top_k=top_k)
+            retrieve_stage.add(items=len(search_embeddings))
+        # Fuse the rankings of each query's expansions back into one ranking per query
+        retrieved_ids = []
+        start = 0
+        for expansion in expansions:
+            retrieved_ids.append(reciprocal_rank_fusion(ranked_ids[start:start + len(expansion)], top_k))
+            start += len(expansion)
+        return query_embeddings, retrieved_ids
+
+    def _expand_query(self, query: str, retrieval_method: str) -> Tuple[List[str], Optional[str]]:
+        """
+        Expand a query into the queries that are searched for it.
+
+        Returns:
+            Tuple[List[str], Optional[str]]: The search queries, and the category the expansions are
+            plotted as, or None if the query is searched as is.
+        """
+        if retrieval_method == "naive":
+            return [query], None
+        if "OPENAI_API_KEY" not in os.environ:
+            raise OSError("OPENAI_API_KEY is not set")
+        if retrieval_method == "HyDE":
+            return [generate_hypothetical_ans(query=query)], "Hypothetical Ans"
+        return list(generate_sub_qn(query=query)), "Sub-Questions"
+
+    def _expand_queries(self, queries: List[str], retrieval_method: str) -> List[List[str]]:
+        """
+        Expand many queries, sending the LLM requests concurrently.
+
+        Returns:
+            List[List[str]]: The search queries of each query.
+        """
+        if retrieval_method == "naive":
+            return [[query] for query in queries]
+        if "OPENAI_API_KEY" not in os.environ:
+            raise OSError("OPENAI_API_KEY is not set")
+        expansions = expand_queries(queries=list(queries), retrieval_method=retrieval_method)
+        if retrieval_method == "HyDE":
+            return [[expansion] for expansion in expansions]
+        return [list(expansion) for expansion in expansions]
+
+    def _add_chunks(self, add_to_vectordb: Any, verbose: bool = False) -> List[str]:
+        """
+        Add chunks to the vector database with `add_to_vectordb`, which is called with the first free
+        chunk id and returns the ids of the added chunks, then project them and extend the loaded documents.
+        """
+        if self._vectordb is None or self._projector is None or self._VizData.base_df is None:
+            raise RuntimeError("Please load the pdf first.")
+        with self._refit_lock:
+            if verbose:
+                print(" ~ Adding to the vector database...")
+            new_ids = add_to_vectordb(next_chunk_id(self._documents.ids))
+            if not new_ids:
+                return []
+            new_text, new_embeddings = get_chunks(self._vectordb, new_ids)
+            new_projections = get_projections(embedding=new_embeddings, umap_transform=self._projector)
+            self._record_growth(new_embeddings)
+
+            self._documents.ids = list(self._documents.ids) + new_ids
+            self._documents.text = list(self._documents.text) + new_text
+            self._documents.embeddings = np.concatenate([self._documents.embeddings, new_embeddings])
+            self._documents.projections = (np.concatenate([self._documents.projections[0], new_projections[0]]),
+                                           np.concatenate([self._documents.projections[1], new_projections[1]]))
+            import pandas as pd # pylint: disable=import-outside-toplevel
+
+            new_df = prepare_projections_df(document_ids=new_ids, document_projections=new_projections, document_text=new_text)
+            self._set_base_df(pd.concat([self._VizData.base_df, new_df], ignore_index=True))
+            self._query_cache.clear_retrieved()
+            refit_reason = self._refit_reason()
+        if verbose:
+            print(f"Added {len(new_ids)} chunks ✓")
+        if refit_reason is not None:
+            if verbose:
+                print(f" ~ Refitting the projector, as the documents have {refit_reason}...")
+            self.refit(background=(self.refit_params or {}).get("background", True), verbose=verbose)
+        return new_ids
+
+    def _record_growth(self, new_embeddings: np.ndarray):
+        """
+        Track the number and sum of the embeddings added since the projector was fitted. Statistics of the
+        embeddings the projector was fitted on are computed on the first addition.
+        """
+        state = self._refit_state
+        if state.n_fitted is None:
+            state.n_fitted = len(self._documents.embeddings)
+            state.fitted_mean, state.fitted_spread = _embedding_stats(self._documents.embeddings)
+            state.added_sum = np.zeros_like(state.fitted_mean)
+        state.n_added += len(new_embeddings)
+        state.added_sum += new_embeddings.sum(axis=0, dtype=np.float64)
+
+    def _refit_reason(self) -> Optional[str]:
+        """
+        Check whether the documents added since the projector was fitted call for a refit.
+
+        Returns:
+            Optional[str]: Why the projector should be refitted, or None if it should not.
+        """
+        params = {"growth": REFIT_GROWTH_THRESHOLD, "drift": REFIT_DRIFT_THRESHOLD, **(self.refit_params or {})}
+        state = self._refit_state
+        if state.n_fitted is None or state.n_added == 0:
+            return None
+        growth = state.n_added / max(state.n_fitted, 1)
+        if params["growth"] is not None and growth >= params["growth"]:
+            return f"grown by {growth:.0%}"
+        mean = (state.fitted_mean * state.n_fitted + state.added_sum) / (state.n_fitted + state.n_added)
+        drift = np.linalg.norm(mean - state.fitted_mean) / max(state.fitted_spread, np.finfo(np.float32).eps)
+        if params["drift"] is not None and drift >= params["drift"]:
+            return f"drifted by {drift:.2f} times their spread"
+        return None
+
+    def _refit(self, state: _RefitState, embeddings: np.ndarray, verbose: bool, background: bool):
+        """
+        Fit a new projector on a snapshot of the embeddings, then swap it in, unless the documents were
+        reloaded in the meantime. Documents added during the fit are projected with the new projector,
+        and count towards the next refit.
+        """
+        try:
+            projector, projections = fit_projections(embeddings=embeddings,
+                                                     umap_params=state.umap_params,
+                                                     projection_method=self.projection_method,
+                                                     landmark_params=state.landmark_params)
+        except Exception as e: # pylint: disable=broad-except
+            if not background:
+                raise
+            self._refit_error = e
+            return
+        with self._refit_lock:
+            if self._refit_state is not state:
+                return
+            if len(self._documents.embeddings) > len(embeddings):
+                added = get_projections(embedding=self._documents.embeddings[len(embeddings):], umap_transform=projector)
+                projections = (np.concatenate([projections[0], added[0]]), np.concatenate([projections[1], added[1]]))
+            self._projector, self._documents.projections = projector, projections
+            self._set_base_df(prepare_projections_df(document_ids=self._documents.ids,
+                                                    document_projections=self._documents.projections,
+                                                    document_text=self._documents.text))
+            self._query_cache.clear()
+            new_state = _RefitState(umap_params=state.umap_params, landmark_params=state.landmark_params)
+            n_fitted = len(embeddings)
+            if len(self._documents.embeddings) > n_fitted:
+                # Only the snapshot was fitted on, so the documents added since stay counted as added
+                new_state.n_fitted = n_fitted
+                new_state.fitted_mean, new_state.fitted_spread = _embedding_stats(embeddings)
+                new_state.n_added = len(self._documents.embeddings) - n_fitted
+                new_state.added_sum = self._documents.embeddings[n_fitted:].sum(axis=0, dtype=np.float64)
+            self._refit_state = new_state
+        if verbose:
+            print("Completed refitting the projector ✓")
+
+    def _get_retriever(self) -> Retriever:
+        """
+        Get the retrieval engine chosen by `retriever`, building it again whenever the settings,
+        the collection or the loaded embeddings have changed.
+
+        `retriever_params` are passed to the engine. The 'numpy' engine searches the loaded embeddings
+        exactly, with the 'metric' in `retriever_params` ('l2', 'cosine' or 'ip'), which defaults to the
+        'hnsw:space' of the collection.
+        """
+        key = (self.retriever, dict(self.retriever_params or {}), self._vectordb, self._documents.embeddings)
+        previous_key = self._retriever_key
+        if (self._retriever is None or key[:2] != previous_key[:2]
+                or key[2] is not previous_key[2] or key[3] is not previous_key[3]):
+            if self.retriever not in RETRIEVERS:
+                raise ValueError(f"Invalid retriever. Please use one of {', '.join(RETRIEVERS)}.")
+            params = dict(self.retriever_params or {})
+            if self.retriever == "chroma":
+                self._retriever = ChromaRetriever(chroma_collection=self._vectordb, **params)
+            else:
+                params.setdefault("metric", (self._vectordb.metadata or {}).get("hnsw:space", "l2"))
+                self._retriever = NumpyRetriever(ids=self._documents.ids, embeddings=self._documents.embeddings, **params)
+            self._retriever_key = key
+            self._query_cache.clear_retrieved()
+        return self._retriever
+
+    def _set_base_df(self, base_df: "pd.DataFrame"):
+        """
+        Set the base visualisation dataframe, and drop the base traces built from the previous one.
+        """
+        if base_df is not self._VizData.base_df:
+            self._VizData.base_df = base_df
+            self._VizData.base_traces = {}
+
+    def _get_base_traces(self) -> List["BaseTraceType"]:
+        """
+        Get the traces of the base visualisation dataframe in the current render mode, building them on first use.
+        """
+        if self._VizData.base_traces is None:
+            self._VizData.base_traces = {}
+        if self.render_mode not in self._VizData.base_traces:
+            self._VizData.base_traces[self.render_mode] = plot_base_traces(self._VizData.base_df, render_mode=self.render_mode)
+        return self._VizData.base_traces[self.render_mode]
+
+    def _retrieved_df(self, retrieved_ids: Any) -> "pd.DataFrame":
+        """
+        Get the rows of the base visualisation dataframe for the retrieved chunks, labelled as retrieved.
+        """
+        base_df = self._VizData.base_df
+        columns = [column for column in ["x", "y", "document", "document_cleaned"] if column in base_df]
+        return base_df.loc[base_df['id'].isin(retrieved_ids), columns].assign(category="Retrieved")
+
+    def _embed_texts(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """
+        Embed texts with the chosen embedding model, in batches.
+
+        Returns:
+            np.ndarray: A (n_texts, dimension) float32 array of embeddings.
+        """
+        with stage("embed_queries", batch_size=batch_size) as embed_stage:
+            embeddings = [self._chosen_embedding_model(texts[start:start + batch_size])
+                          for start in range(0, len(texts), batch_size)]
+            embed_stage.add(items=len(texts), bytes=sum(len(text) for text in texts))
+        return np.asarray([embedding for batch in embeddings for embedding in batch], dtype=np.float32)
+
+    def export_chroma(self) -> "Collection":
         """
         Export the ChromaDB collection.
         """
         return self._vectordb
     
-    def load_chroma(self, chroma_collection: Collection, initialize_projector: bool = False, recompute_projections: bool = False, umap_params: dict = None,verbose:bool=True):
+    def load_chroma(self, chroma_collection: "Collection", initialize_projector: bool = False, recompute_projections: bool = False, umap_params: dict = None,verbose:bool=True, landmark_params: dict = None):
         """
         Load ChromaDB collection.
+
+        Args:
+            chroma_collection: The Chroma collection to explore.
+            initialize_projector: Whether to fit a new projector on the collection.
+            recompute_projections: Whether to fit a new projector and recompute every projection.
+            umap_params: Keyword arguments passed to the projector.
+            verbose: Whether to print progress messages.
+            landmark_params: If given, the projector is fitted on a sample of landmark embeddings only.
+                See `load_pdf`.
         """
         self._vectordb = chroma_collection
-        self._documents.embeddings = get_doc_embeddings(self._vectordb)
-        self._documents.text = get_docs(self._vectordb)
-        self._documents.ids = self._vectordb.get()['ids']
-        if initialize_projector:
+        self._query_cache.clear()
+        self._refit_state = _RefitState(umap_params=umap_params, landmark_params=landmark_params)
+        self._documents.ids, self._documents.text, self._documents.embeddings = get_collection_data(self._vectordb)
+        if initialize_projector and not recompute_projections:
             if verbose:
-                print("Setting up umap projector")
-            self._projector = set_up_umap(embeddings=self._documents.embeddings, umap_params=umap_params)
+                print(f"Setting up {self.projection_method} projector")
+            self._projector = set_up_projector(embeddings=self._documents.embeddings,
+                                               projection_method=self.projection_method,
+                                               projector_params=umap_params,
+                                               landmark_params=landmark_params)
         if recompute_projections:
             if verbose:
                 print("Recomputing projections")
-            self._projector = set_up_umap(embeddings=self._documents.embeddings, umap_params=umap_params)
-            self._documents.projections = get_projections(embedding=self._documents.embeddings,
-                                                        umap_transform=self._projector)
-            self._VizData.base_df = prepare_projections_df(document_ids=self._documents.ids,
-                                                                    document_projections=self._documents.projections,
-                                                                    document_text=self._documents.text)
+            self._projector, self._documents.projections = fit_projections(embeddings=self._documents.embeddings,
+                                                                           umap_params=umap_params,
+                                                                           projection_method=self.projection_method,
+                                                                           landmark_params=landmark_params)
+            self._set_base_df(prepare_projections_df(document_ids=self._documents.ids,
+                                                document_projections=self._documents.projections,
+                                                document_text=self._documents.text))
         
-    def export_projector(self) -> umap.UMAP:
+    def export_projector(self) -> Any:
         """
-        Export the UMAP projector.
+        Export the projector (UMAP or one of the linear projectors).
         """
         return self._projector
     
-    def load_projector(self, umap_transform: umap.UMAP, recompute_projections: bool = False):
+    def load_projector(self, umap_transform: Any, recompute_projections: bool = False, batch_size: int = PROJECTION_BATCH_SIZE, n_jobs: int = 1):
         """
-        Load UMAP projector.
+        Load a projector (UMAP or one of the linear projectors).
+
+        Args:
+            umap_transform: A fitted projector, e.g. one returned by `export_projector`.
+            recompute_projections: Whether to re-project the loaded documents with the new projector.
+            batch_size: Number of embeddings transformed per block.
+            n_jobs: Number of worker processes used for projection. See `get_projections`.
         """
         self._projector = umap_transform
+        self._query_cache.clear()
+        self._refit_state = _RefitState(umap_params=self._refit_state.umap_params,
+                                        landmark_params=self._refit_state.landmark_params)
         if recompute_projections:
-            self._documents.projections = get_projections(embedding=self._documents.embeddings,
-                                                          umap_transform=self._projector)
-            self._VizData.base_df = prepare_projections_df(document_ids=self._documents.ids,
-                                                           document_projections=self._documents.projections,
-                                                           document_text=self._documents.text)
-    def run_projector(self):
+            self.run_projector(batch_size=batch_size, n_jobs=n_jobs)
+
+    def run_projector(self, batch_size: int = PROJECTION_BATCH_SIZE, n_jobs: int = 1):
         """
-        Run UMAP projector.
+        Run the projector over the loaded documents.
+
+        Args:
+            batch_size: Number of embeddings transformed per block.
+            n_jobs: Number of worker processes used for projection. See `get_projections`.
         """
+        self._query_cache.clear()
         self._documents.projections = get_projections(embedding=self._documents.embeddings,
-                                                      umap_transform=self._projector)
-        self._VizData.base_df = prepare_projections_df(document_ids=self._documents.ids,
-                                                               document_projections=self._documents.projections,
-                                                               document_text=self._documents.text)
+                                                      umap_transform=self._projector,
+                                                      batch_size=batch_size,
+                                                      n_jobs=n_jobs)
+        self._set_base_df(prepare_projections_df(document_ids=self._documents.ids,
+                                                document_projections=self._documents.projections,
+                                                document_text=self._documents.text))
+
+    def save(self, path: str):
+        """
+        Save the explorer to a directory, so that it can be restored with `RAGxplorer.load`
+        without re-embedding or re-fitting.
+
+        Args:
+            path: The directory to save the explorer to.
+
+        Raises:
+            RuntimeError: If no documents have been loaded.
+        """
+        if self._documents.ids is None:
+            raise RuntimeError("Please load the pdf first.")
+        manifest = {"settings": self.model_dump()}
+        if self.persist_directory is not None and self._vectordb is not None:
+            manifest["chroma"] = {"path": os.path.abspath(self.persist_directory), "collection": self._vectordb.name}
+        save_session(path,
+                     manifest=manifest,
+                     ids=self._documents.ids,
+                     text=self._documents.text,
+                     embeddings=self._documents.embeddings,
+                     projections=self._documents.projections,
+                     projector=self._projector)
+
+    @classmethod
+    def load(cls, path: str, **data) -> "RAGxplorer":
+        """
+        Restore an explorer saved with `save`. Embeddings and projections are memory-mapped, and the
+        visualisation dataframe is rebuilt from them.
+
+        The vector database is reopened if the explorer used a `persist_directory`, and is otherwise
+        rebuilt in memory from the saved embeddings. It is reopened from the `persist_directory`
+        passed to `load`, e.g. after the session and its database were moved, and otherwise from
+        the directory it was saved in.
+
+        Args:
+            path: The directory the explorer was saved to.
+            **data: Settings that override the saved ones, e.g. a new `persist_directory`.
+
+        Returns:
+            RAGxplorer: The restored explorer.
+        """
+        session = load_session(path)
+        explorer = cls(**{**session["manifest"]["settings"], **data})
+        explorer._documents.ids = session["ids"]
+        explorer._documents.text = session["text"]
+        explorer._documents.embeddings = session["embeddings"]
+        explorer._documents.projections = session["projections"]
+        explorer._projector = session["projector"]
+        if explorer._documents.projections is not None:
+            explorer._set_base_df(prepare_projections_df(document_ids=explorer._documents.ids,
+                                                         document_projections=explorer._documents.projections,
+                                                         document_text=explorer._documents.text))
+
+        chroma = session["manifest"].get("chroma")
+        if chroma is not None:
+            chroma_path = data.get("persist_directory") or chroma["path"]
+            explorer._vectordb = get_chroma_client(chroma_path).get_collection(chroma["collection"],
+                                                                               embedding_function=explorer._chosen_embedding_model)
+        else:
+            explorer._vectordb = build_vector_database_from_embeddings(ids=explorer._documents.ids,
+                                                                       documents=explorer._documents.text,
+                                                                       embeddings=explorer._documents.embeddings,
+                                                                       embedding_model=explorer._chosen_embedding_model,
+                                                                       persist_directory=explorer.persist_directory)
+        return explorer
+
+def _fit_sweep_projector(documents: _Documents, config: dict) -> dict:
+    """
+    Fit the projector of a sweep configuration on its chunks, and build their visualisation dataframe.
+    """
+    start = time.perf_counter()
+    projector, projections = fit_projections(embeddings=documents.embeddings,
+                                             umap_params=config["umap_params"],
+                                             projection_method=config["projection_method"],
+                                             landmark_params=config["landmark_params"])
+    base_df = prepare_projections_df(document_ids=documents.ids, document_projections=projections, document_text=documents.text)
+    return {"projector": projector, "projections": projections, "base_df": base_df, "project": time.perf_counter() - start}
+
+def _embed_index_and_fit(chunks: List[Tuple[str, dict]], embedding_function: Any, projection_method: str, umap_params: dict = None, landmark_params: dict = None, embedding_params: dict = None, persist_directory: str = None) -> dict:
+    """
+    Embed chunks with one embedding model, add them to a new vector database, then fit a projector on them,
+    timing each stage.
+    """
+    ids, texts = [str(i) for i in range(len(chunks))], [text for text, _ in chunks]
+    embeddings, embed_seconds = _timed(embed_texts, texts, embedding_function, **(embedding_params or {}))
+    vectordb, index_seconds = _timed(build_vector_database_from_embeddings,
+                                     ids=ids,
+                                     documents=texts,
+                                     embeddings=embeddings,
+                                     embedding_model=embedding_function,
+                                     persist_directory=persist_directory,
+                                     metadatas=[metadata for _, metadata in chunks])
+    (projector, projections), project_seconds = _timed(fit_projections,
+                                                       embeddings=embeddings,
+                                                       umap_params=umap_params,
+                                                       projection_method=projection_method,
+                                                       landmark_params=landmark_params)
+    return {"embeddings": embeddings, "vectordb": vectordb, "projector": projector, "projections": projections,
+            "embed": embed_seconds, "index": index_seconds, "project": project_seconds}
+
+def _timed(function: Any, *args, **kwargs) -> Tuple[Any, float]:
+    """
+    Call a function, and return its result with the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _embedding_stats(embeddings: np.ndarray, block_size: int = CHROMA_FETCH_PAGE_SIZE) -> Tuple[np.ndarray, float]:
+    """
+    Compute the mean of embeddings, and their root mean square distance to it, one block at a time.
+    """
+    total = np.zeros(embeddings.shape[1], dtype=np.float64)
+    total_sq = 0.0
+    for start in range(0, len(embeddings), block_size):
+        block = np.asarray(embeddings[start:start + block_size], dtype=np.float64)
+        total += block.sum(axis=0)
+        total_sq += np.einsum('ij,ij->', block, block)
+    mean = total / max(len(embeddings), 1)
+    spread = np.sqrt(max(total_sq / max(len(embeddings), 1) - mean @ mean, 0.0))
+    return mean, float(spread)
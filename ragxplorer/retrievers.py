@@ -0,0 +1,137 @@
+"""
+retrievers.py
+
+This module provides the retrieval engines used to find the chunks closest to embedded queries.
+`ChromaRetriever` queries the Chroma collection. `NumpyRetriever` runs an exact, brute-force
+search over the embeddings already held in memory, which is deterministic and, for the collection
+sizes explored here, faster than going through the Chroma client.
+"""
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, List
+
+import numpy as np
+
+from .constants import (
+    RETRIEVER_METRICS,
+    RETRIEVER_BLOCK_SIZE,
+    CHROMA_QUERY_BATCH_SIZE
+    )
+from .rag import query_chroma_many, reciprocal_rank_fusion
+
+if TYPE_CHECKING:
+    import chromadb
+
+class Retriever(ABC):
+    """
+    Base class of retrieval engines.
+    """
+
+    @abstractmethod
+    def query(self, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        """
+        Retrieves the top_k closest chunks to each of many embedded queries.
+
+        Args:
+            query_embeddings: A (n_queries, dimension) array of query embeddings.
+            top_k: The number of chunks to retrieve per query.
+
+        Returns:
+            A list of retrieved chunk IDs for each query, closest first.
+        """
+
+    def query_fused(self, query_embeddings: np.ndarray, top_k: int) -> List[str]:
+        """
+        Retrieves the top_k chunks for several embedded queries, e.g. of sub-questions, fused into a
+        single ranking with reciprocal rank fusion.
+
+        Args:
+            query_embeddings: A (n_queries, dimension) array of query embeddings.
+            top_k: The number of chunks to retrieve.
+
+        Returns:
+            A list of at most top_k unique retrieved chunk IDs, best first.
+        """
+        return reciprocal_rank_fusion(self.query(query_embeddings, top_k), top_k)
+
+class ChromaRetriever(Retriever):
+    """
+    Retrieves chunks by querying a Chroma collection.
+
+    Args:
+        chroma_collection: The Chroma collection to query.
+        batch_size: The number of queries sent per call.
+    """
+
+    def __init__(self, chroma_collection: "chromadb.Collection", batch_size: int = CHROMA_QUERY_BATCH_SIZE):
+        self.chroma_collection = chroma_collection
+        self.batch_size = batch_size
+
+    def query(self, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        return query_chroma_many(self.chroma_collection, query_embeddings, top_k, batch_size=self.batch_size)
+
+class NumpyRetriever(Retriever):
+    """
+    Retrieves chunks with an exact search over an in-memory float32 embedding matrix.
+
+    Queries are scored in blocks against the whole matrix with one matrix product per block, and
+    the top_k of each query are selected with `argpartition`, so results are exact and
+    deterministic. Chunks with equal scores are ranked by position.
+
+    Args:
+        ids: The ids of the chunks.
+        embeddings: A (n_chunks, dimension) array of chunk embeddings, in the order of `ids`.
+        metric: 'l2', 'cosine' or 'ip' (inner product), as in Chroma's 'hnsw:space' setting.
+        block_size: The maximum number of query-chunk scores computed at once.
+    """
+
+    def __init__(self, ids: List[str], embeddings: Any, metric: str = "l2", block_size: int = RETRIEVER_BLOCK_SIZE):
+        if metric not in RETRIEVER_METRICS:
+            raise ValueError(f"Invalid metric. Please use one of {', '.join(RETRIEVER_METRICS)}.")
+        if len(ids) != len(embeddings):
+            raise ValueError("Expected one embedding per id.")
+        self.ids = np.asarray(ids, dtype=object)
+        self.metric = metric
+        self.block_size = block_size
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        if metric == "cosine":
+            self.embeddings = _normalize(self.embeddings)
+        # For l2, |q - e|^2 = |q|^2 - 2 q.e + |e|^2, and |q|^2 does not change the ranking of a query
+        self.half_squared_norms = np.einsum('ij,ij->i', self.embeddings, self.embeddings) / 2 if metric == "l2" else None
+
+    def query(self, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if self.metric == "cosine":
+            query_embeddings = _normalize(query_embeddings)
+        n_chunks = len(self.embeddings)
+        top_k = min(top_k, n_chunks)
+        if top_k <= 0:
+            return [[] for _ in range(len(query_embeddings))]
+
+        retrieved_ids = []
+        queries_per_block = max(1, self.block_size // max(n_chunks, 1))
+        for start in range(0, len(query_embeddings), queries_per_block):
+            scores = query_embeddings[start:start + queries_per_block] @ self.embeddings.T
+            if self.half_squared_norms is not None:
+                scores -= self.half_squared_norms
+            retrieved_ids.extend(self.ids[_top_k_indices(scores, top_k)].tolist())
+        return retrieved_ids
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Returns the indices of the top_k highest scores of each row, highest first, ties broken by index.
+    """
+    if top_k < scores.shape[1]:
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Scales embeddings to unit length. Zero vectors are left as they are.
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms > 0, norms, 1)
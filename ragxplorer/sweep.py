@@ -0,0 +1,126 @@
+"""
+sweep.py
+
+This module provides the grids and results of `RAGxplorer.sweep`, which explores one document
+under many chunking, projection and retrieval settings. Configurations are grouped by the settings
+each stage depends on, so that a stage only runs once for all the configurations it is shared by.
+"""
+
+import itertools
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from .constants import (
+    PROJECTION_METHODS,
+    RETRIEVERS,
+    SWEEP_CHUNKING_PARAMS,
+    SWEEP_PROJECTION_PARAMS,
+    SWEEP_RETRIEVAL_PARAMS
+    )
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SWEEP_PARAMS = {**SWEEP_CHUNKING_PARAMS, **SWEEP_PROJECTION_PARAMS, **SWEEP_RETRIEVAL_PARAMS}
+
+class SweepResult(BaseModel):
+    """
+    The outcome of one configuration of a sweep.
+
+    Attributes:
+        params: The settings of the configuration.
+        explorer: An explorer loaded with the chunks and projections of the configuration.
+        n_chunks: The number of chunks the document was split into.
+        retrieved_ids: The chunk ids retrieved for each sweep query, if queries were given.
+        timings: Seconds spent in each stage ('chunk', 'index', 'project', 'retrieve'). A stage
+            shared with other configurations reports the time of its one run.
+        shared: The stages whose results were reused from an earlier configuration.
+    """
+    params: Dict[str, Any]
+    explorer: Any = None
+    n_chunks: int = 0
+    retrieved_ids: Optional[List[List[str]]] = None
+    timings: Dict[str, float] = Field(default_factory=dict)
+    shared: List[str] = Field(default_factory=list)
+
+class SweepResults(BaseModel):
+    """
+    The outcome of a sweep.
+
+    Attributes:
+        results: One result per configuration, in grid order.
+        timings: Wall time of each phase of the sweep ('extract', 'chunk', 'embed', 'index',
+            'project', 'retrieve'), and of the whole sweep ('total').
+        n_embedded: The number of distinct texts, chunks and queries, that were embedded.
+    """
+    results: List[SweepResult] = Field(default_factory=list)
+    timings: Dict[str, float] = Field(default_factory=dict)
+    n_embedded: int = 0
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """
+        Tabulates the configurations, one row each, with their settings, number of chunks, stage
+        timings and retrieved chunk ids.
+
+        Returns:
+            pd.DataFrame: The configurations of the sweep.
+        """
+        import pandas as pd # pylint: disable=import-outside-toplevel
+
+        return pd.DataFrame([{**result.params,
+                              "n_chunks": result.n_chunks,
+                              **{f"{name}_seconds": seconds for name, seconds in result.timings.items()},
+                              "shared": list(result.shared),
+                              "retrieved_ids": result.retrieved_ids}
+                             for result in self.results])
+
+def expand_grid(grid: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Expands a grid into the configurations it describes.
+
+    Args:
+        grid: Lists of values by setting name, e.g. {'chunk_size': [500, 1000], 'top_k': [3, 5]},
+            or a list of such grids, whose configurations are concatenated. A value that is not a
+            list, e.g. a dict of umap_params, is used for every configuration.
+
+    Returns:
+        List[Dict[str, Any]]: Every combination of the values, in order.
+
+    Raises:
+        ValueError: If the grid names an unknown setting, or has no values for a setting.
+    """
+    if isinstance(grid, list):
+        return [config for subgrid in grid for config in expand_grid(subgrid)]
+    unknown = set(grid) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"Invalid sweep settings {', '.join(sorted(unknown))}. Please use {', '.join(SWEEP_PARAMS)}.")
+    names = list(grid)
+    values = [grid[name] if isinstance(grid[name], list) else [grid[name]] for name in names]
+    if any(not options for options in values):
+        raise ValueError("Every sweep setting needs at least one value.")
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+def validate_config(config: Dict[str, Any]):
+    """
+    Checks the settings of one configuration before any work is done.
+
+    Raises:
+        ValueError: If a setting has an invalid value.
+    """
+    if config["projection_method"] not in PROJECTION_METHODS:
+        raise ValueError(f"Invalid projection method. Please use one of {', '.join(PROJECTION_METHODS)}.")
+    if config["retriever"] not in RETRIEVERS:
+        raise ValueError(f"Invalid retriever. Please use one of {', '.join(RETRIEVERS)}.")
+    if config["retrieval_method"] not in ["naive", "HyDE", "multi_qns"]:
+        raise ValueError("Invalid retrieval method. Please use naive, HyDE, or multi_qns.")
+    if config["chunk_size"] < 1 or config["chunk_overlap"] < 0 or config["top_k"] < 1:
+        raise ValueError("chunk_size and top_k must be positive, and chunk_overlap non-negative.")
+
+def stage_key(config: Dict[str, Any], params: Dict[str, Any]) -> str:
+    """
+    Returns a key identifying the settings of `config` named in `params`, so that configurations
+    that agree on them can share the result of a stage.
+    """
+    return json.dumps({name: config[name] for name in params}, sort_keys=True, default=str)
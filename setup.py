@@ -14,7 +14,9 @@ setup(
         'numpy',
         'pandas',
         'umap-learn',
+        'scikit-learn',
         'sentence-transformers',
+        'transformers',
         'plotly',
         'tqdm',
         'PyPDF2',